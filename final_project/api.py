@@ -0,0 +1,320 @@
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Rolling as a library. Functions here raise RollError (or
+         SheetError) instead of exiting, and return RollResult tuples.
+         Roller adds an asyncio front end that gathers the rolls asked
+         for within a short window and makes them all in one batch.
+         Importing it raises RollError if the homebrew file is bad.
+
+         >>> import api
+         >>> api.roll('inputs/rogue.txt', 'stealth', adv=True).total
+"""
+
+import asyncio
+import random
+from typing import NamedTuple
+
+from batch import roll_batch
+from character import Character
+from errors import RollError, SheetError
+from rng import BACKENDS, make_rng
+from rolls import ABBREVS, ROLL_TYPES, std_abbrev
+from rules import HOMEBREW_ERROR
+
+__all__ = ['RollError', 'SheetError', 'Request', 'RollResult', 'Roller',
+           'BACKENDS', 'make_rng', 'load_character', 'prepare', 'evaluate',
+           'roll']
+
+# a library can't fall back to the built-in skills without saying so
+if HOMEBREW_ERROR:
+    raise RollError(HOMEBREW_ERROR)
+
+
+class Request(NamedTuple):
+    """ A roll ready to be made: who, what, and the modifier to add """
+    character: Character
+    roll_for: str
+    roll_type: str
+    adv: bool
+    disadv: bool
+    mod: int
+
+
+class RollResult(NamedTuple):
+    """
+    The outcome of a roll. roll_for and roll_type are canonical ('ste',
+    'check'); rolls is the list roll_dice returns (kept die first).
+    """
+    name: str
+    roll_for: str
+    roll_type: str
+    adv: bool
+    disadv: bool
+    rolls: list
+    mod: int
+    total: int
+
+
+# --------------------------------------------------
+def load_character(source, roster=None):
+    """
+    A Character from a sheet file, or by name from roster when it has
+    one by that name. Raises SheetError for a bad sheet and OSError for
+    a file that can't be opened.
+    """
+    if roster is not None and source in roster:
+        return roster[source]
+    return Character.load(source)
+
+
+# --------------------------------------------------
+def test_load_character(tmp_path):
+    """ test bad sheets raise SheetError naming what is missing """
+    sheet = tmp_path / 'wizard.txt'
+    short = '3\nstr:8, dex:14, con:12, int:18, wis:10, cha:10\n'
+    for text, message in [
+            (short, f'No saving throw proficiencies line in {sheet}.'),
+            ('3\nstr:8, dex:14\nint:1\narc:1\n', f'No con score in {sheet}.')]:
+        sheet.write_text(text)
+        try:
+            load_character(str(sheet))
+            assert False, text
+        except SheetError as err:
+            assert str(err) == message
+
+
+# --------------------------------------------------
+def prepare(character, roll_for, roll_type='check', adv=False,
+            disadv=False):
+    """
+    Check a roll and work out its modifier. Any spelling the command line
+    accepts will do for roll_for and roll_type. Raises RollError.
+    """
+    if adv and disadv:
+        raise RollError('Cannot roll with advantage and disadvantage.')
+    roll_type = ROLL_TYPES.get(roll_type, roll_type)
+    roll_for = std_abbrev(roll_for, ABBREVS)
+    mod = character.modifier(roll_for, roll_type)
+    return Request(character, roll_for, roll_type, bool(adv), bool(disadv),
+                   mod)
+
+
+# --------------------------------------------------
+def evaluate(requests, rng=None):
+    """
+    Make a list of prepared rolls at once, drawing every die in one batch.
+    Returns a RollResult for each request, in order.
+    rng: random.Random to roll with (default: the global generator)
+    """
+    if not requests:
+        return []
+    dice = roll_batch(len(requests), [r.adv for r in requests],
+                      [r.disadv for r in requests], rng=rng)
+    results = []
+    for i, req in enumerate(requests):
+        kept = int(dice.kept[i])
+        if req.adv or req.disadv:
+            rolls = [kept, int(dice.roll1[i]), int(dice.roll2[i])]
+        else:
+            rolls = [kept]
+        results.append(RollResult(req.character.name, req.roll_for,
+                                  req.roll_type, req.adv, req.disadv, rolls,
+                                  req.mod, kept + req.mod))
+    return results
+
+
+# --------------------------------------------------
+def roll(character, roll_for, roll_type='check', adv=False, disadv=False,
+         seed=None, rng=None):
+    """
+    Make one roll. character is a Character or a sheet file name.
+    seed: roll with a fresh generator seeded with this, so the dice match
+        rolls.py -s seed
+    rng: generator to roll with, e.g. make_rng(backend='system')
+    """
+    if not isinstance(character, Character):
+        character = load_character(character)
+    request = prepare(character, roll_for, roll_type, adv, disadv)
+    if seed is not None:
+        rng = make_rng(seed)
+    return evaluate([request], rng)[0]
+
+
+# --------------------------------------------------
+def test_roll():
+    """ test roll() """
+    result = roll('inputs/rogue.txt', 'stealth', 'skill', disadv=True, seed=3)
+    assert result == RollResult('rogue', 'ste', 'check', False, True,
+                                [8, 8, 19], 15, 23)
+    assert roll('inputs/cleric.txt', 'str', 'save', seed=3).total == 9
+
+    for args, error in [(('inputs/bad.txt', 'str'), SheetError),
+                        (('inputs/rogue.txt', 'history'), RollError),
+                        (('inputs/rogue.txt', 'str', 'bogus'), RollError)]:
+        try:
+            roll(*args)
+            assert False, args
+        except error:
+            pass
+    try:
+        roll('inputs/rogue.txt', 'str', adv=True, disadv=True)
+        assert False
+    except RollError as err:
+        assert str(err) == 'Cannot roll with advantage and disadvantage.'
+
+
+# --------------------------------------------------
+def test_evaluate():
+    """ test evaluate() matches rolling one at a time """
+    rogue = Character.load('inputs/rogue.txt')
+    requests = [prepare(rogue, 'ste', 'c', adv=i % 3 == 1,
+                        disadv=i % 3 == 2) for i in range(30)]
+    batched = evaluate(requests, random.Random(4))
+
+    rng = random.Random(4)
+    single = [evaluate([req], rng)[0] for req in requests]
+    assert batched == single
+    assert [len(r.rolls) for r in batched[:3]] == [1, 3, 3]
+    assert evaluate([]) == []
+
+
+class Roller:
+    """
+    Rolls for asyncio code. Rolls asked for within window seconds of each
+    other (or max_batch of them, whichever comes first) are made together
+    in one evaluate() call. Sheets are loaded in a worker thread and kept,
+    so neither loading nor rolling blocks the event loop for long.
+
+        roller = Roller()
+        result = await roller.roll('inputs/rogue.txt', 'ste', adv=True)
+    """
+
+    def __init__(self, window=0.002, max_batch=1024, rng=None, roster=None):
+        self.window = window
+        self.max_batch = max_batch
+        self.rng = rng
+        self.roster = roster
+        self.characters = {}  # source: future of its Character
+        self.pending = []
+        self.timer = None
+        self.batches = 0
+
+    async def roll(self, character, roll_for, roll_type='check', adv=False,
+                   disadv=False):
+        """
+        Make one roll, batched with any others asked for at about the same
+        time. Returns a RollResult; raises RollError or SheetError.
+        """
+        if not isinstance(character, Character):
+            character = await self.load(character)
+        request = prepare(character, roll_for, roll_type, adv, disadv)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((request, future))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    async def load(self, source):
+        """ The Character for a sheet file or roster name, loading it once """
+        loading = self.characters.get(source)
+        if loading is None:
+            # concurrent callers share one load
+            loop = asyncio.get_running_loop()
+            loading = loop.run_in_executor(None, load_character, source,
+                                           self.roster)
+            self.characters[source] = loading
+            loading.add_done_callback(
+                lambda done: self._forget_failed(source, done))
+        # a cancelled caller mustn't cancel the load the others share
+        return await asyncio.shield(loading)
+
+    def _forget_failed(self, source, loading):
+        """ Drop a load that failed or was cancelled, so it is retried """
+        if (loading.cancelled() or loading.exception() is not None) \
+                and self.characters.get(source) is loading:
+            del self.characters[source]
+
+    def flush(self):
+        """ Make every roll waiting for the window to close, now """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        self.batches += 1
+        try:
+            results = evaluate([req for req, _ in pending], self.rng)
+        except Exception as err:  # pylint: disable=W0703
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(err)
+            return
+        for (_, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
+
+
+# --------------------------------------------------
+def test_roller():
+    """ test concurrent rolls are made in one batch, in order """
+    async def many(roller, num):
+        return await asyncio.gather(
+            *[roller.roll('inputs/rogue.txt', 'ste', adv=i % 2 == 1)
+              for i in range(num)])
+
+    roller = Roller(rng=random.Random(6))
+    results = asyncio.run(many(roller, 50))
+    assert roller.batches == 1
+    rogue = Character.load('inputs/rogue.txt')
+    assert results == evaluate([prepare(rogue, 'ste', adv=i % 2 == 1)
+                                for i in range(50)], random.Random(6))
+
+    roller = Roller(max_batch=20)
+    assert len(asyncio.run(many(roller, 50))) == 50
+    assert roller.batches == 3
+
+    async def bad():
+        try:
+            await Roller().roll('inputs/bad.txt', 'str')
+            return False
+        except SheetError:
+            return True
+
+    assert asyncio.run(bad())
+
+
+# --------------------------------------------------
+def test_roller_cancel():
+    """ test a cancelled roll doesn't break later loads of its sheet """
+    async def cancel_then_roll():
+        roller = Roller()
+        first = asyncio.create_task(roller.roll('inputs/rogue.txt', 'ste'))
+        second = asyncio.create_task(roller.roll('inputs/rogue.txt', 'ste'))
+        await asyncio.sleep(0)
+        first.cancel()
+        try:
+            await first
+            assert False
+        except asyncio.CancelledError:
+            pass
+        # the second caller shares the load the first one gave up on
+        assert (await second).mod == 15
+        result = await roller.roll('inputs/rogue.txt', 'ste')
+
+        # a failed load is forgotten, so the next call tries again
+        try:
+            await roller.roll('inputs/bad.txt', 'str')
+            assert False
+        except SheetError:
+            pass
+        return result, list(roller.characters)
+
+    result, loaded = asyncio.run(cancel_then_roll())
+    assert result.mod == 15
+    assert loaded == ['inputs/rogue.txt']
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Check the dice are fair. Rolls a large number of d20s the way
+         roll_dice does, a chunk at a time, keeping only running totals,
+         and tests the faces (chi-square), consecutive dice (serial
+         correlation) and streaks of high and low rolls (runs), with
+         p-values. Advantage and disadvantage pairs are tested too.
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from operator import mul
+from typing import NamedTuple
+
+from batch import draw_d20s, np
+from odds import d20_pmf
+from rng import BACKENDS, spawn
+
+# dice per chunk: memory use is bounded by this, however many are rolled
+CHUNK_SIZE = 1 << 20
+
+# rolls per independently seeded part, so results for a seed don't
+# depend on how many processes share the parts
+PART_SIZE = 1 << 24
+
+# p-values below this are called out
+ALPHA = 0.001
+
+# dice are centred as 2 * face - 21 (odd numbers from -19 to 19), so the
+# lag-1 products are whole numbers; VARIANCE is their variance
+VARIANCE = 133
+
+# a face above this is high, otherwise low, for the runs test
+HIGH = 10
+_HIGH_TABLE = bytes(int(i > HIGH) for i in range(256))
+
+
+class Outcome(NamedTuple):
+    """ One test's result """
+    name: str
+    statistic: float
+    p: float
+
+
+class Audit:
+    """
+    Running statistics for one or more streams of d20s. update() takes
+    the dice a chunk at a time, in the order they were drawn; audits of
+    independent streams combine with merge().
+    pairs: the stream is (first, second) dice of rolls with advantage
+        (pairs='adv') or disadvantage (pairs='disadv'); None for single dice
+    """
+
+    def __init__(self, pairs=None):
+        self.pairs = pairs
+        self.faces = [0] * 21
+        self.pair_counts = [0] * 400 if pairs else None
+        self.lag_sum = 0  # sum of products of consecutive centred dice
+        self.lags = 0  # number of consecutive pairs of dice
+        self.changes = 0  # consecutive dice on opposite sides of HIGH
+        self.longest = 0
+        self.last = None  # last die of the stream so far
+        self.run = 0  # length of the run it ends
+
+    @property
+    def count(self):
+        """ Number of dice seen """
+        return sum(self.faces)
+
+    def update(self, dice):
+        """ Add the next chunk of dice (an even number of them for pairs) """
+        if not len(dice):
+            return
+        if np is not None:
+            self._update_numpy(np.asarray(dice, dtype=np.int64))
+        else:
+            if not isinstance(dice, array) or dice.typecode != 'b':
+                dice = array('b', dice)
+            self._update_python(dice)
+
+    def _update_numpy(self, dice):
+        """ update() with NumPy """
+        self.faces = [a + int(b) for a, b in
+                      zip(self.faces, np.bincount(dice, minlength=21))]
+        if self.pairs:
+            codes = (dice[0::2] - 1) * 20 + dice[1::2] - 1
+            self.pair_counts = [a + int(b) for a, b in zip(
+                self.pair_counts, np.bincount(codes, minlength=400))]
+
+        centred = 2 * dice - 21
+        if self.last is not None:
+            centred = np.concatenate(([2 * self.last - 21], centred))
+        self.lag_sum += int(np.dot(centred[:-1], centred[1:]))
+        self.lags += len(centred) - 1
+
+        high = dice > HIGH
+        ends = np.flatnonzero(high[1:] != high[:-1])
+        lengths = np.diff(np.concatenate(([-1], ends, [len(dice) - 1])))
+        self._add_runs(bool(high[0]), len(ends), int(lengths[0]),
+                       int(lengths[-1]), int(lengths.max()), int(dice[-1]))
+
+    def _update_python(self, dice):
+        """ update() with the standard library: mostly bytes methods """
+        data = dice.tobytes()
+        for face in range(1, 21):
+            self.faces[face] += data.count(bytes([face]))
+        if self.pairs:
+            for (first, second), num in Counter(zip(data[0::2],
+                                                    data[1::2])).items():
+                self.pair_counts[(first - 1) * 20 + second - 1] += num
+
+        total = sum(dice)
+        inner = sum(map(mul, dice, dice[1:]))
+        # sum of (2a - 21)(2b - 21) over consecutive a, b
+        self.lag_sum += 4 * inner - 42 * (2 * total - dice[0] - dice[-1]) \
+            + 441 * (len(dice) - 1)
+        self.lags += len(dice) - 1
+        if self.last is not None:
+            self.lag_sum += (2 * self.last - 21) * (2 * dice[0] - 21)
+            self.lags += 1
+
+        high = data.translate(_HIGH_TABLE)
+        first = high[:1]
+        last = high[-1:]
+        longest = max(max(map(len, high.split(b'\0'))),
+                      max(map(len, high.split(b'\1'))))
+        self._add_runs(first == b'\1',
+                       high.count(b'\0\1') + high.count(b'\1\0'),
+                       len(high) - len(high.lstrip(first)),
+                       len(high) - len(high.rstrip(last)), longest, dice[-1])
+
+    def _add_runs(self, first_high, changes, leading, trailing, longest,
+                  last):
+        """
+        Carry the run statistics over from the previous chunk. The chunk's
+        first run continues the previous chunk's last if both are high or
+        both are low. last, the chunk's last die, says which the next
+        chunk continues.
+        """
+        if self.last is None or (self.last > HIGH) != first_high:
+            if self.last is not None:
+                self.changes += 1
+            self.run = 0
+        joined = self.run + leading
+        self.longest = max(self.longest, longest, joined)
+        self.changes += changes
+        self.run = joined if changes == 0 else trailing
+        self.last = last
+
+    def merge(self, other):
+        """ Add an audit of another, independent stream to this one """
+        if other.pairs != self.pairs:
+            raise ValueError('Cannot merge audits of different rolls.')
+        self.faces = [a + b for a, b in zip(self.faces, other.faces)]
+        if self.pairs:
+            self.pair_counts = [a + b for a, b in zip(self.pair_counts,
+                                                      other.pair_counts)]
+        self.lag_sum += other.lag_sum
+        self.lags += other.lags
+        self.changes += other.changes
+        self.longest = max(self.longest, other.longest)
+        return self
+
+    def tests(self):
+        """ An Outcome for each statistic """
+        results = [Outcome('Faces (chi-square, 19 df)',
+                           *chi_square(self.faces[1:], [1 / 20] * 20))]
+
+        if self.pairs:
+            kept = [0] * 20
+            for code, num in enumerate(self.pair_counts):
+                first, second = divmod(code, 20)
+                face = max(first, second) if self.pairs == 'adv' \
+                    else min(first, second)
+                kept[face] += num
+            pmf = d20_pmf(self.pairs == 'adv', self.pairs == 'disadv')
+            results.append(Outcome(f'Kept die, {self.pairs} (chi-square, '
+                                   '19 df)',
+                                   *chi_square(kept, [float(pmf[face]) for
+                                                      face in range(1, 21)])))
+            results.append(Outcome('Pairs of dice (chi-square, 399 df)',
+                                   *chi_square(self.pair_counts,
+                                               [1 / 400] * 400)))
+
+        # centred lag-1 products have mean 0 and variance VARIANCE ** 2
+        # for fair, independent dice
+        corr = self.lag_sum / (self.lags * VARIANCE) if self.lags else 0.0
+        z_corr = corr * math.sqrt(self.lags)
+        results.append(Outcome('Serial correlation (lag 1)', corr,
+                               two_sided_p(z_corr)))
+
+        # each consecutive pair switches between high and low with
+        # chance 1/2, independently of the others
+        z_runs = (self.changes - self.lags / 2) / math.sqrt(self.lags / 4) \
+            if self.lags else 0.0
+        results.append(Outcome(f'Runs above/below {HIGH}.5 (z)', z_runs,
+                               two_sided_p(z_runs)))
+        return results
+
+
+# --------------------------------------------------
+def test_audit_chunks():
+    """ test chunked updates agree with working it out in one go """
+    rng = spawn(1, 'test')
+    dice = [rng.randint(1, 20) for _ in range(4000)]
+    dice[100:130] = [20] * 30
+    dice[2000:2004] = [3, 3, 3, 3]
+
+    whole = Audit('adv')
+    whole.update(dice)
+    chunked = Audit('adv')
+    for start, end in [(0, 2), (2, 102), (102, 128), (128, 2002),
+                       (2002, 2004), (2004, 4000)]:
+        chunked.update(dice[start:end])
+    assert vars(chunked) == vars(whole)
+
+    centred = [2 * d - 21 for d in dice]
+    assert whole.lag_sum == sum(a * b for a, b in zip(centred,
+                                                      centred[1:]))
+    assert whole.lags == 3999
+    high = [d > HIGH for d in dice]
+    assert whole.changes == sum(a != b for a, b in zip(high, high[1:]))
+    assert whole.longest >= 30
+    assert whole.faces[1:] == [dice.count(f) for f in range(1, 21)]
+    assert sum(whole.pair_counts) == 2000
+    assert whole.pair_counts[(dice[0] - 1) * 20 + dice[1] - 1] >= 1
+
+
+# --------------------------------------------------
+def test_audit_tests():
+    """ test fair dice pass and obviously unfair dice fail """
+    fair = audit_part(0, 200000, 5, 'mt', None)
+    assert all(test.p > ALPHA for test in fair.tests())
+
+    cycle = Audit()
+    cycle.update(list(range(1, 21)) * 1000)
+    faces, serial, runs = cycle.tests()
+    assert faces.statistic == 0 and faces.p == 1
+    assert serial.statistic > 0.5 and serial.p < 1e-12
+    assert runs.p < 1e-12
+    assert cycle.longest == 10
+
+    pairs = audit_part(0, 100000, 5, 'mt', 'disadv')
+    assert [test.name for test in pairs.tests()][1:3] == \
+        ['Kept die, disadv (chi-square, 19 df)',
+         'Pairs of dice (chi-square, 399 df)']
+    assert all(test.p > ALPHA for test in pairs.tests())
+
+
+# --------------------------------------------------
+def chi_square(counts, chances):
+    """ (chi-square statistic, p-value) of counts against chances """
+    total = sum(counts)
+    stat = sum((num - total * chance) ** 2 / (total * chance)
+               for num, chance in zip(counts, chances)) if total else 0.0
+    return stat, chi_square_p(stat, len(counts) - 1)
+
+
+# --------------------------------------------------
+def chi_square_p(stat, df):
+    """
+    Chance of a chi-square statistic of at least stat with df degrees of
+    freedom: the regularized upper incomplete gamma function Q(df/2,
+    stat/2), by its series below a + 1 and continued fraction above.
+    """
+    a, x = df / 2, stat / 2
+    if x <= 0:
+        return 1.0
+    scale = math.exp(-x + a * math.log(x) - math.lgamma(a))
+    if x < a + 1:
+        term = total = 1 / a
+        n = a
+        while abs(term) > abs(total) * 1e-15:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1 - total * scale)
+
+    # Lentz's method
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    frac = d
+    for i in range(1, 10000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        frac *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return frac * scale
+
+
+# --------------------------------------------------
+def two_sided_p(z):
+    """ Chance of a standard normal at least |z| from 0 """
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+# --------------------------------------------------
+def test_p_values():
+    """ test chi_square_p() and two_sided_p() against known values """
+    for stat, df, p in [(3.841459, 1, 0.05), (30.143527, 19, 0.05),
+                        (19, 19, 0.456836), (6.634897, 1, 0.01),
+                        (399, 399, 0.490585), (100, 19, 5.35556e-13)]:
+        assert abs(chi_square_p(stat, df) - p) < p * 1e-4, (stat, df)
+    assert abs(chi_square_p(4, 2) - math.exp(-2)) < 1e-12
+    assert chi_square_p(0, 19) == 1.0
+    assert abs(two_sided_p(1.959964) - 0.05) < 1e-6
+    assert two_sided_p(0) == 1.0
+
+
+# --------------------------------------------------
+def audit_part(part, rolls, seed, backend, pairs):
+    """
+    Audit one part: rolls rolls (pairs of dice each, with pairs) from the
+    generator spawned for this part, drawn a chunk at a time by
+    batch.draw_d20s, which takes the same dice roll_dice would.
+    """
+    rng = spawn(seed, 'audit', part, backend=backend)
+    audit = Audit(pairs)
+    per_roll = 2 if pairs else 1
+    chunk = CHUNK_SIZE // per_roll
+    for start in range(0, rolls, chunk):
+        audit.update(draw_d20s(rng, min(chunk, rolls - start) * per_roll))
+    return audit
+
+
+# --------------------------------------------------
+def audit_rolls(rolls, seed=None, backend='mt', pairs=None, workers=None,
+                part_size=PART_SIZE):
+    """
+    Audit rolls rolls split into parts of part_size, each with its own
+    generator. With workers=1 everything happens in this process;
+    otherwise the parts are shared out across a process pool.
+    """
+    parts = [(num, min(part_size, rolls - start))
+             for num, start in enumerate(range(0, rolls, part_size))]
+    audit = Audit(pairs)
+    if workers == 1 or len(parts) < 2:
+        for num, size in parts:
+            audit.merge(audit_part(num, size, seed, backend, pairs))
+        return audit
+
+    workers = min(workers or os.cpu_count(), len(parts))
+    with ProcessPoolExecutor(workers) as pool:
+        for result in pool.map(audit_part, *zip(*parts),
+                               *[[arg] * len(parts) for arg in
+                                 (seed, backend, pairs)]):
+            audit.merge(result)
+    return audit
+
+
+# --------------------------------------------------
+def test_audit_rolls():
+    """ test audit_rolls() gives the same audit in and out of a pool """
+    alone = audit_rolls(5000, 3, workers=1)
+    assert alone.count == 5000
+    assert alone.tests() == audit_part(0, 5000, 3, 'mt', None).tests()
+
+    alone = audit_rolls(3500, 3, pairs='adv', workers=1, part_size=1000)
+    pooled = audit_rolls(3500, 3, pairs='adv', workers=2, part_size=1000)
+    assert alone.count == pooled.count == 7000
+    assert alone.tests() == pooled.tests()
+
+
+# --------------------------------------------------
+def get_args():
+    """Get command-line arguments"""
+
+    parser = argparse.ArgumentParser(
+        description='Check the dice are fair',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('-n',
+                        '--rolls',
+                        metavar='int',
+                        help='Number of rolls, e.g. 1000000 or 1e9',
+                        type=lambda text: int(float(text)),
+                        default=1000000)
+
+    dis_adv = parser.add_mutually_exclusive_group()
+    dis_adv.add_argument('-a',
+                         '--advantage',
+                         help='Audit rolls with advantage (pairs of dice)',
+                         action='store_true')
+
+    dis_adv.add_argument('-d',
+                         '--disadvantage',
+                         help='Audit rolls with disadvantage (pairs of dice)',
+                         action='store_true')
+
+    parser.add_argument('-s',
+                        '--seed',
+                        metavar='seed',
+                        help='Optional seed value for testing',
+                        type=int)
+
+    parser.add_argument('--rng',
+                        metavar='NAME',
+                        help='Random number generator: mt, pcg64 or system',
+                        choices=BACKENDS,
+                        default='mt')
+
+    parser.add_argument('-w',
+                        '--workers',
+                        metavar='int',
+                        help='Processes to use (default: one per CPU)',
+                        type=int)
+
+    args = parser.parse_args()
+    if args.rolls < 1:
+        parser.error(f'--rolls "{args.rolls}" must be greater than 0')
+    if args.workers is not None and args.workers < 1:
+        parser.error(f'--workers "{args.workers}" must be greater than 0')
+    if args.rng == 'system' and args.seed is not None:
+        parser.error('--seed cannot be used with --rng system')
+
+    return args
+
+
+# --------------------------------------------------
+def main():
+    """Make a jazz noise here"""
+
+    args = get_args()
+    pairs = 'adv' if args.advantage else 'disadv' if args.disadvantage \
+        else None
+    start = time.perf_counter()
+    try:
+        audit = audit_rolls(args.rolls, args.seed, args.rng, pairs,
+                            args.workers)
+    except ValueError as err:
+        sys.exit(str(err))
+    seconds = time.perf_counter() - start
+
+    kind = f' with {"advantage" if args.advantage else "disadvantage"}' \
+        if pairs else ''
+    print(f'\nAudited {args.rolls:,} rolls{kind} ({audit.count:,} dice) '
+          f'from the {args.rng} generator in {seconds:.1f} s.\n')
+    tests = audit.tests()
+    longest = 'Longest run of high or low dice'
+    width = max(len(longest), *[len(test.name) for test in tests])
+    print(f'{"Test":<{width}}  {"Statistic":>10}  {"p":>8}')
+    for test in tests:
+        print(f'{test.name:<{width}}  {test.statistic:>10.4f}  '
+              f'{test.p:>8.4f}')
+    print(f'{longest:<{width}}  {audit.longest:>10}')
+
+    failed = [test.name for test in tests if test.p < ALPHA]
+    if failed:
+        print(f'\nUnlikely for fair dice (p < {ALPHA}): '
+              f'{", ".join(failed)}.\n')
+        sys.exit(1)
+    print(f'\nNothing unusual at p < {ALPHA}.\n')
+
+
+# --------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: The names of the random number generators rng.py provides. They
+         live apart from rng.py, which loads NumPy, so command-line
+         scripts can offer them as choices without paying for NumPy at
+         start-up.
+"""
+
+BACKENDS = ['mt', 'pcg64', 'system']
@@ -0,0 +1,285 @@
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Roll many d20s at once. Results match rolls.roll_dice for the
+         same seed, but are drawn in bulk instead of one randint() per die.
+"""
+
+import random
+import sys
+from array import array
+from typing import NamedTuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; fall back to array.array
+    np = None
+
+# array typecode for an unsigned 32-bit word
+_WORD = 'I' if array('I').itemsize == 4 else 'L'
+
+
+class BatchRolls(NamedTuple):
+    """
+    Results of a batch of d20 rolls, one row per roll.
+    kept: the die that counts toward the total.
+    roll1, roll2: the raw dice. roll2 is 0 for rows rolled without
+        advantage or disadvantage, since only one die was thrown.
+    """
+    kept: object
+    roll1: object
+    roll2: object
+
+
+# --------------------------------------------------
+def roll_batch(num, adv=False, disadv=False, seed=None, rng=None):
+    """
+    Roll num d20 checks. adv and disadv may be single bools that apply to
+    every row, or sequences of bools with one flag per row.
+
+    Dice are drawn in the same order roll_dice draws them, so
+    roll_batch(n, seed=s) gives the same dice as seeding once and calling
+    roll_dice n times. When rng is a random.Random it is used instead of
+    the module-level generator; seed reseeds whichever generator is used.
+    """
+    if rng is None:
+        rng = random
+    if seed is not None:
+        rng.seed(seed)
+
+    if _is_flag(adv) and _is_flag(disadv):
+        # the same flags for every row: no per-row work at all
+        width = 2 if adv or disadv else 1
+        return _assemble_uniform(draw_d20s(rng, num * width), num,
+                                 bool(adv), bool(disadv))
+
+    if np is not None:
+        adv = _row_flags_numpy(adv, num)
+        disadv = _row_flags_numpy(disadv, num)
+        two = adv | disadv
+        dice = draw_d20s(rng, num + int(np.count_nonzero(two)))
+        return _assemble_numpy(np.asarray(dice), adv, disadv, two)
+
+    adv = _row_flags(adv, num)
+    disadv = _row_flags(disadv, num)
+    two = [a or d for a, d in zip(adv, disadv)]
+    dice = draw_d20s(rng, num + sum(two))
+    return _assemble_python(dice, adv, two)
+
+
+# --------------------------------------------------
+def draw_d20s(rng, count):
+    """
+    Draw count d20 values from rng, consuming exactly the same 32-bit
+    Mersenne Twister outputs that count calls to rng.randint(1, 20) would.
+
+    randint(1, 20) takes the top five bits of one 32-bit output and rejects
+    values of 20 or more, so the raw outputs can be fetched in blocks and
+    filtered. The generator is then rewound and advanced by exactly the
+    number of outputs used, leaving it where the single-roll path would.
+    Generators with a dice() method of their own (see rng.py) use that.
+    """
+    if hasattr(rng, 'dice'):
+        return rng.dice(count, 20)
+    if count == 0:
+        return np.zeros(0, dtype=np.int8) if np is not None else array('b')
+
+    state = rng.getstate()
+    if np is not None:
+        dice, used = _raw_words_numpy(state, count)
+    else:
+        dice, used = _raw_words_python(rng, count)
+
+    rng.setstate(state)
+    rng.getrandbits(32 * used)
+    return dice
+
+
+# --------------------------------------------------
+def _raw_words_python(rng, count):
+    """ Return (dice, outputs consumed) using rng.getrandbits in blocks """
+    dice = array('b')
+    used = 0
+    while len(dice) < count:
+        block = (count - len(dice)) * 8 // 5 + 16
+        raw = array(_WORD)
+        bits = rng.getrandbits(32 * block)
+        raw.frombytes(bits.to_bytes(4 * block, 'little'))
+        if sys.byteorder == 'big':
+            raw.byteswap()
+        for i, word in enumerate(raw):
+            die = word >> 27
+            if die < 20:
+                dice.append(die + 1)
+                if len(dice) == count:
+                    return dice, used + i + 1
+        used += block
+    return dice, used
+
+
+# --------------------------------------------------
+def _raw_words_numpy(state, count):
+    """ Return (dice, outputs consumed) using a NumPy copy of the MT state """
+    bit_gen = np.random.MT19937()
+    bit_gen.state = {'bit_generator': 'MT19937',
+                     'state': {'key': np.array(state[1][:624],
+                                               dtype=np.uint32),
+                               'pos': state[1][624]}}
+    chunks = []
+    have = 0
+    used = 0
+    while have < count:
+        block = (count - have) * 8 // 5 + 64
+        top = (bit_gen.random_raw(block) >> 27).astype(np.int8)
+        accepted = np.flatnonzero(top < 20)
+        if have + len(accepted) >= count:
+            last = accepted[count - have - 1]
+            chunks.append(top[accepted[:count - have]] + 1)
+            return np.concatenate(chunks), used + int(last) + 1
+        chunks.append(top[accepted] + 1)
+        have += len(accepted)
+        used += block
+    return np.concatenate(chunks), used
+
+
+# --------------------------------------------------
+def _is_flag(flag):
+    """ Whether flag is one flag for every row rather than one per row """
+    return flag is None or isinstance(flag, bool) or \
+        (np is not None and isinstance(flag, np.bool_))
+
+
+# --------------------------------------------------
+def _row_flags(flag, num):
+    """ One flag per row as a list of bools; a single flag is repeated """
+    if _is_flag(flag):
+        return [bool(flag)] * num
+    flags = [bool(f) for f in flag]
+    if len(flags) != num:
+        raise ValueError(f'Expected {num} flags, got {len(flags)}.')
+    return flags
+
+
+# --------------------------------------------------
+def _row_flags_numpy(flag, num):
+    """ _row_flags() as a NumPy bool array """
+    if _is_flag(flag):
+        return np.full(num, bool(flag))
+    flags = np.asarray(flag, dtype=bool).reshape(-1)
+    if len(flags) != num:
+        raise ValueError(f'Expected {num} flags, got {len(flags)}.')
+    return flags
+
+
+# --------------------------------------------------
+def _assemble_uniform(dice, num, adv, disadv):
+    """
+    Split a flat run of dice into kept/roll1/roll2 arrays when every row
+    has the same flags: alternate dice are the pairs, by slicing
+    """
+    if np is not None:
+        dice = np.asarray(dice, dtype=np.int8)
+        if not (adv or disadv):
+            return BatchRolls(dice.copy(), dice, np.zeros(num, np.int8))
+        roll1, roll2 = dice[0::2], dice[1::2]
+        pick = np.maximum if adv else np.minimum
+        return BatchRolls(pick(roll1, roll2), roll1, roll2)
+
+    if not (adv or disadv):
+        return BatchRolls(array('b', dice), dice, array('b', bytes(num)))
+    roll1, roll2 = dice[0::2], dice[1::2]
+    return BatchRolls(array('b', map(max if adv else min, roll1, roll2)),
+                      roll1, roll2)
+
+
+# --------------------------------------------------
+def _assemble_python(dice, adv, two):
+    """ Split a flat run of dice into kept/roll1/roll2 arrays """
+    kept, roll1, roll2 = array('b'), array('b'), array('b')
+    pos = 0
+    for is_adv, is_two in zip(adv, two):
+        first = dice[pos]
+        if is_two:
+            second = dice[pos + 1]
+            pos += 2
+            kept.append(max(first, second) if is_adv else min(first, second))
+        else:
+            second = 0
+            pos += 1
+            kept.append(first)
+        roll1.append(first)
+        roll2.append(second)
+    return BatchRolls(kept, roll1, roll2)
+
+
+# --------------------------------------------------
+def _assemble_numpy(dice, adv, disadv, two):
+    """ Vectorized version of _assemble_python, for bool array flags """
+    width = two.astype(np.intp) + 1
+    starts = np.cumsum(width) - width
+    roll1 = dice[starts]
+    roll2 = np.zeros(len(two), dtype=np.int8)
+    roll2[two] = dice[starts[two] + 1]
+    kept = roll1.copy()
+    kept[adv] = np.maximum(roll1[adv], roll2[adv])
+    lower = disadv & ~adv
+    kept[lower] = np.minimum(roll1[lower], roll2[lower])
+    return BatchRolls(kept, roll1, roll2)
+
+
+# --------------------------------------------------
+def test_roll_batch_matches_roll_dice():
+    """ test roll_batch() gives the same dice as repeated roll_dice() """
+    from rolls import roll_dice  # pylint: disable=C0415
+
+    flags = [(False, False), (True, False), (False, True)] * 50
+    random.seed(3)
+    expected = [roll_dice(a, d, None) for a, d in flags]
+    after = random.random()
+
+    batch = roll_batch(len(flags), [a for a, _ in flags],
+                       [d for _, d in flags], seed=3)
+    assert random.random() == after
+    for i, rolls in enumerate(expected):
+        assert batch.kept[i] == rolls[0]
+        if len(rolls) == 3:
+            assert (batch.roll1[i], batch.roll2[i]) == (rolls[1], rolls[2])
+        else:
+            assert (batch.roll1[i], batch.roll2[i]) == (rolls[0], 0)
+
+
+# --------------------------------------------------
+def test_roll_batch_flags():
+    """ test roll_batch() with a single flag for every row """
+    batch = roll_batch(1000, adv=True, rng=random.Random(1))
+    assert len(batch.kept) == 1000
+    assert all(k == max(a, b) for k, a, b in zip(*batch))
+    assert all(1 <= k <= 20 for k in batch.kept)
+    assert len(roll_batch(0, seed=1).kept) == 0
+    assert len(roll_batch(0, [], [], seed=1).kept) == 0
+    assert len(roll_batch(0, adv=True, seed=1).roll2) == 0
+
+    batch = roll_batch(500, rng=random.Random(1))
+    assert list(batch.kept) == list(batch.roll1)
+    assert not any(batch.roll2)
+
+    # advantage wins over disadvantage on a row with both, like roll_dice
+    both = roll_batch(300, [True] * 300, [True] * 300, rng=random.Random(2))
+    assert all(k == max(a, b) for k, a, b in zip(*both))
+    both = roll_batch(300, True, [True, False] * 150, rng=random.Random(2))
+    assert all(k == max(a, b) for k, a, b in zip(*both))
+    try:
+        roll_batch(3, [True, False])
+        assert False
+    except ValueError as err:
+        assert str(err) == 'Expected 3 flags, got 2.'
+
+
+# --------------------------------------------------
+def test_roll_batch_buffered():
+    """ test roll_batch() with a generator that rolls its own dice """
+    from rng import make_rng  # pylint: disable=C0415
+
+    batch = roll_batch(1000, disadv=True, rng=make_rng(None, 'system'))
+    assert all(k == min(a, b) for k, a, b in zip(*batch))
+    assert all(1 <= k <= 20 for k in batch.roll2)
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Benchmark rolls.py: start-up time, per-call latency of each step
+         and bulk throughput, with JSON output that can be compared to an
+         earlier run.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from batch import roll_batch
+from character import Character
+from party import roll_party
+from rolls import (calc_mod, calc_prof, calc_total, determine_ability,
+                   read_dict, roll_dice)
+from stream import roll_stream
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SHEET = os.path.join(HERE, 'inputs', 'rogue.txt')
+
+
+# --------------------------------------------------
+def get_args():
+    """Get command-line arguments"""
+
+    parser = argparse.ArgumentParser(
+        description='Benchmark rolls.py',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('-o',
+                        '--outfile',
+                        help='Write results as JSON to this file',
+                        metavar='FILE',
+                        type=argparse.FileType('wt'))
+
+    parser.add_argument('-b',
+                        '--baseline',
+                        help='Earlier results to compare against',
+                        metavar='FILE',
+                        type=argparse.FileType('rt'))
+
+    parser.add_argument('-q',
+                        '--quick',
+                        help='Smaller workloads, for a fast sanity check',
+                        action='store_true')
+
+    parser.add_argument('-t',
+                        '--threshold',
+                        metavar='float',
+                        help='Percent change that counts as a regression',
+                        type=float,
+                        default=10.0)
+
+    return parser.parse_args()
+
+
+# --------------------------------------------------
+def main():
+    """Make a jazz noise here"""
+
+    args = get_args()
+    scale = 0.05 if args.quick else 1.0
+    results = run_all(scale)
+
+    print(f'\n{"Benchmark":<28} {"Result":>14}')
+    for name, res in results['benchmarks'].items():
+        print(f'{name:<28} {res["value"]:>14,.2f} {res["unit"]}')
+
+    if args.outfile:
+        json.dump(results, args.outfile, indent=2)
+        args.outfile.write('\n')
+
+    if args.baseline:
+        changes = compare(json.load(args.baseline), results, args.threshold)
+        print(f'\n{"Benchmark":<28} {"Change":>8}')
+        for name, change, regressed in changes:
+            flag = '  REGRESSION' if regressed else ''
+            print(f'{name:<28} {change:>+7.1f}%{flag}')
+        if any(regressed for _, _, regressed in changes):
+            sys.exit(1)
+    print()
+
+
+# --------------------------------------------------
+def run_all(scale):
+    """ Run every benchmark. scale shrinks or grows the workloads """
+    benchmarks = {}
+
+    def record(name, value, unit, better):
+        benchmarks[name] = {'value': value, 'unit': unit, 'better': better}
+
+    record('cli_cold_start', cold_start(max(3, int(20 * scale))),
+           'ms', 'lower')
+
+    reps = max(1000, int(100000 * scale))
+    for name, func in step_functions().items():
+        record(f'{name}_latency', per_call(func, reps), 'us', 'lower')
+
+    record('roll_batch_throughput',
+           throughput(lambda n: roll_batch(n, adv=True), int(2e6 * scale)),
+           'rolls/s', 'higher')
+
+    record('stream_throughput',
+           throughput(stream_workload, max(1000, int(50000 * scale))),
+           'rolls/s', 'higher')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = synthetic_roster(tmp, max(100, int(10000 * scale)))
+        record('party_throughput',
+               throughput(lambda n: roll_party(files[:n], 'perc', 'check',
+                                               False, False, 1),
+                          len(files)),
+               'rolls/s', 'higher')
+
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'benchmarks': benchmarks}
+
+
+# --------------------------------------------------
+def step_functions():
+    """ The individual steps of a roll, each as a no-argument callable """
+    line = 'str:9, dex:20, con:14, int:10, wis:8, cha:16'
+    scores = read_dict(line, SHEET)
+    profs = {'ste': 2, 'soh': 2, 'dec': 2}
+    character = Character.load(SHEET)
+    sink = io.StringIO()
+
+    def quiet_calc_total():
+        sink.seek(0)
+        with contextlib.redirect_stdout(sink):
+            calc_total([17, 4, 17], '+', 15)
+
+    return {'read_dict': lambda: read_dict(line, SHEET),
+            'resolve': lambda: calc_mod(scores, determine_ability('ste'),
+                                        calc_prof('ste', profs, 5)),
+            'character_lookup': lambda: character.modifier('ste', 'check'),
+            'roll_dice': lambda: roll_dice(True, False, None),
+            'calc_total': quiet_calc_total}
+
+
+# --------------------------------------------------
+def cold_start(runs):
+    """ Median wall time, in ms, of running rolls.py once """
+    cmd = [sys.executable, os.path.join(HERE, 'rolls.py'), SHEET,
+           'ste', 'check', '-s', '3']
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, cwd=HERE)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+# --------------------------------------------------
+def per_call(func, reps):
+    """ Best of five runs of reps calls, in microseconds per call """
+    best = float('inf')
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(reps):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return best / reps * 1e6
+
+
+# --------------------------------------------------
+def throughput(func, num):
+    """ Best of three runs of func(num), in items per second """
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        func(num)
+        best = min(best, time.perf_counter() - start)
+    return num / best
+
+
+# --------------------------------------------------
+def stream_workload(num):
+    """ Push num JSON requests through stream.roll_stream """
+    line = json.dumps({'character': SHEET, 'roll_for': 'ste',
+                       'roll_type': 'check', 'adv': True}) + '\n'
+    for _ in roll_stream(line for _ in range(num)):
+        pass
+
+
+# --------------------------------------------------
+def synthetic_roster(folder, num, seed=1):
+    """ Write num random character sheets to folder and return their paths """
+    rng = random.Random(seed)
+    skills = ['acr', 'ath', 'dec', 'ins', 'perc', 'ste', 'sur']
+    files = []
+    for i in range(num):
+        scores = ', '.join(f'{a}:{rng.randint(3, 20)}' for a in
+                           ['str', 'dex', 'con', 'int', 'wis', 'cha'])
+        saves = ', '.join(f'{a}:1' for a in rng.sample(['str', 'dex', 'wis'],
+                                                       2))
+        profs = ', '.join(f'{s}:{rng.randint(1, 2)}' for s in
+                          rng.sample(skills, 3))
+        path = os.path.join(folder, f'npc{i:06}.txt')
+        with open(path, 'wt') as fh:
+            fh.write(f'{rng.randint(2, 6)}\n{scores}\n{saves}\n{profs}\n')
+        files.append(path)
+    return files
+
+
+# --------------------------------------------------
+def test_synthetic_roster(tmp_path):
+    """ test synthetic_roster() writes sheets rolls.py can read """
+    files = synthetic_roster(str(tmp_path), 5)
+    assert len(files) == 5
+    assert all(not r.error for r in
+               roll_party(files, 'ste', 'check', False, False, 1, 1))
+
+
+# --------------------------------------------------
+def compare(baseline, results, threshold):
+    """
+    Compare results to baseline. Returns (name, percent change, regressed)
+    for each benchmark in both, where a positive change is an improvement.
+    """
+    changes = []
+    for name, res in results['benchmarks'].items():
+        old = baseline['benchmarks'].get(name)
+        if not old or not old['value']:
+            continue
+        change = (res['value'] - old['value']) / old['value'] * 100
+        if res['better'] == 'lower':
+            change = -change
+        changes.append((name, change, change < -threshold))
+    return changes
+
+
+# --------------------------------------------------
+def test_compare():
+    """ test compare() """
+    old = {'benchmarks': {'a': {'value': 10.0, 'unit': 'ms',
+                                'better': 'lower'},
+                          'b': {'value': 100.0, 'unit': 'rolls/s',
+                                'better': 'higher'}}}
+    new = {'benchmarks': {'a': {'value': 12.0, 'unit': 'ms',
+                                'better': 'lower'},
+                          'b': {'value': 150.0, 'unit': 'rolls/s',
+                                'better': 'higher'},
+                          'c': {'value': 1.0, 'unit': 'ms',
+                                'better': 'lower'}}}
+
+    assert compare(old, new, 10) == [('a', -20.0, True), ('b', 50.0, False)]
+
+
+# --------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Compiled cache of parsed character files. Each sheet is stored as
+         one fixed-size binary record in a __rollcache__ directory next to
+         it, and is only re-parsed when its mtime or size changes.
+"""
+
+import os
+import struct
+from typing import NamedTuple
+
+from profiling import stage
+from rolls import ABILITIES, SKILLS, calc_all_mods, read_character
+from rules import RULES
+
+CACHE_DIR = '__rollcache__'
+MAGIC = b'RLC3'
+
+# magic, rules signature (the skill list the record was laid out for),
+# source mtime_ns, source size, prof bonus, scores, save profs,
+# skill profs, then every precomputed modifier (saves, then checks)
+MOD_KEYS = tuple((roll_type, roll_for) for roll_type in ('save', 'check')
+                 for roll_for in ABILITIES + SKILLS)
+
+SHEET_FORMAT = f'b{len(ABILITIES)}B{len(ABILITIES)}b{len(SKILLS)}b' \
+    f'{len(MOD_KEYS)}b'
+RECORD = struct.Struct('<4sIqq' + SHEET_FORMAT)
+
+
+class Sheet(NamedTuple):
+    """ A parsed character file plus its precomputed modifiers """
+    prof_bonus: int
+    scores: dict
+    save_profs: dict
+    skill_profs: dict
+    mods: dict
+
+
+# --------------------------------------------------
+def cache_path(file_name):
+    """ Where the compiled record for file_name lives """
+    folder, base = os.path.split(file_name)
+    return os.path.join(folder, CACHE_DIR, base + '.bin')
+
+
+# --------------------------------------------------
+def test_cache_path():
+    """ test cache_path() """
+    assert cache_path('inputs/rogue.txt') == \
+        os.path.join('inputs', CACHE_DIR, 'rogue.txt.bin')
+
+
+# --------------------------------------------------
+def load_sheet(file_name, stat=None):
+    """
+    Load a character file, from its compiled record when the record
+    matches the file's current mtime and size, otherwise by parsing the
+    text and (re)writing the record. stat: the file's os.stat(), if the
+    caller has it already.
+    """
+    stat = stat or os.stat(file_name)
+    with stage('read_cache'):
+        sheet = read_cache(cache_path(file_name), stat)
+    if sheet:
+        return sheet
+
+    with stage('parse'):
+        sheet = parse_sheet(file_name)
+    with stage('write_cache'):
+        write_cache(cache_path(file_name), stat, sheet)
+    return sheet
+
+
+# --------------------------------------------------
+def parse_sheet(file_name):
+    """ Parse a character file and work out all its modifiers """
+    with open(file_name, 'rt') as fh:
+        prof_bonus, scores, save_profs, skill_profs = \
+            read_character(fh, file_name)
+    return Sheet(prof_bonus, scores, save_profs, skill_profs,
+                 calc_all_mods(prof_bonus, scores, save_profs, skill_profs))
+
+
+# --------------------------------------------------
+def pack_sheet(sheet):
+    """
+    A sheet as the integers of SHEET_FORMAT. Raises ValueError for sheets
+    that don't fit the fixed layout (unknown keys, values out of range).
+    """
+    if set(sheet.scores) - set(ABILITIES) \
+            or set(sheet.save_profs) - set(ABILITIES) \
+            or set(sheet.skill_profs) - set(SKILLS):
+        raise ValueError('Sheet has unknown abilities or skills.')
+    try:
+        fields = (sheet.prof_bonus,
+                  *[sheet.scores[a] for a in ABILITIES],
+                  *[sheet.save_profs.get(a, 0) for a in ABILITIES],
+                  *[sheet.skill_profs.get(k, 0) for k in SKILLS],
+                  *[sheet.mods[k] for k in MOD_KEYS])
+        struct.pack('<' + SHEET_FORMAT, *fields)
+    except KeyError as err:
+        raise ValueError(f'Sheet is missing {err}.') from None
+    except struct.error:
+        raise ValueError('Sheet has values out of range.') from None
+    return fields
+
+
+# --------------------------------------------------
+def unpack_sheet(fields):
+    """ pack_sheet() in reverse """
+    pos = 1
+    scores = dict(zip(ABILITIES, fields[pos:pos + len(ABILITIES)]))
+    pos += len(ABILITIES)
+    save_profs = {k: v for k, v in
+                  zip(ABILITIES, fields[pos:pos + len(ABILITIES)]) if v}
+    pos += len(ABILITIES)
+    skill_profs = {k: v for k, v in
+                   zip(SKILLS, fields[pos:pos + len(SKILLS)]) if v}
+    pos += len(SKILLS)
+    mods = dict(zip(MOD_KEYS, fields[pos:]))
+
+    return Sheet(fields[0], scores, save_profs, skill_profs, mods)
+
+
+# --------------------------------------------------
+def read_cache(path, stat):
+    """ Return the cached Sheet at path, or None if missing or stale """
+    try:
+        with open(path, 'rb') as fh:
+            data = fh.read()
+        fields = RECORD.unpack(data)
+    except (OSError, struct.error):
+        return None
+
+    if fields[:4] != (MAGIC, RULES.signature, stat.st_mtime_ns,
+                      stat.st_size):
+        return None
+    return unpack_sheet(fields[4:])
+
+
+# --------------------------------------------------
+def write_cache(path, stat, sheet):
+    """
+    Write the compiled record for sheet. Sheets that don't fit the fixed
+    layout (unknown keys, values out of range) are simply not cached, as
+    are sheets in directories we can't write to.
+    """
+    try:
+        record = RECORD.pack(MAGIC, RULES.signature, stat.st_mtime_ns,
+                             stat.st_size, *pack_sheet(sheet))
+    except ValueError:
+        return
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as fh:
+            fh.write(record)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+# --------------------------------------------------
+def test_load_sheet(tmp_path):
+    """ test load_sheet() writes, reuses and invalidates the cache """
+    sheet_file = tmp_path / 'rogue.txt'
+    with open('inputs/rogue.txt', 'rt') as fh:
+        sheet_file.write_text(fh.read())
+
+    first = load_sheet(str(sheet_file))
+    assert os.path.isfile(cache_path(str(sheet_file)))
+    assert load_sheet(str(sheet_file)) == first
+    assert first.mods[('check', 'ste')] == 15
+
+    sheet_file.write_text('6\nstr:9, dex:20, con:14, int:10, wis:8, cha:16\n'
+                          'dex:1, int:1\nste:2\n')
+    second = load_sheet(str(sheet_file))
+    assert second.prof_bonus == 6
+    assert second.mods[('check', 'ste')] == 17
+    assert second.skill_profs == {'ste': 2}
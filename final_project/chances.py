@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Chance of success for everyone in a roster at every save, ability
+         check and skill check, every DC from 1 to 30, with and without
+         advantage, in one dense table. The table is built once and cached
+         next to the roster until the roster changes, so asking who has the
+         best chance at something is a lookup.
+"""
+
+import argparse
+import hashlib
+import heapq
+import os
+import struct
+import sys
+from array import array
+from fractions import Fraction
+
+from batch import np
+from cache import CACHE_DIR, MOD_KEYS
+from errors import RollError
+from odds import d20_pmf
+from rolls import (ABBREVS, ABILITIES, ROLL_TYPES, describe_roll,
+                   std_abbrev)
+from roster import Roster
+from rules import HOMEBREW_ERROR
+
+MAGIC = b'CHANCE01'
+
+# magic, sha256 of the roster file, number of characters, number of rolls
+HEADER = struct.Struct('<8s32sII')
+
+# saves and checks that can be rolled: no skill saves
+ROLLS = tuple(key for key in MOD_KEYS
+              if key[0] == 'check' or key[1] in ABILITIES)
+ROLL_SLOTS = [MOD_KEYS.index(key) for key in ROLLS]
+
+# (adv, disadv) for each state, in table order
+STATES = ((False, False), (True, False), (False, True))
+DCS = range(1, 31)
+
+# chances are stored exactly, as counts out of DENOM: every d20 chance,
+# with or without advantage, is a whole number of 400ths
+DENOM = 400
+
+# TAILS[state][need]: count (out of DENOM) of kept d20s of need or more,
+# for need from 0 to 21
+TAILS = [[int(sum(chance for face, chance in d20_pmf(*flags).items()
+                  if face >= need) * DENOM) for need in range(22)]
+         for flags in STATES]
+
+
+class ChanceMatrix:
+    """
+    Chances for a list of characters, as counts out of DENOM in a dense
+    characters x ROLLS x STATES x DCS table: a NumPy array when NumPy is
+    installed, otherwise a flat array.array in the same order.
+    """
+
+    def __init__(self, names, counts):
+        self.names = names
+        self.counts = counts
+
+    def __len__(self):
+        return len(self.names)
+
+    def column(self, roll_for, roll_type, dc, adv=False, disadv=False):
+        """ Every character's count for one roll, in roster order """
+        roll, state, dc = _position(roll_for, roll_type, dc, adv, disadv)
+        if np is not None:
+            return self.counts[:, roll, state, dc]
+        stride = len(ROLLS) * len(STATES) * len(DCS)
+        offset = (roll * len(STATES) + state) * len(DCS) + dc
+        return self.counts[offset::stride]
+
+    def chance(self, name, roll_for, roll_type, dc, adv=False,
+               disadv=False):
+        """ Exact chance (a Fraction) of name succeeding """
+        column = self.column(roll_for, roll_type, dc, adv, disadv)
+        return Fraction(int(column[self.names.index(name)]), DENOM)
+
+    def top(self, roll_for, roll_type, dc, adv=False, disadv=False, k=1):
+        """
+        The k characters most likely to succeed, best first, as
+        (name, Fraction) pairs. Ties keep roster order.
+        """
+        column = self.column(roll_for, roll_type, dc, adv, disadv)
+        if np is not None:
+            best = np.argsort(-column.astype(np.int32), kind='stable')[:k]
+        else:
+            best = heapq.nlargest(k, range(len(column)),
+                                  key=column.__getitem__)
+        return [(self.names[i], Fraction(int(column[i]), DENOM))
+                for i in best]
+
+    def best(self, roll_for, roll_type, dc, adv=False, disadv=False):
+        """ (name, Fraction) of whoever is most likely to succeed """
+        return self.top(roll_for, roll_type, dc, adv, disadv, 1)[0]
+
+
+# --------------------------------------------------
+def _position(roll_for, roll_type, dc, adv, disadv):
+    """ Table indexes (roll, state, dc) for a roll. Raises RollError """
+    key = (ROLL_TYPES.get(roll_type, roll_type), std_abbrev(roll_for,
+                                                            ABBREVS))
+    if key not in ROLLS:
+        raise RollError(f'Unknown roll: {roll_for} {roll_type}')
+    if dc not in DCS:
+        raise RollError(f'DC {dc} is outside {DCS[0]}-{DCS[-1]}.')
+    if adv and disadv:
+        raise RollError('Cannot roll with advantage and disadvantage.')
+    return ROLLS.index(key), STATES.index((bool(adv), bool(disadv))), \
+        dc - DCS[0]
+
+
+# --------------------------------------------------
+def build_matrix(names, characters):
+    """ Work out the ChanceMatrix for a list of Characters """
+    if np is not None:
+        mods = np.array([[c.mods[i] for i in ROLL_SLOTS] for c in characters],
+                        dtype=np.int32).reshape(len(characters), len(ROLLS))
+        need = np.clip(np.asarray(DCS)[None, None, :] - mods[:, :, None],
+                       0, 21)
+        counts = np.asarray(TAILS, dtype=np.uint16)[:, need]
+        return ChanceMatrix(names, np.ascontiguousarray(
+            np.moveaxis(counts, 0, 2)))
+
+    # every roll with the same modifier has the same row, so build each
+    # modifier's row once and copy it
+    rows = {}
+    counts = array('H')
+    for character in characters:
+        for slot in ROLL_SLOTS:
+            mod = character.mods[slot]
+            row = rows.get(mod)
+            if row is None:
+                row = rows[mod] = array('H', [
+                    tails[max(0, min(21, dc - mod))]
+                    for tails in TAILS for dc in DCS])
+            counts.extend(row)
+    return ChanceMatrix(names, counts)
+
+
+# --------------------------------------------------
+def test_build_matrix():
+    """ test build_matrix() against odds.prob_at_least() """
+    from character import Character  # pylint: disable=C0415
+    from odds import prob_at_least, total_pmf  # pylint: disable=C0415
+
+    characters = [Character.load('inputs/cleric.txt'),
+                  Character.load('inputs/rogue.txt')]
+    matrix = build_matrix(['cleric', 'rogue'], characters)
+    assert len(matrix) == 2
+    for character in characters:
+        for roll_for, roll_type in [('ste', 'check'), ('wis', 'save'),
+                                    ('str', 'check'), ('ins', 'check')]:
+            mod = character.modifier(roll_for, roll_type)
+            for adv, disadv in STATES:
+                for dc in [1, 2, 9, 15, 22, 30]:
+                    assert matrix.chance(character.name, roll_for,
+                                         roll_type, dc, adv, disadv) == \
+                        prob_at_least(total_pmf(mod, adv, disadv), dc)
+
+    assert matrix.chance('rogue', 'stealth', 'skill', 30, adv=True) == \
+        Fraction(204, 400)
+    for args in [('ste', 'save', 10), ('ste', 'check', 31),
+                 ('history', 'check', 10)]:
+        try:
+            matrix.column(*args)
+            assert False, args
+        except RollError:
+            pass
+
+
+# --------------------------------------------------
+def test_top():
+    """ test top() and best() order by chance, ties in roster order """
+    from character import Character  # pylint: disable=C0415
+
+    cleric = Character.load('inputs/cleric.txt')
+    rogue = Character.load('inputs/rogue.txt')
+    names = [f'npc {i}' for i in range(6)]
+    matrix = build_matrix(names, [cleric, rogue, cleric, rogue, rogue,
+                                  cleric])
+    assert matrix.best('ste', 'check', 20) == ('npc 1', Fraction(4, 5))
+    assert [name for name, _ in matrix.top('wis', 'save', 20, k=4)] == \
+        ['npc 0', 'npc 2', 'npc 5', 'npc 1']
+    assert len(matrix.top('wis', 'save', 20, k=10)) == 6
+
+
+# --------------------------------------------------
+def chances_path(roster_path):
+    """ Where the cached table for a roster lives """
+    folder, base = os.path.split(roster_path)
+    return os.path.join(folder, CACHE_DIR, base + '.chances')
+
+
+# --------------------------------------------------
+def read_chances(path, digest, names):
+    """
+    The cached ChanceMatrix at path, or None if it is missing or was built
+    from different roster contents
+    """
+    try:
+        with open(path, 'rb') as fh:
+            data = fh.read()
+        magic, key, count, rolls = HEADER.unpack_from(data)
+    except (OSError, struct.error):
+        return None
+    size = count * rolls * len(STATES) * len(DCS)
+    if (magic, key, count, rolls) != (MAGIC, digest, len(names),
+                                      len(ROLLS)) \
+            or len(data) != HEADER.size + 2 * size:
+        return None
+
+    if np is not None:
+        counts = np.frombuffer(data, '<u2', size, HEADER.size)
+        return ChanceMatrix(names, counts.astype(np.uint16).reshape(
+            count, rolls, len(STATES), len(DCS)))
+    counts = array('H')
+    counts.frombytes(data[HEADER.size:])
+    if sys.byteorder == 'big':
+        counts.byteswap()
+    return ChanceMatrix(names, counts)
+
+
+# --------------------------------------------------
+def write_chances(path, digest, matrix):
+    """ Cache a ChanceMatrix. Directories we can't write to are skipped """
+    if np is not None:
+        data = matrix.counts.astype('<u2').tobytes()
+    else:
+        counts = array('H', matrix.counts)
+        if sys.byteorder == 'big':
+            counts.byteswap()
+        data = counts.tobytes()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as fh:
+            fh.write(HEADER.pack(MAGIC, digest, len(matrix), len(ROLLS)))
+            fh.write(data)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+# --------------------------------------------------
+def load_chances(roster_path, rebuild=False):
+    """
+    The ChanceMatrix for everyone in a roster, from the cache when it was
+    built from the roster as it is now. Raises OSError or ValueError for
+    a roster that can't be opened.
+    """
+    with Roster(roster_path) as roster:
+        digest = hashlib.sha256(roster.data).digest()
+        names = roster.names()
+        path = chances_path(roster_path)
+        matrix = None if rebuild else read_chances(path, digest, names)
+        if matrix is None:
+            matrix = build_matrix(names, [roster[name] for name in names])
+            write_chances(path, digest, matrix)
+    return matrix
+
+
+# --------------------------------------------------
+def test_load_chances(tmp_path):
+    """ test the table is cached, reused, and rebuilt for a new roster """
+    from cache import parse_sheet  # pylint: disable=C0415
+    from roster import build, write_roster  # pylint: disable=C0415
+
+    path = str(tmp_path / 'party.roster')
+    build(path, ['inputs/cleric.txt', 'inputs/rogue.txt'])
+    built = load_chances(path)
+    assert os.path.isfile(chances_path(path))
+
+    with Roster(path) as roster:
+        digest = hashlib.sha256(roster.data).digest()
+    cached = read_chances(chances_path(path), digest, ['cleric', 'rogue'])
+    assert cached is not None
+    assert list(cached.counts.ravel() if np is not None else cached.counts) \
+        == list(built.counts.ravel() if np is not None else built.counts)
+    assert read_chances(chances_path(path), b'x' * 32,
+                        ['cleric', 'rogue']) is None
+    assert load_chances(path).best('ste', 'check', 15)[0] == 'rogue'
+
+    write_roster(path, [('a', parse_sheet('inputs/cleric.txt')),
+                        ('b', parse_sheet('inputs/cleric.txt')),
+                        ('c', parse_sheet('inputs/rogue.txt'))])
+    matrix = load_chances(path)
+    assert matrix.names == ['a', 'b', 'c']
+    assert matrix.best('ste', 'check', 15)[0] == 'c'
+
+
+# --------------------------------------------------
+def get_args():
+    """Get command-line arguments"""
+
+    parser = argparse.ArgumentParser(
+        description='Who in a roster is most likely to make a roll',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('roster',
+                        help='Roster file (see roster.py)',
+                        metavar='FILE')
+
+    parser.add_argument('roll',
+                        help='What to roll, e.g. "ins check"',
+                        metavar='STR',
+                        nargs=2)
+
+    parser.add_argument('--dc',
+                        metavar='int',
+                        help='Difficulty class, from 1 to 30',
+                        type=int,
+                        required=True)
+
+    dis_adv = parser.add_mutually_exclusive_group()
+    dis_adv.add_argument('-a',
+                         '--advantage',
+                         help='Roll twice and take the higher number',
+                         action='store_true')
+
+    dis_adv.add_argument('-d',
+                         '--disadvantage',
+                         help='Roll twice and take the lower number',
+                         action='store_true')
+
+    parser.add_argument('-k',
+                        '--top',
+                        metavar='int',
+                        help='How many characters to list',
+                        type=int,
+                        default=3)
+
+    parser.add_argument('--rebuild',
+                        help='Work the table out again even if it is cached',
+                        action='store_true')
+
+    args = parser.parse_args()
+    if HOMEBREW_ERROR:
+        parser.error(HOMEBREW_ERROR)
+    roll_for, roll_type = args.roll
+    if roll_type not in ROLL_TYPES:
+        parser.error(f'Unknown roll type "{roll_type}", choose from '
+                     f'{", ".join(ROLL_TYPES)}')
+    args.roll_for = std_abbrev(roll_for, ABBREVS)
+    args.roll_type = ROLL_TYPES[roll_type]
+    if (args.roll_type, args.roll_for) not in ROLLS:
+        parser.error(f'Unknown roll "{roll_for} {roll_type}"')
+    if args.dc not in DCS:
+        parser.error(f'--dc "{args.dc}" must be from {DCS[0]} to '
+                     f'{DCS[-1]}')
+    if args.top < 1:
+        parser.error(f'--top "{args.top}" must be greater than 0')
+
+    return args
+
+
+# --------------------------------------------------
+def main():
+    """Make a jazz noise here"""
+
+    args = get_args()
+    try:
+        matrix = load_chances(args.roster, args.rebuild)
+    except (OSError, ValueError) as err:
+        sys.exit(str(err))
+    if not len(matrix):
+        sys.exit(f'{args.roster} has no characters.')
+
+    roll = describe_roll(args.roll_for, args.roll_type, args.advantage,
+                         args.disadvantage, ABBREVS)
+    best = matrix.top(args.roll_for, args.roll_type, args.dc,
+                      args.advantage, args.disadvantage, args.top)
+    print(f'\nBest chances of making {roll} at DC {args.dc}:\n')
+    width = max(len(name) for name, _ in best)
+    for num, (name, chance) in enumerate(best, start=1):
+        print(f'{num:>2}. {name:<{width}}  {float(chance):7.2%}')
+    print()
+
+
+# --------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: A character with every save, ability check and skill check
+         modifier worked out once, so a roll is one lookup plus a die roll.
+"""
+
+import os
+from array import array
+
+from profiling import stage
+from cache import MOD_KEYS, load_sheet
+from errors import RollError
+from rolls import ABBREVS, ROLL_TYPES, roll_dice
+
+# (roll_type, roll_for) -> position in Character.mods, for every spelling
+# the command line accepts, e.g. ('saving throw', 'dexterity')
+SLOTS = {}
+for _slot, (_type, _for) in enumerate(MOD_KEYS):
+    for _type_alias in [t for t, v in ROLL_TYPES.items() if v == _type]:
+        for _for_alias in [_for] + [k for k, v in ABBREVS.items()
+                                    if v == _for]:
+            SLOTS[(_type_alias, _for_alias)] = _slot
+
+
+class Character:
+    """
+    A loaded character sheet.
+    name: file name without directory or extension
+    mods: array of final modifiers, indexed through SLOTS
+    stamp: (mtime_ns, size) of the file as loaded, or None when it didn't
+        come from a file
+    """
+    __slots__ = ('name', 'prof_bonus', 'scores', 'save_profs',
+                 'skill_profs', 'mods', 'stamp')
+
+    def __init__(self, name, sheet, stamp=None):
+        self.name = name
+        self.prof_bonus = sheet.prof_bonus
+        self.scores = sheet.scores
+        self.save_profs = sheet.save_profs
+        self.skill_profs = sheet.skill_profs
+        self.mods = array('b', [sheet.mods[key] for key in MOD_KEYS])
+        self.stamp = stamp
+
+    @classmethod
+    def load(cls, file_name):
+        """ Load a character file (through the compiled cache) """
+        name = os.path.splitext(os.path.basename(file_name))[0]
+        stat = os.stat(file_name)
+        return cls(name, load_sheet(file_name, stat),
+                   (stat.st_mtime_ns, stat.st_size))
+
+    def modifier(self, roll_for, roll_type):
+        """ Total modifier for a roll, e.g. modifier('ste', 'check') """
+        try:
+            return self.mods[SLOTS[(roll_type, roll_for)]]
+        except KeyError:
+            raise RollError(f'Unknown roll: {roll_for} {roll_type}') \
+                from None
+
+    def roll(self, roll_for, roll_type, adv=False, disadv=False, seed=None,
+             rng=None):
+        """ Roll a check or save. Returns (rolls, mod) like roll_dice """
+        with stage('resolve'):
+            mod = self.modifier(roll_for, roll_type)
+        with stage('roll_dice'):
+            return roll_dice(adv, disadv, seed, rng), mod
+
+    def __repr__(self):
+        return f'Character({self.name!r})'
+
+
+# --------------------------------------------------
+def test_modifier():
+    """ test Character.modifier() against the step-by-step calculation """
+    rogue = Character.load('inputs/rogue.txt')
+
+    assert rogue.name == 'rogue'
+    assert rogue.modifier('ste', 'check') == 15
+    assert rogue.modifier('stealth', 'skill') == 15
+    assert rogue.modifier('dexterity', 'save') == 10
+    assert rogue.modifier('intimidation', 'c') == 8
+    assert rogue.modifier('int', 'saving throw') == 5
+    assert rogue.modifier('str', 's') == 0
+
+
+# --------------------------------------------------
+def test_roll():
+    """ test Character.roll() """
+    cleric = Character.load('inputs/cleric.txt')
+
+    assert cleric.roll('str', 'save', seed=3) == ([8], 1)
+    assert cleric.roll('int', 'save', adv=True, seed=3) == ([19, 8, 19], -1)
+    try:
+        cleric.modifier('history', 'check')
+        assert False
+    except ValueError as err:
+        assert str(err) == 'Unknown roll: history check'
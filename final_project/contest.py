@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Contested checks (grapples, Stealth against Perception, ...)
+         between two sides, pairing attackers and defenders one to one or
+         every attacker against every defender. Winners are found for
+         whole sides at once, and each pairing's exact chance of winning
+         comes from the d20 distributions.
+"""
+
+import argparse
+import random
+import sys
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from fractions import Fraction
+from functools import lru_cache
+from typing import NamedTuple
+
+from batch import np, roll_batch
+from character import Character
+from errors import RollError, SheetError
+from initiative import unique_names
+from odds import d20_pmf
+from party import find_sheets
+from rng import BACKENDS, make_rng
+from rolls import ABBREVS, ROLL_TYPES, describe_roll, std_abbrev
+from roster import Roster
+from rules import HOMEBREW_ERROR
+
+# a modifier lead this big (or more) decides the contest before the dice:
+# the worst roll plus the lead still beats the best roll of the other side
+MAX_LEAD = 20
+
+
+class Odds(NamedTuple):
+    """ Exact chances of the attacker winning, tying and losing """
+    win: Fraction
+    tie: Fraction
+    lose: Fraction
+
+
+class Contest(NamedTuple):
+    """
+    One round of a contest. totals_a and totals_b are each side's check
+    totals; wins and ties count, for each attacker, the defenders they
+    beat and tied (0 or 1 each when paired one to one).
+    """
+    totals_a: object
+    totals_b: object
+    wins: object
+    ties: object
+
+
+# --------------------------------------------------
+@lru_cache(maxsize=None)
+def lead_odds(lead, adv_a=False, disadv_a=False, adv_b=False,
+              disadv_b=False):
+    """
+    Odds for an attacker whose modifier is lead more than the defender's.
+    Ties go to neither side: in a tie the situation stays as it was.
+    """
+    lead = max(-MAX_LEAD, min(MAX_LEAD, lead))
+    pmf_b = d20_pmf(adv_b, disadv_b)
+    win = tie = Fraction(0)
+    for roll_a, chance_a in d20_pmf(adv_a, disadv_a).items():
+        for roll_b, chance_b in pmf_b.items():
+            if roll_a + lead > roll_b:
+                win += chance_a * chance_b
+            elif roll_a + lead == roll_b:
+                tie += chance_a * chance_b
+    return Odds(win, tie, 1 - win - tie)
+
+
+# --------------------------------------------------
+def test_lead_odds():
+    """ test lead_odds() """
+    assert lead_odds(0) == Odds(Fraction(19, 40), Fraction(1, 20),
+                                Fraction(19, 40))
+    assert lead_odds(19) == Odds(Fraction(399, 400), Fraction(1, 400), 0)
+    assert lead_odds(25) == lead_odds(20) == Odds(1, 0, 0)
+    assert lead_odds(-20) == Odds(0, 0, 1)
+
+    # advantage against disadvantage mirrors the other way round
+    assert lead_odds(3, True, False, False, True) == \
+        lead_odds(-3, False, True, True, False)[::-1]
+    for lead in range(-21, 22):
+        assert sum(lead_odds(lead, False, True, True, False)) == 1
+
+
+# --------------------------------------------------
+def odds_table(adv_a=False, disadv_a=False, adv_b=False, disadv_b=False):
+    """
+    ([chance of winning], [chance of tying]) as floats for every lead from
+    -MAX_LEAD to MAX_LEAD, indexed by lead + MAX_LEAD
+    """
+    odds = [lead_odds(lead, adv_a, disadv_a, adv_b, disadv_b)
+            for lead in range(-MAX_LEAD, MAX_LEAD + 1)]
+    return [float(o.win) for o in odds], [float(o.tie) for o in odds]
+
+
+# --------------------------------------------------
+def pair_odds(mods_a, mods_b, adv_a=False, disadv_a=False, adv_b=False,
+              disadv_b=False):
+    """
+    (win chances, tie chances) for attacker i against defender i, for
+    every i. A lookup per pairing: the odds only depend on the lead.
+    """
+    win, tie = odds_table(adv_a, disadv_a, adv_b, disadv_b)
+    if np is not None:
+        leads = np.clip(np.asarray(mods_a, dtype=np.int32) -
+                        np.asarray(mods_b, dtype=np.int32),
+                        -MAX_LEAD, MAX_LEAD) + MAX_LEAD
+        return np.asarray(win)[leads], np.asarray(tie)[leads]
+    leads = [max(-MAX_LEAD, min(MAX_LEAD, a - b)) + MAX_LEAD
+             for a, b in zip(mods_a, mods_b)]
+    return [win[i] for i in leads], [tie[i] for i in leads]
+
+
+# --------------------------------------------------
+def cross_odds(mods_a, mods_b, adv_a=False, disadv_a=False, adv_b=False,
+               disadv_b=False):
+    """
+    (expected wins, expected ties) for each attacker against every
+    defender. Defenders are grouped by modifier, so the work grows with
+    the number of different modifiers, not the number of pairings.
+    """
+    win, tie = odds_table(adv_a, disadv_a, adv_b, disadv_b)
+    groups = Counter(mods_b).items()
+    expected = {}
+    for mod in set(mods_a):
+        leads = [(max(-MAX_LEAD, min(MAX_LEAD, mod - mod_b)) + MAX_LEAD,
+                  count) for mod_b, count in groups]
+        expected[mod] = (sum(win[i] * count for i, count in leads),
+                         sum(tie[i] * count for i, count in leads))
+    return [expected[mod][0] for mod in mods_a], \
+        [expected[mod][1] for mod in mods_a]
+
+
+# --------------------------------------------------
+def test_pair_and_cross_odds():
+    """ test pair_odds() and cross_odds() against lead_odds() """
+    mods_a = [15, 2, 0, -1, 40]
+    mods_b = [2, 15, 0, 4, -5]
+    win, tie = pair_odds(mods_a, mods_b, True, False, False, False)
+    for i, (mod_a, mod_b) in enumerate(zip(mods_a, mods_b)):
+        odds = lead_odds(mod_a - mod_b, True, False, False, False)
+        assert abs(win[i] - odds.win) < 1e-12
+        assert abs(tie[i] - odds.tie) < 1e-12
+
+    wins, ties = cross_odds(mods_a, mods_b + [2])
+    for i, mod_a in enumerate(mods_a):
+        odds = [lead_odds(mod_a - mod_b) for mod_b in mods_b + [2]]
+        assert abs(wins[i] - float(sum(o.win for o in odds))) < 1e-9
+        assert abs(ties[i] - float(sum(o.tie for o in odds))) < 1e-9
+    assert wins[4] == 6.0
+
+
+# --------------------------------------------------
+def roll_contest(mods_a, mods_b, adv_a=False, disadv_a=False, adv_b=False,
+                 disadv_b=False, rng=None, cross=False):
+    """
+    Roll everyone's check once and settle the contests. Pairs attacker i
+    with defender i, or with cross every attacker with every defender;
+    then the defenders' totals are sorted once and each attacker's wins
+    and ties are found by binary search instead of pairing by pairing.
+    Raises ValueError if the sides differ in size without cross.
+    """
+    if not cross and len(mods_a) != len(mods_b):
+        raise ValueError(f'Cannot pair {len(mods_a)} attackers with '
+                         f'{len(mods_b)} defenders one to one.')
+    kept_a = roll_batch(len(mods_a), adv_a, disadv_a, rng=rng).kept
+    kept_b = roll_batch(len(mods_b), adv_b, disadv_b, rng=rng).kept
+
+    if np is not None:
+        totals_a = np.asarray(kept_a, dtype=np.int32) + \
+            np.asarray(mods_a, dtype=np.int32)
+        totals_b = np.asarray(kept_b, dtype=np.int32) + \
+            np.asarray(mods_b, dtype=np.int32)
+        if not cross:
+            return Contest(totals_a, totals_b,
+                           (totals_a > totals_b).astype(np.int32),
+                           (totals_a == totals_b).astype(np.int32))
+        ordered = np.sort(totals_b)
+        below = np.searchsorted(ordered, totals_a, 'left')
+        return Contest(totals_a, totals_b, below,
+                       np.searchsorted(ordered, totals_a, 'right') - below)
+
+    totals_a = [roll + mod for roll, mod in zip(kept_a, mods_a)]
+    totals_b = [roll + mod for roll, mod in zip(kept_b, mods_b)]
+    if not cross:
+        return Contest(totals_a, totals_b,
+                       [int(a > b) for a, b in zip(totals_a, totals_b)],
+                       [int(a == b) for a, b in zip(totals_a, totals_b)])
+    ordered = sorted(totals_b)
+    wins = [bisect_left(ordered, total) for total in totals_a]
+    return Contest(totals_a, totals_b, wins,
+                   [bisect_right(ordered, total) - below
+                    for total, below in zip(totals_a, wins)])
+
+
+# --------------------------------------------------
+def test_roll_contest():
+    """ test roll_contest() against settling every pairing by hand """
+    mods_a = [i % 7 - 1 for i in range(300)]
+    mods_b = [i % 5 * 3 for i in range(200)]
+    round_ = roll_contest(mods_a, mods_b, True, False, False, False,
+                          random.Random(2), cross=True)
+    totals_a = [int(t) for t in round_.totals_a]
+    totals_b = [int(t) for t in round_.totals_b]
+    assert all(1 <= t - m <= 20 for t, m in zip(totals_a, mods_a))
+    assert [int(w) for w in round_.wins] == \
+        [sum(a > b for b in totals_b) for a in totals_a]
+    assert [int(t) for t in round_.ties] == \
+        [sum(a == b for b in totals_b) for a in totals_a]
+
+    round_ = roll_contest(mods_a[:200], mods_b, rng=random.Random(2))
+    assert [int(w) for w in round_.wins] == \
+        [int(a > b) for a, b in zip(round_.totals_a, round_.totals_b)]
+    assert [int(t) for t in round_.ties] == \
+        [int(a == b) for a, b in zip(round_.totals_a, round_.totals_b)]
+
+    try:
+        roll_contest(mods_a, mods_b)
+        assert False
+    except ValueError as err:
+        assert str(err) == 'Cannot pair 300 attackers with 200 defenders ' \
+            'one to one.'
+
+
+# --------------------------------------------------
+def test_roll_contest_odds():
+    """ test the rolled win rate agrees with the exact odds """
+    mods_a, mods_b = [5] * 20000, [7] * 20000
+    round_ = roll_contest(mods_a, mods_b, False, False, False, True,
+                          random.Random(9))
+    rate = sum(int(w) for w in round_.wins) / len(mods_a)
+    assert abs(rate - pair_odds([5], [7], False, False, False, True)[0][0]) \
+        < 0.015
+
+
+# --------------------------------------------------
+def load_side(paths, errors):
+    """
+    Characters from sheet files, directories, globs and roster files.
+    Sheets that can't be read are skipped and added to errors as
+    (file name, message).
+    """
+    characters = []
+    for file_name in find_sheets(paths):
+        if not file_name.endswith('.txt'):
+            try:
+                with Roster(file_name) as roster:
+                    characters.extend(roster[name]
+                                      for name in roster.names())
+                continue
+            except (OSError, ValueError):
+                pass
+        try:
+            characters.append(Character.load(file_name))
+        except OSError as err:
+            errors.append((file_name, err.strerror))
+        except SheetError as err:
+            errors.append((file_name, str(err)))
+    return characters
+
+
+# --------------------------------------------------
+def test_load_side(tmp_path):
+    """ test load_side() reads sheets and rosters """
+    from roster import build  # pylint: disable=C0415
+
+    path = str(tmp_path / 'party.roster')
+    build(path, ['inputs/cleric.txt', 'inputs/rogue.txt'])
+    errors = []
+    side = load_side([path, 'inputs'], errors)
+    assert [c.name for c in side] == ['cleric', 'rogue', 'cleric', 'rogue']
+    assert errors == [('inputs/bad.txt',
+                       'Non-integer value found in inputs/bad.txt.')]
+
+
+# --------------------------------------------------
+def get_args():
+    """Get command-line arguments"""
+
+    parser = argparse.ArgumentParser(
+        description='Settle contested checks between two sides',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('--attackers',
+                        help='Character files, directories, globs or '
+                        'rosters for the side making the contest',
+                        metavar='PATH',
+                        nargs='+',
+                        required=True)
+
+    parser.add_argument('--defenders',
+                        help='Character files, directories, globs or '
+                        'rosters for the side resisting it',
+                        metavar='PATH',
+                        nargs='+',
+                        required=True)
+
+    parser.add_argument('-r',
+                        '--roll',
+                        metavar='STR',
+                        help='What the attackers roll, e.g. "ste check"',
+                        nargs=2,
+                        required=True)
+
+    parser.add_argument('--against',
+                        metavar='STR',
+                        help='What the defenders roll (default: the same '
+                        'as the attackers)',
+                        nargs=2)
+
+    parser.add_argument('--all',
+                        help='Every attacker against every defender, '
+                        'instead of pairing them in order',
+                        action='store_true')
+
+    dis_adv = parser.add_mutually_exclusive_group()
+    dis_adv.add_argument('-a',
+                         '--advantage',
+                         help='Attackers roll with advantage',
+                         action='store_true')
+
+    dis_adv.add_argument('-d',
+                         '--disadvantage',
+                         help='Attackers roll with disadvantage',
+                         action='store_true')
+
+    def_adv = parser.add_mutually_exclusive_group()
+    def_adv.add_argument('--defender-advantage',
+                         help='Defenders roll with advantage',
+                         action='store_true')
+
+    def_adv.add_argument('--defender-disadvantage',
+                         help='Defenders roll with disadvantage',
+                         action='store_true')
+
+    parser.add_argument('-s',
+                        '--seed',
+                        metavar='seed',
+                        help='Optional seed value for testing',
+                        type=int)
+
+    parser.add_argument('--rng',
+                        metavar='NAME',
+                        help='Random number generator: mt, pcg64 or system',
+                        choices=BACKENDS,
+                        default='mt')
+
+    parser.add_argument('-q',
+                        '--quiet',
+                        help='Only print the summary',
+                        action='store_true')
+
+    args = parser.parse_args()
+    if HOMEBREW_ERROR:
+        parser.error(HOMEBREW_ERROR)
+    args.roll_a = check_roll(parser, args.roll)
+    args.roll_b = check_roll(parser, args.against or args.roll)
+    if args.rng == 'system' and args.seed is not None:
+        parser.error('--seed cannot be used with --rng system')
+
+    return args
+
+
+# --------------------------------------------------
+def check_roll(parser, roll):
+    """ (roll_for, roll_type) in standard form, or a parser error """
+    roll_for, roll_type = roll
+    if roll_type not in ROLL_TYPES:
+        parser.error(f'Unknown roll type "{roll_type}", choose from '
+                     f'{", ".join(ROLL_TYPES)}')
+    std_for = std_abbrev(roll_for, ABBREVS)
+    if std_for not in ABBREVS.values():
+        parser.error(f'Unknown ability or skill "{roll_for}"')
+    return std_for, ROLL_TYPES[roll_type]
+
+
+# --------------------------------------------------
+def main():
+    """Make a jazz noise here"""
+
+    args = get_args()
+    errors = []
+    side_a = load_side(args.attackers, errors)
+    side_b = load_side(args.defenders, errors)
+    for file_name, message in errors:
+        print(f'Skipped {file_name}: {message}', file=sys.stderr)
+    if not side_a or not side_b:
+        sys.exit('Each side needs at least one character.')
+
+    try:
+        mods_a = [c.modifier(*args.roll_a) for c in side_a]
+        mods_b = [c.modifier(*args.roll_b) for c in side_b]
+        rng = make_rng(args.seed, args.rng)
+        flags = (args.advantage, args.disadvantage, args.defender_advantage,
+                 args.defender_disadvantage)
+        round_ = roll_contest(mods_a, mods_b, *flags, rng=rng,
+                              cross=args.all)
+    except (RollError, ValueError) as err:
+        sys.exit(str(err))
+
+    if args.all:
+        expected = cross_odds(mods_a, mods_b, *flags)
+    else:
+        expected = pair_odds(mods_a, mods_b, *flags)
+
+    names_a = unique_names(side_a)
+    names_b = unique_names(side_b)
+    roll_a = describe_roll(*args.roll_a, *flags[:2], ABBREVS)
+    roll_b = describe_roll(*args.roll_b, *flags[2:], ABBREVS)
+    print(f'\nAttackers made {roll_a}, defenders {roll_b}.\n')
+
+    if not args.quiet:
+        width_a = max(map(len, names_a))
+        width_b = max(map(len, names_b))
+        lines = []
+        for i, name in enumerate(names_a):
+            total = int(round_.totals_a[i])
+            if args.all:
+                lines.append(f'{name:<{width_a}} {total:>3}  beat '
+                             f'{int(round_.wins[i])}, tied '
+                             f'{int(round_.ties[i])} of {len(mods_b)}  '
+                             f'(expected {expected[0][i]:.1f} wins)')
+                continue
+            other = int(round_.totals_b[i])
+            winner = name if round_.wins[i] else \
+                'tie' if round_.ties[i] else names_b[i]
+            lines.append(f'{name:<{width_a}} {total:>3}  vs  '
+                         f'{names_b[i]:<{width_b}} {other:>3}  '
+                         f'{winner:<{max(width_a, width_b, 3)}}  '
+                         f'(win {expected[0][i]:.2%})')
+        sys.stdout.write('\n'.join(lines) + '\n\n')
+
+    pairings = len(mods_a) * len(mods_b) if args.all else len(mods_a)
+    wins = int(sum(round_.wins))
+    ties = int(sum(round_.ties))
+    print(f'Attackers won {wins} of {pairings} contests, defenders '
+          f'{pairings - wins - ties}, with {ties} '
+          f'tie{"s" if ties != 1 else ""}.')
+    print(f'Expected attacker wins {float(sum(expected[0])):.2f}, '
+          f'ties {float(sum(expected[1])):.2f}.\n')
+
+
+# --------------------------------------------------
+if __name__ == '__main__':
+    main()
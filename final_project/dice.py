@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Roll any dice expression, e.g. damage (8d6+5), ability scores
+         (4d6kh3) or a check with guidance (2d20kh1+1d4).
+"""
+
+import argparse
+import sys
+
+from notation import compile_expr
+from odds import expected_total, expr_pmf, prob_at_least
+from rng import BACKENDS, make_rng
+from rolls import print_odds_table
+
+
+# --------------------------------------------------
+def get_args():
+    """Get command-line arguments"""
+
+    parser = argparse.ArgumentParser(
+        description='Roll a dice expression',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('expr',
+                        metavar='EXPR',
+                        help='Dice expression, e.g. 4d6kh3 or 8d6+5')
+
+    parser.add_argument('-n',
+                        '--num',
+                        metavar='int',
+                        help='How many times to roll',
+                        type=int,
+                        default=1)
+
+    parser.add_argument('-s',
+                        '--seed',
+                        metavar='seed',
+                        help='Optional seed value for testing',
+                        type=int)
+
+    parser.add_argument('--rng',
+                        metavar='NAME',
+                        help='Random number generator: mt, pcg64 or system',
+                        choices=BACKENDS,
+                        default='mt')
+
+    parser.add_argument('-o',
+                        '--odds',
+                        help='Show the chance of each total instead of '
+                        'rolling',
+                        action='store_true')
+
+    parser.add_argument('--dc',
+                        metavar='int',
+                        help='Show the chance of a total of at least this '
+                        'instead of rolling',
+                        type=int)
+
+    args = parser.parse_args()
+    if args.num < 1:
+        parser.error(f'--num "{args.num}" must be greater than 0')
+    if args.rng == 'system' and args.seed is not None:
+        parser.error('--seed cannot be used with --rng system')
+
+    return args
+
+
+# --------------------------------------------------
+def main():
+    """Make a jazz noise here"""
+
+    args = get_args()
+    try:
+        plan = compile_expr(args.expr)
+        if args.odds or args.dc is not None:
+            pmf = expr_pmf(plan.text)
+    except ValueError as err:
+        sys.exit(str(err))
+
+    if args.odds or args.dc is not None:
+        print(f'\nOdds for {plan.text}.')
+        if args.dc is not None:
+            chance = float(prob_at_least(pmf, args.dc))
+            print(f'\nThe chance of a total of {args.dc} or more is '
+                  f'{chance:.2%}.')
+        else:
+            print_odds_table(pmf)
+            print()
+        print(f'The average is {float(expected_total(pmf)):.2f}.\n')
+        return
+
+    try:
+        rng = make_rng(args.seed, args.rng)
+    except ValueError as err:
+        sys.exit(str(err))
+    totals = [int(t) for t in plan.roll_many(args.num, rng)]
+    print(f'\nYou rolled {plan.text}.\n')
+    if len(totals) == 1:
+        print(f'Your total is {totals[0]}.\n')
+    else:
+        print(f'Your totals are {", ".join(map(str, totals))}.')
+        print(f'The average is {sum(totals) / len(totals):.1f}.\n')
+
+
+# --------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,14 @@
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Exceptions raised by the roll library. The command-line scripts
+         catch them and exit with their message.
+"""
+
+
+class RollError(ValueError):
+    """ A roll that can't be made, e.g. an unknown skill """
+
+
+class SheetError(RollError):
+    """ A character file that can't be read """
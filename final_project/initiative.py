@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Roll initiative (a Dexterity check) for everyone in an encounter
+         and run the turn order. Combatants can join or leave mid-combat
+         without the order being sorted again.
+"""
+
+import argparse
+import heapq
+import random
+import sys
+from itertools import count
+from typing import NamedTuple
+
+from batch import roll_batch
+from character import Character
+from errors import SheetError
+from party import find_sheets
+from rolls import calc_mod, calc_prof, determine_ability
+from roster import Roster
+from rules import HOMEBREW_ERROR
+
+
+class Combatant(NamedTuple):
+    """
+    One combatant's initiative. Higher totals go first; ties go to the
+    higher modifier, then the higher roll_off (a d20 rolled only to break
+    ties), then whoever joined first.
+    """
+    name: str
+    total: int
+    mod: int
+    roll_off: int
+
+
+class TurnQueue:
+    """
+    Turn order for an encounter, backed by two heaps: the combatants still
+    to act this round, and those who have acted. Turns are popped from the
+    first; each popped combatant goes onto the second in turn order, which
+    leaves it a valid heap, so starting a new round is just swapping the
+    two. Joining is a heap push and leaving is marked, not searched for.
+    """
+
+    def __init__(self, combatants=()):
+        self.seq = count()
+        self.entries = {}
+        self.waiting = []
+        self.acted = []
+        self.last = None
+        self.round = 1
+        for combatant in combatants:
+            self._check_name(combatant.name)
+            entry = self._entry(combatant)
+            self.entries[combatant.name] = entry
+            self.waiting.append(entry)
+        heapq.heapify(self.waiting)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def add(self, combatant):
+        """
+        Add a combatant mid-combat. If their initiative comes after the
+        turn being taken they act this round, otherwise from next round.
+        """
+        self._check_name(combatant.name)
+        entry = self._entry(combatant)
+        self.entries[combatant.name] = entry
+        if self.last is None or entry > self.last:
+            heapq.heappush(self.waiting, entry)
+        else:
+            heapq.heappush(self.acted, entry)
+
+    def remove(self, name):
+        """ Take a combatant out. Returns False if they weren't in """
+        return self.entries.pop(name, None) is not None
+
+    def next_turn(self):
+        """ The combatant whose turn is next. Raises IndexError if none """
+        if not self.entries:
+            raise IndexError('No one is left in the encounter.')
+        while True:
+            if not self.waiting:
+                self.waiting, self.acted = self.acted, []
+                self.last = None
+                self.round += 1
+            entry = heapq.heappop(self.waiting)
+            if self.entries.get(entry[-1].name) is entry:
+                self.acted.append(entry)
+                self.last = entry
+                return entry[-1]
+
+    def upcoming(self):
+        """ Who is still to act this round, in order """
+        return [entry[-1] for entry in sorted(self.waiting)
+                if self.entries.get(entry[-1].name) is entry]
+
+    def _entry(self, combatant):
+        """ Heap entry: smallest first means highest initiative first """
+        return (-combatant.total, -combatant.mod, -combatant.roll_off,
+                next(self.seq), combatant)
+
+    def _check_name(self, name):
+        """ Names must be unique so they can be removed by name """
+        if name in self.entries:
+            raise ValueError(f'"{name}" is already in the encounter.')
+
+
+# --------------------------------------------------
+def initiative_mod(character):
+    """ Initiative modifier: the character's Dexterity check modifier """
+    ability = determine_ability('dex')
+    prof = calc_prof('dex', character.skill_profs, character.prof_bonus)
+    return calc_mod(character.scores, ability, prof)[1]
+
+
+# --------------------------------------------------
+def roll_initiative(characters, names=None, rng=None):
+    """
+    Roll initiative for a list of characters, drawing all the dice in one
+    batch. Returns Combatants named after the characters, or after names.
+    """
+    if not characters:
+        return []
+    names = names or [c.name for c in characters]
+    rolls = roll_batch(len(characters), rng=rng).kept
+    roll_offs = roll_batch(len(characters), rng=rng).kept
+    combatants = []
+    for name, character, roll, roll_off in zip(names, characters, rolls,
+                                               roll_offs):
+        mod = initiative_mod(character)
+        combatants.append(Combatant(name, int(roll) + mod, mod,
+                                    int(roll_off)))
+    return combatants
+
+
+# --------------------------------------------------
+def test_initiative_mod():
+    """ test initiative_mod() """
+    rogue = Character.load('inputs/rogue.txt')
+    cleric = Character.load('inputs/cleric.txt')
+    assert initiative_mod(rogue) == rogue.modifier('dex', 'check') == 5
+    assert initiative_mod(cleric) == 2
+
+
+# --------------------------------------------------
+def test_turn_queue():
+    """ test turn order, ties, joining and leaving """
+    queue = TurnQueue([Combatant('a', 15, 2, 3), Combatant('b', 20, 0, 1),
+                       Combatant('c', 15, 4, 1), Combatant('d', 15, 2, 9),
+                       Combatant('e', 15, 2, 9)])
+    assert [c.name for c in queue.upcoming()] == ['b', 'c', 'd', 'e', 'a']
+    assert [queue.next_turn().name for _ in range(6)] == \
+        ['b', 'c', 'd', 'e', 'a', 'b']
+    assert queue.round == 2
+
+    # faster than c's turn: acts next round. Slower: acts this round
+    queue.add(Combatant('f', 25, 0, 1))
+    queue.add(Combatant('g', 1, 0, 1))
+    assert queue.remove('d') and not queue.remove('d')
+    assert 'd' not in queue and len(queue) == 6
+    assert [queue.next_turn().name for _ in range(7)] == \
+        ['c', 'e', 'a', 'g', 'f', 'b', 'c']
+    assert queue.round == 3
+
+    try:
+        queue.add(Combatant('a', 1, 0, 1))
+        assert False
+    except ValueError:
+        pass
+
+    for name in 'abcefg':
+        queue.remove(name)
+    try:
+        queue.next_turn()
+        assert False
+    except IndexError:
+        pass
+
+
+# --------------------------------------------------
+def test_roll_initiative():
+    """ test roll_initiative() """
+    rogue = Character.load('inputs/rogue.txt')
+    combatants = roll_initiative([rogue] * 500,
+                                 [f'rogue {i}' for i in range(500)],
+                                 random.Random(1))
+    assert all(6 <= c.total <= 25 and c.mod == 5 for c in combatants)
+    assert len({c.name for c in combatants}) == 500
+
+    queue = TurnQueue(combatants)
+    totals = [queue.next_turn() for _ in range(500)]
+    assert totals == sorted(combatants, key=lambda c: (-c.total, -c.roll_off))
+    assert queue.round == 1
+
+
+# --------------------------------------------------
+def get_args():
+    """Get command-line arguments"""
+
+    parser = argparse.ArgumentParser(
+        description='Roll initiative and show the turn order',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('sheets',
+                        help='Character files, directories or globs',
+                        metavar='FILE',
+                        nargs='*')
+
+    parser.add_argument('-r',
+                        '--roster',
+                        metavar='FILE',
+                        help='Also everyone in this roster')
+
+    parser.add_argument('-s',
+                        '--seed',
+                        metavar='seed',
+                        help='Optional seed value for testing',
+                        type=int)
+
+    args = parser.parse_args()
+    if HOMEBREW_ERROR:
+        parser.error(HOMEBREW_ERROR)
+    if not args.sheets and not args.roster:
+        parser.error('give character files or a --roster')
+
+    return args
+
+
+# --------------------------------------------------
+def main():
+    """Make a jazz noise here"""
+
+    args = get_args()
+    characters = []
+    for file_name in find_sheets(args.sheets):
+        try:
+            characters.append(Character.load(file_name))
+        except (OSError, SheetError) as err:
+            print(f'Skipped {file_name}: {err}', file=sys.stderr)
+    if args.roster:
+        try:
+            with Roster(args.roster) as roster:
+                characters.extend(roster[name] for name in roster.names())
+        except (OSError, ValueError) as err:
+            sys.exit(str(err))
+    if not characters:
+        sys.exit('No one could roll.')
+
+    rng = random.Random(args.seed) if args.seed is not None else None
+    queue = TurnQueue(roll_initiative(characters, unique_names(characters),
+                                      rng))
+    width = max(len(str(len(queue))), 2)
+    print('\nInitiative order:\n')
+    for num, combatant in enumerate(queue.upcoming(), start=1):
+        print(f'{num:>{width}}. {combatant.total:>3}  {combatant.name} '
+              f'({combatant.mod:+d})')
+    print()
+
+
+# --------------------------------------------------
+def unique_names(characters):
+    """
+    Character names, numbered where the same one appears again. A number
+    is skipped if that name is taken, e.g. by a character called 'rogue 2'.
+    """
+    taken = {character.name for character in characters}
+    seen = {}
+    names = []
+    for character in characters:
+        name = character.name
+        num = seen.get(name, 0) + 1
+        label = name
+        if num > 1:
+            while f'{name} {num}' in taken:
+                num += 1
+            label = f'{name} {num}'
+            taken.add(label)
+        seen[name] = num
+        names.append(label)
+    return names
+
+
+# --------------------------------------------------
+def test_unique_names():
+    """ test unique_names() """
+    rogue = Character.load('inputs/rogue.txt')
+    cleric = Character.load('inputs/cleric.txt')
+    assert unique_names([rogue, cleric, rogue, rogue]) == \
+        ['rogue', 'cleric', 'rogue 2', 'rogue 3']
+
+    second = Character.load('inputs/rogue.txt')
+    second.name = 'rogue 2'
+    names = unique_names([rogue, rogue, second, rogue, second])
+    assert names == ['rogue', 'rogue 3', 'rogue 2', 'rogue 4', 'rogue 2 2']
+    assert len(set(names)) == len(names)
+
+
+# --------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Dice notation such as 4d6kh3, 8d6+5 and 2d20kl1+1d4. Expressions
+         are compiled once into a plan (and cached), then rolled one at a
+         time or in bulk.
+"""
+
+import random
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+from batch import np
+
+MAX_DICE = 1000
+MAX_SIDES = 1000
+
+TERM_RE = re.compile(r'([+-])(?:(\d*)d(\d+)(?:(k[hl]|d[hl])(\d+))?|(\d+))')
+
+
+class Term(NamedTuple):
+    """
+    count dice with sides sides, keeping keep_count of the highest ('h')
+    or lowest ('l') when keep is set. sign is 1 or -1.
+    """
+    sign: int
+    count: int
+    sides: int
+    keep: str
+    keep_count: int
+
+
+class Plan(NamedTuple):
+    """ A compiled dice expression: dice terms plus a constant """
+    text: str
+    terms: tuple
+    constant: int
+
+    def roll(self, rng=None):
+        """ Roll once. Returns the total """
+        return int(self.roll_many(1, rng)[0])
+
+    def roll_many(self, num, rng=None):
+        """
+        Roll num times. Returns the totals as a NumPy array when NumPy is
+        available, otherwise a list. Generators with a dice() method of
+        their own (see rng.py) roll every die; others only seed NumPy's.
+        """
+        rng = rng or random
+        if np is not None:
+            gen = None if hasattr(rng, 'dice') else \
+                np.random.default_rng(rng.getrandbits(128))
+            totals = np.full(num, self.constant, dtype=np.int64)
+            for term in self.terms:
+                if gen is None:
+                    dice = np.asarray(rng.dice(num * term.count, term.sides),
+                                      dtype=np.int64).reshape(num, -1)
+                else:
+                    dice = gen.integers(1, term.sides + 1,
+                                        (num, term.count))
+                totals += term.sign * _keep_numpy(dice, term).sum(axis=1)
+            return totals
+
+        totals = [self.constant] * num
+        faces = range(1, max([t.sides for t in self.terms], default=1) + 1)
+        for term in self.terms:
+            if hasattr(rng, 'dice'):
+                dice = rng.dice(num * term.count, term.sides)
+            else:
+                dice = rng.choices(faces[:term.sides], k=num * term.count)
+            for i in range(num):
+                row = dice[i * term.count:(i + 1) * term.count]
+                totals[i] += term.sign * sum(_keep(row, term))
+        return totals
+
+    def bounds(self):
+        """ Smallest and largest possible totals """
+        low = high = self.constant
+        for term in self.terms:
+            kept = term.keep_count if term.keep else term.count
+            lo, hi = kept, kept * term.sides
+            low += lo if term.sign > 0 else -hi
+            high += hi if term.sign > 0 else -lo
+        return low, high
+
+
+# --------------------------------------------------
+def normalize(text):
+    """ Canonical spelling of an expression: lower case, no spaces """
+    return re.sub(r'\s+', '', text).lower()
+
+
+# --------------------------------------------------
+def compile_expr(text):
+    """ Compile text into a Plan, reusing an earlier compile if possible """
+    return _compile(normalize(text))
+
+
+# --------------------------------------------------
+@lru_cache(maxsize=1024)
+def _compile(text):
+    """
+    Parse a normalized expression. Raises ValueError for anything that
+    isn't a sum of dice terms and whole numbers.
+    """
+    if not text:
+        raise ValueError('Empty dice expression.')
+    body = text if text[0] in '+-' else '+' + text
+
+    terms = []
+    constant = 0
+    pos = 0
+    for match in TERM_RE.finditer(body):
+        if match.start() != pos:
+            break
+        pos = match.end()
+        sign, count, sides, keep, keep_count, number = match.groups()
+        sign = 1 if sign == '+' else -1
+        if number:
+            constant += sign * int(number)
+            continue
+
+        count = int(count) if count else 1
+        sides = int(sides)
+        if not 1 <= count <= MAX_DICE or not 1 <= sides <= MAX_SIDES:
+            raise ValueError(f'Dice out of range in "{text}" (at most '
+                             f'{MAX_DICE} dice of up to {MAX_SIDES} sides).')
+        if keep:
+            keep_count = int(keep_count)
+            if keep[0] == 'd':
+                # dropping n highest is keeping count - n lowest
+                keep = 'l' if keep[1] == 'h' else 'h'
+                keep_count = count - keep_count
+            else:
+                keep = keep[1]
+            if not 1 <= keep_count <= count:
+                raise ValueError(f'Cannot keep {keep_count} of {count} '
+                                 f'dice in "{text}".')
+        terms.append(Term(sign, count, sides, keep or '', keep_count or 0))
+
+    if pos != len(body):
+        raise ValueError(f'Bad dice expression "{text}".')
+    return Plan(text, tuple(terms), constant)
+
+
+# --------------------------------------------------
+def test_compile_expr():
+    """ test compile_expr() """
+    plan = compile_expr('4d6kh3')
+    assert plan.terms == (Term(1, 4, 6, 'h', 3),)
+    assert plan.bounds() == (3, 18)
+
+    plan = compile_expr(' 2d20KL1 + 1d4 ')
+    assert plan.text == '2d20kl1+1d4'
+    assert plan.terms == (Term(1, 2, 20, 'l', 1), Term(1, 1, 4, '', 0))
+    assert compile_expr('2d20kl1+1d4') is plan
+
+    assert compile_expr('8d6+5').bounds() == (13, 53)
+    assert compile_expr('d20-2').bounds() == (-1, 18)
+    assert compile_expr('4d6dl1').terms == (Term(1, 4, 6, 'h', 3),)
+    assert compile_expr('10-1d4').bounds() == (6, 9)
+
+    for bad in ['', '4x6', '2d20kh3', 'd', '5000d6', '1d6+', 'd0']:
+        try:
+            compile_expr(bad)
+            assert False, bad
+        except ValueError:
+            pass
+
+
+# --------------------------------------------------
+def check_expr(mod, adv, disadv):
+    """ The expression for a d20 check, e.g. check_expr(5, True, False) """
+    if adv:
+        dice = '2d20kh1'
+    elif disadv:
+        dice = '2d20kl1'
+    else:
+        dice = '1d20'
+    return f'{dice}{mod:+d}' if mod else dice
+
+
+# --------------------------------------------------
+def test_check_expr():
+    """ test check_expr() """
+    assert check_expr(5, True, False) == '2d20kh1+5'
+    assert check_expr(-1, False, True) == '2d20kl1-1'
+    assert check_expr(0, False, False) == '1d20'
+
+
+# --------------------------------------------------
+def _keep(row, term):
+    """ The dice of row that count toward the total """
+    if not term.keep:
+        return row
+    return sorted(row, reverse=term.keep == 'h')[:term.keep_count]
+
+
+# --------------------------------------------------
+def _keep_numpy(dice, term):
+    """ _keep() for a (rolls, dice) array """
+    if not term.keep:
+        return dice
+    dice = np.sort(dice, axis=1)
+    if term.keep == 'h':
+        return dice[:, -term.keep_count:]
+    return dice[:, :term.keep_count]
+
+
+# --------------------------------------------------
+def test_roll_many():
+    """ test Plan.roll_many() stays in bounds and is reproducible """
+    plan = compile_expr('4d6kh3+2d20kl1-1d4+1')
+    low, high = plan.bounds()
+    totals = list(plan.roll_many(5000, random.Random(1)))
+
+    assert totals == list(plan.roll_many(5000, random.Random(1)))
+    assert all(low <= t <= high for t in totals)
+    assert len(set(totals)) > 20
+    assert low <= compile_expr('4d6kh3').roll(random.Random(2)) <= high
+
+    # 4d6 keep highest 3 averages about 12.24
+    ability = compile_expr('4d6kh3').roll_many(20000, random.Random(3))
+    assert abs(sum(ability) / 20000 - 12.24) < 0.1
+
+
+# --------------------------------------------------
+def test_roll_many_own_dice():
+    """ test generators with a dice() method roll the dice themselves """
+
+    class Loaded(random.Random):
+        """ Every die shows its highest face but one """
+
+        def dice(self, count, sides):
+            """ count dice showing sides - 1 """
+            return [sides - 1] * count
+
+    assert list(compile_expr('3d6kl2+1d20-2').roll_many(
+        4, Loaded())) == [10 + 19 - 2] * 4
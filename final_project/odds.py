@@ -0,0 +1,323 @@
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Exact outcome distributions for d20 checks and dice expressions,
+         so the chance of beating a DC can be computed instead of estimated
+         by rolling.
+"""
+
+import itertools
+from fractions import Fraction
+from functools import lru_cache
+from math import comb
+from types import MappingProxyType
+
+from errors import RollError
+
+# polynomials with more coefficient pairs than this are multiplied by
+# packing them into big integers instead of term by term
+DIRECT_LIMIT = 2048
+
+# refuse distributions bigger than this (possible totals times bits per
+# count), keep-highest/lowest terms with more dice than MAX_KEEP_DICE, and
+# ones whose keep_work() is over MAX_KEEP_WORK (about a second)
+MAX_PMF_BITS = 4000000
+MAX_KEEP_DICE = 100
+MAX_KEEP_WORK = 5000000
+
+
+# --------------------------------------------------
+def d20_pmf(adv, disadv):
+    """
+    Probability mass function of the kept d20 as {face: Fraction}.
+    With advantage, face k is kept when both dice are at most k and at
+    least one is k: (2k - 1) / 400. Disadvantage mirrors that.
+    """
+    if adv:
+        return {k: Fraction(2 * k - 1, 400) for k in range(1, 21)}
+    if disadv:
+        return {k: Fraction(41 - 2 * k, 400) for k in range(1, 21)}
+    return {k: Fraction(1, 20) for k in range(1, 21)}
+
+
+# --------------------------------------------------
+def test_d20_pmf():
+    """ test d20_pmf() """
+    for adv, disadv in [(False, False), (True, False), (False, True)]:
+        assert sum(d20_pmf(adv, disadv).values()) == 1
+
+    assert d20_pmf(False, False)[7] == Fraction(1, 20)
+    assert d20_pmf(True, False)[20] == Fraction(39, 400)
+    assert d20_pmf(False, True)[20] == Fraction(1, 400)
+
+
+# --------------------------------------------------
+def total_pmf(mod, adv, disadv):
+    """
+    Probability mass function of the check total (kept d20 + mod).
+    mod: total modifier, as returned by rolls.calc_mod.
+    """
+    return {face + mod: chance
+            for face, chance in d20_pmf(adv, disadv).items()}
+
+
+# --------------------------------------------------
+def test_total_pmf():
+    """ test total_pmf() """
+    pmf = total_pmf(-1, False, False)
+    assert min(pmf) == 0
+    assert max(pmf) == 19
+    assert pmf[5] == Fraction(1, 20)
+
+
+# --------------------------------------------------
+def prob_at_least(pmf, dc):
+    """ Chance that a total drawn from pmf meets or beats dc """
+    return sum((chance for total, chance in pmf.items() if total >= dc),
+               Fraction(0))
+
+
+# --------------------------------------------------
+def test_prob_at_least():
+    """ test prob_at_least() """
+    assert prob_at_least(total_pmf(0, False, False), 11) == Fraction(1, 2)
+    assert prob_at_least(total_pmf(5, False, False), 1) == 1
+    assert prob_at_least(total_pmf(5, False, False), 26) == 0
+    # advantage on DC 11 with no modifier: 1 - (1/2)^2
+    assert prob_at_least(total_pmf(0, True, False), 11) == Fraction(3, 4)
+    assert prob_at_least(total_pmf(0, False, True), 11) == Fraction(1, 4)
+
+
+# --------------------------------------------------
+def expected_total(pmf):
+    """ Mean of the distribution """
+    return sum((total * chance for total, chance in pmf.items()), Fraction(0))
+
+
+# --------------------------------------------------
+def test_expected_total():
+    """ test expected_total() """
+    assert expected_total(total_pmf(2, False, False)) == Fraction(25, 2)
+    assert expected_total(total_pmf(0, True, False)) == Fraction(5530, 400)
+
+
+# --------------------------------------------------
+def expr_pmf(text):
+    """
+    Exact probability mass function of a dice expression such as '40d6'
+    or '4d6kh3+2', as a read-only {total: Fraction}. Results are cached by
+    the normalized expression, so repeated queries are free.
+    """
+    # notation loads NumPy, which d20 odds alone don't need
+    from notation import normalize  # pylint: disable=C0415
+    return _expr_pmf(normalize(text))
+
+
+# --------------------------------------------------
+@lru_cache(maxsize=512)
+def _expr_pmf(text):
+    """ expr_pmf() for normalized text """
+    from notation import compile_expr  # pylint: disable=C0415
+    offset, counts = expr_counts(compile_expr(text))
+    outcomes = sum(counts)
+    return MappingProxyType({offset + i: Fraction(n, outcomes)
+                             for i, n in enumerate(counts) if n})
+
+
+# --------------------------------------------------
+def test_expr_pmf():
+    """ test expr_pmf() """
+    assert expr_pmf('2d20kh1+3') == total_pmf(3, True, False)
+    assert expr_pmf('2d20kl1 - 1') == total_pmf(-1, False, True)
+    assert expr_pmf('1d20') == total_pmf(0, False, False)
+
+    pmf = expr_pmf('2d6')
+    assert pmf[7] == Fraction(6, 36)
+    assert pmf[2] == pmf[12] == Fraction(1, 36)
+
+    pmf = expr_pmf('40d6')
+    assert sum(pmf.values()) == 1
+    assert min(pmf) == 40 and max(pmf) == 240
+    assert pmf[40] == Fraction(1, 6 ** 40)
+    assert expected_total(pmf) == 140
+    assert expr_pmf('40D6') is pmf
+
+    # 4d6 keep highest 3: 1 way to get 3, 21 of 1296 ways to get 18
+    pmf = expr_pmf('4d6kh3')
+    assert pmf[3] == Fraction(1, 1296)
+    assert pmf[18] == Fraction(21, 1296)
+    assert expected_total(pmf) == Fraction(15869, 1296)
+
+    assert prob_at_least(expr_pmf('8d6+5'), 13) == 1
+    assert expr_pmf('1d4-1d4')[0] == Fraction(4, 16)
+
+    assert sum(expr_pmf('20d100kh10').values()) == 1
+    for too_big in ['1000d1000', '200d20kh100', '30d100kh15', '100d20kh99']:
+        try:
+            expr_pmf(too_big)
+            assert False, too_big
+        except RollError as err:
+            assert str(err) == f'"{too_big}" is too big for exact odds.'
+
+
+# --------------------------------------------------
+def expr_counts(plan):
+    """
+    Distribution of a compiled expression as (offset, counts), where
+    counts[i] is the number of equally likely outcomes totalling offset + i.
+    Raises RollError for expressions too big to work out exactly.
+    """
+    low, high = plan.bounds()
+    bits = sum(t.count * t.sides.bit_length() for t in plan.terms)
+    if (high - low + 1) * bits > MAX_PMF_BITS \
+            or any(t.keep and (t.count > MAX_KEEP_DICE
+                               or keep_work(t) > MAX_KEEP_WORK)
+                   for t in plan.terms):
+        raise RollError(f'"{plan.text}" is too big for exact odds.')
+
+    offset, counts = plan.constant, [1]
+    for term in plan.terms:
+        term_offset, term_counts = term_counts_of(term)
+        if term.sign < 0:
+            term_offset = -(term_offset + len(term_counts) - 1)
+            term_counts = term_counts[::-1]
+        offset += term_offset
+        counts = convolve(counts, term_counts)
+    return offset, counts
+
+
+# --------------------------------------------------
+def term_counts_of(term):
+    """ (offset, counts) for one dice term, ignoring its sign """
+    if not term.keep:
+        return term.count, power([1] * term.sides, term.count)
+    return keep_counts(term.count, term.sides, term.keep, term.keep_count)
+
+
+# --------------------------------------------------
+def keep_counts(count, sides, keep, keep_count):
+    """
+    (offset, counts) for rolling count dice and keeping the keep_count
+    highest ('h') or lowest ('l'). Faces are assigned from the kept end
+    inward: placing j of the remaining dice on a face can be done in
+    comb(remaining, j) ways and adds the face once for each of those dice
+    that is still kept. Once every kept die is placed the sum is settled,
+    and the other dice can go on any face still to come.
+    """
+    faces = range(sides, 0, -1) if keep == 'h' else range(1, sides + 1)
+    need = min(keep_count, count)
+    # ways[placed] = {kept sum: number of ways}, for placed < need
+    ways = [{} for _ in range(need)]
+    ways[0][0] = 1
+    sums = {}
+    for rest, face in zip(range(sides - 1, -1, -1), faces):
+        nxt = [{} for _ in range(need)]
+        for placed, row in enumerate(ways):
+            if not row:
+                continue
+            free, short = count - placed, need - placed
+            factors = [comb(free, j) for j in range(short)]
+            # short or more dice here, the others on the rest faces to come
+            done = (rest + 1) ** free - sum(factor * rest ** (free - j)
+                                            for j, factor in
+                                            enumerate(factors))
+            for total, num in row.items():
+                for j, factor in enumerate(factors):
+                    key = total + j * face
+                    nxt[placed + j][key] = nxt[placed + j].get(key, 0) + \
+                        num * factor
+                key = total + short * face
+                sums[key] = sums.get(key, 0) + num * done
+        ways = nxt
+
+    low = min(sums)
+    return low, [sums.get(low + i, 0) for i in range(max(sums) - low + 1)]
+
+
+# --------------------------------------------------
+def keep_work(term):
+    """
+    Roughly how many steps keep_counts() takes for a keep term: sides
+    faces, each visiting every (dice placed, kept sum) state once per
+    number of dice that can still go on the face.
+    """
+    need = min(term.keep_count, term.count)
+    return term.sides ** 2 * sum((placed + 1) * (need - placed)
+                                 for placed in range(need))
+
+
+# --------------------------------------------------
+def test_keep_counts():
+    """ test keep_counts() against counting every roll """
+    for count, sides, keep_count in [(1, 6, 1), (3, 4, 2), (4, 3, 4),
+                                     (5, 2, 1), (4, 6, 3)]:
+        for keep in 'hl':
+            expected = {}
+            for roll in itertools.product(range(1, sides + 1),
+                                          repeat=count):
+                kept = sorted(roll, reverse=keep == 'h')[:keep_count]
+                expected[sum(kept)] = expected.get(sum(kept), 0) + 1
+            low, counts = keep_counts(count, sides, keep, keep_count)
+            assert {low + i: n for i, n in enumerate(counts) if n} == \
+                expected, (count, sides, keep, keep_count)
+
+
+# --------------------------------------------------
+def power(poly, exp):
+    """ poly raised to exp (a positive int), by repeated squaring """
+    result = [1]
+    while exp:
+        if exp & 1:
+            result = convolve(result, poly)
+        exp >>= 1
+        if exp:
+            poly = convolve(poly, poly)
+    return result
+
+
+# --------------------------------------------------
+def convolve(left, right):
+    """
+    Exact product of two polynomials with non-negative integer
+    coefficients. Small products are done term by term; large ones by
+    Kronecker substitution, packing each polynomial into one big integer
+    so a single (Karatsuba) multiplication does all the work.
+    """
+    if len(left) * len(right) <= DIRECT_LIMIT:
+        out = [0] * (len(left) + len(right) - 1)
+        for i, a in enumerate(left):
+            if a:
+                for j, b in enumerate(right):
+                    out[i + j] += a * b
+        return out
+
+    bits = max(left).bit_length() + max(right).bit_length() \
+        + min(len(left), len(right)).bit_length()
+    width = (bits + 7) // 8
+    size = len(left) + len(right) - 1
+    product = _pack(left, width) * _pack(right, width)
+    raw = product.to_bytes(size * width, 'little')
+    return [int.from_bytes(raw[i * width:(i + 1) * width], 'little')
+            for i in range(size)]
+
+
+# --------------------------------------------------
+def _pack(poly, width):
+    """ Coefficients as one little-endian integer, width bytes each """
+    return int.from_bytes(b''.join(c.to_bytes(width, 'little')
+                                   for c in poly), 'little')
+
+
+# --------------------------------------------------
+def test_convolve():
+    """ test both ways of multiplying polynomials agree """
+    left = [i * 7919 % 101 for i in range(300)]
+    right = [i * 104729 % 97 + 1 for i in range(50)]
+    direct = [0] * 349
+    for i, a in enumerate(left):
+        for j, b in enumerate(right):
+            direct[i + j] += a * b
+
+    assert convolve(left, right) == direct
+    assert convolve([1, 1], [1, 1]) == [1, 2, 1]
+    assert power([1] * 6, 3)[0:3] == [1, 3, 6]
@@ -0,0 +1,181 @@
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Write roll results as prose, JSON lines, CSV, TSV or binary roll
+         log records. Output is collected in memory and written in large
+         blocks instead of one print per line.
+"""
+
+import csv
+import io
+import json
+import time
+from types import SimpleNamespace
+
+from rolllog import FLAGS, HEADER, KEY_INDEX, RECORD, character_id
+from rolls import ABBREVS, describe_roll, total_text
+
+FORMATS = ['prose', 'json', 'csv', 'tsv', 'binary']
+
+# columns of csv and tsv output
+FIELDS = ['id', 'character', 'roll_for', 'roll_type', 'adv', 'disadv',
+          'kept', 'roll1', 'roll2', 'mod', 'total', 'error']
+
+BUFFER_SIZE = 1 << 16
+
+
+class RollWriter:
+    """
+    Writes results shaped like rolld.handle_request() responses to
+    stream in one of FORMATS. Call close() (or use it in a with block)
+    to write out whatever is still buffered.
+    binary: the same records as a roll log (rolllog.py) with no names
+        file, so rolllog can summarize the output directly. Errors are
+        left out.
+    """
+
+    def __init__(self, stream, fmt='prose', buffer_size=BUFFER_SIZE):
+        if fmt not in FORMATS:
+            raise ValueError(f'Unknown format "{fmt}".')
+        self.fmt = fmt
+        self.buffer_size = buffer_size
+        self.parts = []
+        self.size = 0
+        self.headers = {}
+        if fmt == 'binary':
+            self.stream = getattr(stream, 'buffer', stream)
+            self._add(HEADER)
+        else:
+            self.stream = stream
+        if fmt in ('csv', 'tsv'):
+            sink = SimpleNamespace(write=self._add)
+            self.csv = csv.writer(sink, delimiter=',' if fmt == 'csv'
+                                  else '\t', lineterminator='\n')
+            self.csv.writerow(FIELDS)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, result, name='', adv=False, disadv=False):
+        """
+        Add one result. name, adv and disadv describe the request, which
+        the result itself doesn't repeat.
+        """
+        if self.fmt == 'json':
+            self._add(json.dumps(result) + '\n')
+        elif self.fmt == 'prose':
+            self._add(self._prose(result, adv, disadv))
+        elif self.fmt == 'binary':
+            if 'rolls' in result:
+                self._add(self._record(result, name, adv, disadv))
+        else:
+            self.csv.writerow(self._row(result, name, adv, disadv))
+
+    def flush(self):
+        """ Write out everything buffered so far """
+        if self.parts:
+            empty = b'' if self.fmt == 'binary' else ''
+            self.stream.write(empty.join(self.parts))
+            self.parts = []
+            self.size = 0
+        self.stream.flush()
+
+    def close(self):
+        """ Flush. The stream itself is left open """
+        self.flush()
+
+    def _add(self, data):
+        """ Buffer data, writing out the buffer once it is full """
+        self.parts.append(data)
+        self.size += len(data)
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def _prose(self, result, adv, disadv):
+        """ The text rolls.py prints for a result """
+        if 'rolls' not in result:
+            return f'{result.get("error", result)}\n'
+        key = (result['roll_for'], result['roll_type'], adv, disadv)
+        header = self.headers.get(key)
+        if header is None:
+            header = self.headers[key] = \
+                f'\nYou made {describe_roll(*key, ABBREVS)}.\n'
+        mod = result['mod']
+        return header + total_text(result['rolls'], '+' if mod >= 0 else '',
+                                   mod) + '\n'
+
+    @staticmethod
+    def _row(result, name, adv, disadv):
+        """ One csv/tsv row """
+        rolls = result.get('rolls')
+        if rolls is None:
+            return [result.get('id', ''), name] + [''] * 9 + \
+                [result.get('error', '')]
+        roll1, roll2 = (rolls[1], rolls[2]) if len(rolls) == 3 \
+            else (rolls[0], '')
+        return [result.get('id', ''), name, result['roll_for'],
+                result['roll_type'], int(bool(adv)), int(bool(disadv)),
+                rolls[0], roll1, roll2, result['mod'], result['total'], '']
+
+    @staticmethod
+    def _record(result, name, adv, disadv):
+        """ One roll log record """
+        rolls = result['rolls']
+        roll1, roll2 = (rolls[1], rolls[2]) if len(rolls) == 3 \
+            else (rolls[0], 0)
+        return RECORD.pack(time.time_ns() // 1000, character_id(name),
+                           KEY_INDEX[(result['roll_type'],
+                                      result['roll_for'])],
+                           FLAGS[(bool(adv), bool(disadv))], rolls[0],
+                           roll1, roll2, result['mod'], result['total'])
+
+
+# --------------------------------------------------
+def test_roll_writer():
+    """ test each format """
+    results = [({'roll_for': 'ste', 'roll_type': 'check',
+                 'rolls': [19, 8, 19], 'mod': 15, 'total': 34, 'id': 1},
+                'rogue', True, False),
+               ({'roll_for': 'str', 'roll_type': 'save', 'rolls': [8],
+                 'mod': 1, 'total': 9}, 'cleric', False, False),
+               ({'error': 'No such file'}, '', False, False)]
+
+    def written(fmt, buffer_size=BUFFER_SIZE):
+        out = io.StringIO()
+        with RollWriter(out, fmt, buffer_size) as writer:
+            for result in results:
+                writer.write(*result)
+        return out.getvalue()
+
+    assert written('prose') == \
+        '\nYou made a Stealth check with advantage.\n' \
+        '\nYour total is 34.\n' \
+        'You rolled a 8 and a 19 on the d20 with a +15 modifier.\n\n' \
+        '\nYou made a Strength save.\n' \
+        '\nYour total is 9.\n' \
+        'You rolled a 8 on the d20 with a +1 modifier.\n\n' \
+        'No such file\n'
+    assert [json.loads(line) for line in written('json').splitlines()] == \
+        [r[0] for r in results]
+    assert written('csv').splitlines() == \
+        [','.join(FIELDS),
+         '1,rogue,ste,check,1,0,19,8,19,15,34,',
+         ',cleric,str,save,0,0,8,8,,1,9,',
+         ',,,,,,,,,,,No such file']
+    assert written('tsv').splitlines()[1].split('\t')[:4] == \
+        ['1', 'rogue', 'ste', 'check']
+    assert written('csv', 1) == written('csv')
+
+    out = io.BytesIO()
+    with RollWriter(out, 'binary') as writer:
+        for result in results:
+            writer.write(*result)
+    data = out.getvalue()
+    assert data[:len(HEADER)] == HEADER
+    assert len(data) == len(HEADER) + 2 * RECORD.size
+    record = RECORD.unpack_from(data, len(HEADER))
+    assert record[1:] == (character_id('rogue'), KEY_INDEX[('check', 'ste')],
+                          1, 19, 8, 19, 15, 34)
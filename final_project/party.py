@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Make the same roll for every character in a party or roster,
+         spreading the work across processes.
+"""
+
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import NamedTuple
+
+from character import Character
+from errors import SheetError
+from odds import prob_at_least, total_pmf
+from rng import spawn
+from rolls import ABBREVS, ROLL_TYPES, describe_roll, roll_dice, std_abbrev
+from rules import HOMEBREW_ERROR
+
+
+class Result(NamedTuple):
+    """ One character's roll. error is set (and the rest empty) on failure """
+    name: str
+    rolls: list
+    mod: int
+    total: int
+    error: str
+
+
+# --------------------------------------------------
+def get_args():
+    """Get command-line arguments"""
+
+    parser = argparse.ArgumentParser(
+        description='Make the same roll for a whole party',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('characters',
+                        help='Character .txt files, directories of them, '
+                        'or glob patterns',
+                        metavar='PATH',
+                        nargs='+')
+
+    parser.add_argument('-r',
+                        '--roll',
+                        metavar='STR',
+                        help='What to roll, e.g. "perc check"',
+                        nargs=2,
+                        required=True)
+
+    dis_adv = parser.add_mutually_exclusive_group()
+    dis_adv.add_argument('-a',
+                         '--advantage',
+                         help='Roll twice and take the higher number',
+                         action='store_true')
+
+    dis_adv.add_argument('-d',
+                         '--disadvantage',
+                         help='Roll twice and take the lower number',
+                         action='store_true')
+
+    parser.add_argument('-s',
+                        '--seed',
+                        metavar='seed',
+                        help='Optional seed value for testing',
+                        type=int)
+
+    parser.add_argument('--dc',
+                        metavar='int',
+                        help='Treat the rolls as a group check against '
+                        'this DC',
+                        type=int)
+
+    parser.add_argument('-w',
+                        '--workers',
+                        metavar='int',
+                        help='Number of processes (default: one per CPU)',
+                        type=int)
+
+    args = parser.parse_args()
+    if HOMEBREW_ERROR:
+        parser.error(HOMEBREW_ERROR)
+
+    roll_for, roll_type = args.roll
+    args.roll_for = std_abbrev(roll_for, ABBREVS)
+    if roll_type not in ROLL_TYPES:
+        parser.error(f'Unknown roll type "{roll_type}", choose from '
+                     f'{", ".join(ROLL_TYPES)}')
+    args.roll_type = ROLL_TYPES[roll_type]
+    if args.roll_for not in ABBREVS.values():
+        parser.error(f'Unknown ability or skill "{roll_for}"')
+
+    args.files = find_sheets(args.characters)
+    if not args.files:
+        parser.error('No character files found.')
+
+    return args
+
+
+# --------------------------------------------------
+def main():
+    """Make a jazz noise here"""
+
+    args = get_args()
+    results = roll_party(args.files, args.roll_for, args.roll_type,
+                         args.advantage, args.disadvantage, args.seed,
+                         args.workers)
+
+    roll = describe_roll(args.roll_for, args.roll_type, args.advantage,
+                         args.disadvantage, ABBREVS)
+    print(f'\nThe party made {roll}.\n')
+    width = max(len(r.name) for r in results)
+    for res in results:
+        if res.error:
+            print(f'{res.name:<{width}}  {res.error}')
+        else:
+            dice = ' and '.join(map(str, res.rolls[1:] or res.rolls))
+            print(f'{res.name:<{width}}  {res.total:>3}  '
+                  f'(rolled {dice}, {res.mod:+d})')
+
+    rolled = [r for r in results if not r.error]
+    if not rolled:
+        sys.exit('No one could roll.')
+
+    totals = [r.total for r in rolled]
+    print(f'\nAverage total {sum(totals) / len(totals):.1f}, '
+          f'highest {max(totals)}, lowest {min(totals)}.')
+
+    if args.dc is not None:
+        passed = sum(total >= args.dc for total in totals)
+        outcome = 'succeeds' if 2 * passed >= len(totals) else 'fails'
+        chance = group_check_chance([r.mod for r in rolled], args.dc,
+                                    args.advantage, args.disadvantage)
+        print(f'{passed} of {len(totals)} met DC {args.dc}, '
+              f'so the group check {outcome}.')
+        print(f'The chance of at least half succeeding was {chance:.2%}.')
+    print()
+
+
+# --------------------------------------------------
+def find_sheets(paths):
+    """ Expand files, directories (their *.txt) and globs into file names """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.txt'))))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            files.extend(sorted(glob.glob(path)))
+    return files
+
+
+# --------------------------------------------------
+def test_find_sheets():
+    """ test find_sheets() """
+    assert find_sheets(['inputs']) == ['inputs/bad.txt', 'inputs/cleric.txt',
+                                       'inputs/rogue.txt']
+    assert find_sheets(['inputs/r*.txt', 'inputs/cleric.txt']) == \
+        ['inputs/rogue.txt', 'inputs/cleric.txt']
+    assert find_sheets(['inputs/nothing*']) == []
+
+
+# --------------------------------------------------
+def roll_party(files, roll_for, roll_type, adv, disadv, seed, workers=None):
+    """
+    Roll for every file, in order. With workers=1 everything happens in
+    this process; otherwise files are split into chunks for a process pool.
+    """
+    jobs = list(enumerate(files))
+    if workers == 1 or len(files) < 2:
+        return roll_chunk(jobs, roll_for, roll_type, adv, disadv, seed)
+
+    workers = workers or os.cpu_count()
+    size = max(1, len(jobs) // (workers * 4))
+    chunks = [jobs[i:i + size] for i in range(0, len(jobs), size)]
+    results = []
+    with ProcessPoolExecutor(workers) as pool:
+        for chunk in pool.map(roll_chunk, chunks,
+                              *[[arg] * len(chunks) for arg in
+                                (roll_for, roll_type, adv, disadv, seed)]):
+            results.extend(chunk)
+    return results
+
+
+# --------------------------------------------------
+def roll_chunk(jobs, roll_for, roll_type, adv, disadv, seed):
+    """
+    Roll for a list of (position, file name) jobs. With a seed, each
+    character's dice depend only on the seed and its position, so results
+    are the same however the files are split up.
+    """
+    results = []
+    for pos, file_name in jobs:
+        name = os.path.splitext(os.path.basename(file_name))[0]
+        try:
+            character = Character.load(file_name)
+        except OSError as err:
+            results.append(Result(name, [], 0, 0, err.strerror))
+            continue
+        except SheetError as err:
+            results.append(Result(name, [], 0, 0, str(err)))
+            continue
+
+        mod = character.modifier(roll_for, roll_type)
+        rolls = roll_dice(adv, disadv, None, spawn(seed, pos))
+        results.append(Result(name, rolls, mod, rolls[0] + mod, ''))
+    return results
+
+
+# --------------------------------------------------
+def test_roll_party():
+    """ test roll_party() gives the same results in and out of a pool """
+    files = ['inputs/cleric.txt', 'inputs/bad.txt', 'inputs/rogue.txt'] * 3
+    alone = roll_party(files, 'perc', 'check', True, False, 5, workers=1)
+    pooled = roll_party(files, 'perc', 'check', True, False, 5, workers=2)
+
+    assert alone == pooled
+    assert [r.name for r in alone[:3]] == ['cleric', 'bad', 'rogue']
+    assert alone[1].error == 'Non-integer value found in inputs/bad.txt.'
+    assert alone[0].mod == 9
+    assert alone[0].total == max(alone[0].rolls[1:]) + 9
+
+
+# --------------------------------------------------
+def test_roll_party_short_sheets(tmp_path):
+    """ test sheets missing a line or a score are reported one by one """
+    short, no_dex = tmp_path / 'short.txt', tmp_path / 'no_dex.txt'
+    short.write_text('4\n')
+    no_dex.write_text('2\nstr:10, con:10, int:10, wis:10, cha:10\n'
+                      'str:1\nath:1\n')
+    results = roll_party([str(short), 'inputs/cleric.txt', str(no_dex)],
+                         'wis', 'save', False, False, 1, workers=1)
+
+    assert results[0].error == f'No ability scores line in {short}.'
+    assert results[1].error == '' and results[1].mod == 9
+    assert results[2].error == f'No dex score in {no_dex}.'
+
+
+# --------------------------------------------------
+@lru_cache(maxsize=1024)
+def success_chance(mod, dc, adv, disadv):
+    """ Chance that one character with this modifier meets dc """
+    return float(prob_at_least(total_pmf(mod, adv, disadv), dc))
+
+
+# --------------------------------------------------
+def test_success_chance():
+    """ test success_chance() """
+    assert success_chance(0, 11, False, False) == 0.5
+    assert success_chance(0, 11, True, False) == 0.75
+    assert success_chance(5, 30, False, False) == 0.0
+
+
+# --------------------------------------------------
+def group_check_chance(mods, dc, adv, disadv):
+    """
+    Exact chance that at least half of the characters with these modifiers
+    meet dc. Works out the distribution of the number of successes one
+    character at a time; each distinct modifier's chance is worked out once.
+    The walk is O(n**2) in the number of characters: instant for a party,
+    a few seconds at 5,000 characters and close to a minute at 20,000.
+    """
+    successes = [1.0]
+    for mod in mods:
+        chance = success_chance(mod, dc, adv, disadv)
+        nxt = [0.0] * (len(successes) + 1)
+        for count, prob in enumerate(successes):
+            nxt[count] += prob * (1 - chance)
+            nxt[count + 1] += prob * chance
+        successes = nxt
+
+    half = (len(mods) + 1) // 2
+    return sum(successes[half:])
+
+
+# --------------------------------------------------
+def test_group_check_chance():
+    """ test group_check_chance() """
+    # one character needing an 11 on a straight d20
+    assert group_check_chance([0], 11, False, False) == 0.5
+    # two characters: at least one of two coin flips
+    assert group_check_chance([0, 0], 11, False, False) == 0.75
+    # three characters: at least two of three
+    assert abs(group_check_chance([0, 0, 0], 11, False, False) - 0.5) < 1e-12
+    assert group_check_chance([20, 20], 5, False, True) == 1.0
+    success_chance.cache_clear()
+    group_check_chance([3] * 10 + [1] * 10, 12, True, False)
+    assert success_chance.cache_info().misses == 2
+
+
+# --------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Optional timing of each stage of a roll. While disabled, stage()
+         hands back one shared do-nothing context manager, so instrumented
+         code pays for little more than a function call.
+"""
+
+from contextlib import nullcontext
+from time import perf_counter_ns
+
+ENABLED = False
+STATS = {}
+_OFF = nullcontext()
+
+
+class StageStats:
+    """
+    Timings for one stage: number of calls, total and largest time in ns,
+    and a histogram of calls by power-of-two ns bucket (bucket b holds
+    times from 2**(b-1) up to 2**b ns).
+    """
+    __slots__ = ('calls', 'total_ns', 'max_ns', 'buckets')
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * 64
+
+    def add(self, elapsed):
+        """ Record one call that took elapsed ns """
+        self.calls += 1
+        self.total_ns += elapsed
+        self.max_ns = max(self.max_ns, elapsed)
+        self.buckets[min(elapsed.bit_length(), 63)] += 1
+
+    def percentile(self, pct):
+        """ Upper bound, in ns, of the bucket holding the pct percentile """
+        target = self.calls * pct / 100
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min(2 ** bucket, self.max_ns)
+        return 0
+
+
+class _Timer:
+    """ Times one pass through a with block """
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, perf_counter_ns() - self.start)
+
+
+# --------------------------------------------------
+def stage(name):
+    """ Context manager timing a stage, e.g. with stage('roll_dice'): ... """
+    if ENABLED:
+        return _Timer(name)
+    return _OFF
+
+
+# --------------------------------------------------
+def record(name, elapsed):
+    """ Record elapsed ns for a stage timed some other way """
+    if ENABLED:
+        stats = STATS.get(name)
+        if stats is None:
+            stats = STATS[name] = StageStats()
+        stats.add(elapsed)
+
+
+# --------------------------------------------------
+def enable(on=True):
+    """ Turn timing on (or off) """
+    global ENABLED  # pylint: disable=W0603
+    ENABLED = on
+
+
+# --------------------------------------------------
+def reset():
+    """ Forget all timings so far """
+    STATS.clear()
+
+
+# --------------------------------------------------
+def snapshot():
+    """ All timings so far, as plain data (e.g. for JSON) """
+    return {name: {'calls': s.calls, 'total_ns': s.total_ns,
+                   'max_ns': s.max_ns, 'p50_ns': s.percentile(50),
+                   'p99_ns': s.percentile(99),
+                   'buckets': {2 ** b: n for b, n in enumerate(s.buckets)
+                               if n}}
+            for name, s in STATS.items()}
+
+
+# --------------------------------------------------
+def report():
+    """ Timings so far as a table, one line per stage """
+    lines = [f'{"Stage":<14} {"Calls":>8} {"Total ms":>10} {"Mean us":>9} '
+             f'{"p50 us":>8} {"p99 us":>8} {"Max us":>8}']
+    for name, s in STATS.items():
+        lines.append(f'{name:<14} {s.calls:>8} {s.total_ns / 1e6:>10.3f} '
+                     f'{s.total_ns / s.calls / 1e3:>9.2f} '
+                     f'{s.percentile(50) / 1e3:>8.2f} '
+                     f'{s.percentile(99) / 1e3:>8.2f} '
+                     f'{s.max_ns / 1e3:>8.2f}')
+    return '\n'.join(lines)
+
+
+# --------------------------------------------------
+def test_stage():
+    """ test stage() records only while enabled """
+    reset()
+    with stage('off'):
+        pass
+    assert not STATS
+
+    enable()
+    try:
+        for _ in range(3):
+            with stage('on'):
+                pass
+        record('manual', 1500)
+    finally:
+        enable(False)
+
+    data = snapshot()
+    assert data['on']['calls'] == 3
+    assert data['manual'] == {'calls': 1, 'total_ns': 1500, 'max_ns': 1500,
+                              'p50_ns': 1500, 'p99_ns': 1500,
+                              'buckets': {2048: 1}}
+    assert report().splitlines()[0].startswith('Stage')
+    assert len(report().splitlines()) == 3
+    reset()
@@ -0,0 +1,355 @@
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Independent random number streams. Child streams are derived
+         from a root seed and a key (a worker, character or request), so
+         seeded results don't depend on how work is split up. Generators
+         come from one of several backends: the standard Mersenne Twister,
+         NumPy's PCG64, or the operating system's secure generator.
+"""
+
+import abc
+import hashlib
+import os
+import pickle
+import random
+import sys
+from array import array
+
+from backends import BACKENDS
+from batch import np
+from errors import RollError
+
+# bytes fetched from a buffered backend at a time, and dice of each size
+# rolled ahead for randint()
+BLOCK_SIZE = 1 << 16
+POOL_SIZE = 4096
+
+
+# --------------------------------------------------
+def derive_seed(seed, *keys):
+    """
+    A 128-bit seed for the stream named by keys under the root seed.
+    The same seed and keys always give the same result, on any machine.
+    """
+    text = '/'.join(str(part) for part in (seed,) + keys)
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:16],
+                          'little')
+
+
+# --------------------------------------------------
+def test_derive_seed():
+    """ test derive_seed() """
+    assert derive_seed(3, 'cleric') == derive_seed(3, 'cleric')
+    assert derive_seed(3, 'cleric') != derive_seed(3, 'rogue')
+    assert derive_seed(3, 1) != derive_seed(4, 1)
+    assert derive_seed(3, 1, 2) != derive_seed(3, 12)
+    assert derive_seed(0) != derive_seed(None)
+
+
+class BufferedRandom(random.Random, abc.ABC):
+    """
+    A random.Random that draws from a buffer of random bytes, refilled
+    block_size bytes at a time by fill(), so a slow source is called once
+    per block instead of once per die. Integers in a range are drawn by
+    rejection sampling (never by taking a remainder of an uneven range),
+    so every face is exactly equally likely.
+    Subclasses supply fill(size) and, if they can be seeded, seed().
+    """
+
+    def __init__(self, seed=None, block_size=BLOCK_SIZE):
+        # random.Random creates instances in C, skipping the ABC check
+        missing = type(self).__abstractmethods__
+        if missing:
+            raise TypeError(f"Can't instantiate abstract class "
+                            f'{type(self).__name__} without '
+                            f'{", ".join(sorted(missing))}()')
+        self.block_size = block_size
+        self.buffer = b''
+        self.pos = 0
+        self.pools = {}
+        super().__init__(seed)
+
+    def seed(self, a=None, version=2):  # pylint: disable=W0221,W0613
+        """ Throw away anything buffered """
+        self.buffer = b''
+        self.pos = 0
+        self.pools = {}
+
+    @abc.abstractmethod
+    def fill(self, size):
+        """ size fresh random bytes """
+
+    def take(self, size):
+        """ The next size bytes from the buffer, refilling it if needed """
+        if self.pos + size > len(self.buffer):
+            self.buffer = self.buffer[self.pos:] + \
+                self.fill(max(self.block_size, size))
+            self.pos = 0
+        data = self.buffer[self.pos:self.pos + size]
+        self.pos += size
+        return data
+
+    def getrandbits(self, k):
+        """ A random int of k bits """
+        if k < 0:
+            raise ValueError('number of bits must be non-negative')
+        size = (k + 7) // 8
+        return int.from_bytes(self.take(size), 'little') >> (size * 8 - k)
+
+    def random(self):
+        """ A random float in [0, 1) """
+        return (int.from_bytes(self.take(7), 'little') >> 3) * 2.0 ** -53
+
+    def randint(self, a, b):
+        """
+        A random int from a to b inclusive. Small ranges (dice) are rolled
+        in bulk ahead of time and handed out one by one.
+        """
+        num = b - a + 1
+        if not 0 < num <= 256:
+            return a + self.below(num)
+        pool = self.pools.get(num)
+        if not pool:
+            pool = self.pools[num] = self.dice(POOL_SIZE, num).tolist()
+        return a + pool.pop() - 1
+
+    def below(self, num):
+        """ A random int from 0 to num - 1, by rejection sampling """
+        if num < 1:
+            raise ValueError('empty range')
+        width = (num.bit_length() + 7) // 8
+        span = 1 << (8 * width)
+        limit = span - span % num
+        while True:
+            value = int.from_bytes(self.take(width), 'little')
+            if value < limit:
+                return value % num
+
+    def dice(self, count, sides):
+        """
+        count rolls of a die with sides faces, as a NumPy array when NumPy
+        is available, otherwise an array.array. Bytes (or byte pairs, for
+        dice over 256 sides) at or above the largest multiple of sides are
+        rejected, the rest reduced mod sides.
+        """
+        if sides > 1 << 16:
+            return array('i', [self.below(sides) + 1 for _ in range(count)])
+        width = 1 if sides <= 256 else 2
+        span = 1 << (8 * width)
+        limit = span - span % sides
+        code = 'b' if sides <= 127 else 'i'
+
+        if np is not None:
+            chunks, have = [], 0
+            while have < count:
+                need = count - have
+                raw = np.frombuffer(self.take((need * span // limit + 16)
+                                              * width), dtype=f'<u{width}')
+                # widen first: sides itself may not fit in the raw dtype
+                raw = raw.astype(np.int64)
+                raw = raw[raw < limit][:need]
+                chunks.append((raw % sides + 1).astype(code))
+                have += len(raw)
+            return np.concatenate(chunks) if chunks else np.zeros(0, code)
+
+        out = array(code)
+        while len(out) < count:
+            need = count - len(out)
+            raw = self.take((need * span // limit + 16) * width)
+            if width == 2:
+                raw = array('H', raw)
+                if sys.byteorder == 'big':
+                    raw.byteswap()
+            out.extend([v % sides + 1 for v in raw if v < limit][:need])
+        return out
+
+    def getstate(self):
+        """
+        What is buffered: block size, buffer, position and dice pools.
+        Subclasses add the state of their source.
+        """
+        return (self.block_size, self.buffer, self.pos,
+                {num: list(pool) for num, pool in self.pools.items()})
+
+    def setstate(self, state):
+        """ getstate() in reverse """
+        self.block_size, self.buffer, self.pos, pools = state
+        self.pools = {num: list(pool) for num, pool in pools.items()}
+
+
+class PCG64Random(BufferedRandom):
+    """ NumPy's PCG64 generator. Seeds go through derive_seed() """
+
+    def seed(self, a=None, version=2):
+        super().seed()
+        self.gen = np.random.Generator(
+            np.random.PCG64(None if a is None else derive_seed(a)))
+
+    def fill(self, size):
+        return self.gen.bytes(size)
+
+    def getstate(self):
+        """ The bit generator's state plus what is buffered """
+        return self.gen.bit_generator.state, super().getstate()
+
+    def setstate(self, state):
+        """ getstate() in reverse """
+        self.gen.bit_generator.state, buffered = state
+        super().setstate(buffered)
+
+
+class SystemRandom(BufferedRandom):
+    """
+    The operating system's secure generator (os.urandom, which the
+    secrets module uses too), for games where fairness matters more than
+    being able to replay a roll. It can't be seeded, and has no state to
+    save, copy or pickle.
+    """
+
+    def seed(self, a=None, version=2):
+        if a is not None:
+            raise ValueError('The system generator cannot be seeded.')
+        super().seed()
+
+    def fill(self, size):
+        return os.urandom(size)
+
+    def getstate(self):
+        raise RollError('The system generator has no state to save.')
+
+    def setstate(self, state):
+        raise RollError('The system generator has no state to restore.')
+
+
+# --------------------------------------------------
+def make_rng(seed=None, backend='mt'):
+    """
+    A new generator from backend (one of BACKENDS), seeded when seed is
+    not None. Raises ValueError for an unknown backend, for pcg64 without
+    NumPy, and for seeding the system backend.
+    """
+    if backend == 'mt':
+        return random.Random(seed)
+    if backend == 'pcg64':
+        if np is None:
+            raise ValueError('The pcg64 generator needs NumPy.')
+        return PCG64Random(seed)
+    if backend == 'system':
+        return SystemRandom(seed)
+    raise ValueError(f'Unknown generator "{backend}".')
+
+
+# --------------------------------------------------
+def test_make_rng():
+    """ test each backend rolls fair dice """
+    for backend in BACKENDS:
+        if backend == 'pcg64' and np is None:
+            continue
+        rng = make_rng(None, backend)
+        rolls = [rng.randint(1, 20) for _ in range(20000)]
+        counts = [rolls.count(face) for face in range(1, 21)]
+        assert min(counts) > 850 and max(counts) < 1150, backend
+
+    for rng in [SystemRandom(block_size=64)] + \
+            ([PCG64Random(4)] if np is not None else []):
+        for sides in [6, 20, 200, 256, 1000, 65536]:
+            rolls = list(rng.dice(3000, sides))
+            assert len(rolls) == 3000
+            assert min(rolls) >= 1 and max(rolls) <= sides
+            if sides <= 20:
+                assert len(set(rolls)) == sides
+            if sides == 256:
+                assert max(rolls) == 256
+        assert 1 <= rng.randint(1, 256) <= 256
+        assert 0 <= rng.random() < 1
+        assert rng.getrandbits(12) < 4096
+        assert len(rng.dice(0, 20)) == 0
+
+    try:
+        make_rng(3, 'system')
+        assert False
+    except ValueError:
+        pass
+    try:
+        make_rng(None, 'bogus')
+        assert False
+    except ValueError:
+        pass
+
+
+# --------------------------------------------------
+def test_pcg64():
+    """ test seeded PCG64 generators repeat """
+    if np is None:
+        try:
+            make_rng(1, 'pcg64')
+            assert False
+        except ValueError as err:
+            assert str(err) == 'The pcg64 generator needs NumPy.'
+        return
+    assert list(make_rng(1, 'pcg64').dice(50, 20)) == \
+        list(make_rng(1, 'pcg64').dice(50, 20))
+    assert make_rng(1, 'pcg64').random() != make_rng(2, 'pcg64').random()
+
+    rng = make_rng(1, 'pcg64')
+    rng.randint(1, 20)
+    rng.random()
+    state = rng.getstate()
+    copy = pickle.loads(pickle.dumps(rng))
+    ahead = [rng.randint(1, 20) for _ in range(5000)] + [rng.random()]
+    assert [copy.randint(1, 20) for _ in range(5000)] + [copy.random()] \
+        == ahead
+    rng.setstate(state)
+    assert [rng.randint(1, 20) for _ in range(5000)] + [rng.random()] \
+        == ahead
+
+
+# --------------------------------------------------
+def test_incomplete_backend():
+    """ test a backend without fill() fails when it is created """
+
+    class NoSource(BufferedRandom):  # pylint: disable=W0223
+        """ Forgets to supply fill() """
+
+    try:
+        NoSource()  # pylint: disable=E0110
+        assert False
+    except TypeError as err:
+        assert str(err) == "Can't instantiate abstract class NoSource " \
+            'without fill()'
+
+
+# --------------------------------------------------
+def test_system_state():
+    """ test the system generator refuses to save or restore state """
+    for action in [lambda rng: rng.getstate(),
+                   lambda rng: rng.setstate(None), pickle.dumps]:
+        try:
+            action(SystemRandom())
+            assert False
+        except RollError as err:
+            assert 'system generator has no state' in str(err)
+
+
+# --------------------------------------------------
+def spawn(seed, *keys, backend='mt'):
+    """
+    The child generator named by keys, e.g. spawn(seed, 'worker', 3).
+    Without a root seed the child is seeded from the OS instead.
+    """
+    if seed is None:
+        return make_rng(None, backend)
+    return make_rng(derive_seed(seed, *keys), backend)
+
+
+# --------------------------------------------------
+def test_spawn():
+    """ test spawn() streams are reproducible and independent """
+    first = [spawn(7, i).randint(1, 20) for i in range(50)]
+    again = [spawn(7, i).randint(1, 20) for i in reversed(range(50))]
+
+    assert first == again[::-1]
+    assert [spawn(7, 0).random() for _ in range(2)] == \
+        [spawn(7, 0).random()] * 2
+    assert spawn(7, 0).random() != spawn(7, 1).random()
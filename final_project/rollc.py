@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Make a roll through a running rolld.py server. Takes the same
+         arguments and prints the same results as rolls.py.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+
+from rolls import ABBREVS, calc_total, print_header
+from rules import HOMEBREW_ERROR
+
+DEFAULT_SOCKET = '/tmp/rolld.sock'
+
+
+# --------------------------------------------------
+def get_args():
+    """Get command-line arguments"""
+
+    parser = argparse.ArgumentParser(
+        description='Roll through a rolld.py server',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('character',
+                        help='.txt with character info and stats',
+                        metavar='FILE')
+
+    parser.add_argument('roll_for',
+                        metavar='STR',
+                        help='What skill or ability to roll for')
+
+    parser.add_argument('roll_type',
+                        metavar='STR',
+                        help='The type of roll to make (ability or save)')
+
+    dis_adv = parser.add_mutually_exclusive_group()
+    dis_adv.add_argument('-a',
+                         '--advantage',
+                         help='Roll twice and take the higher number',
+                         action='store_true')
+
+    dis_adv.add_argument('-d',
+                         '--disadvantage',
+                         help='Roll twice and take the lower number',
+                         action='store_true')
+
+    parser.add_argument('-s',
+                        '--seed',
+                        metavar='seed',
+                        help='Optional seed value for testing',
+                        type=int)
+
+    parser.add_argument('-u',
+                        '--socket',
+                        metavar='PATH',
+                        help='Unix socket the server listens on',
+                        default=DEFAULT_SOCKET)
+
+    parser.add_argument('-p',
+                        '--port',
+                        metavar='int',
+                        help='Connect to this localhost TCP port instead',
+                        type=int)
+
+    args = parser.parse_args()
+    if HOMEBREW_ERROR:
+        parser.error(HOMEBREW_ERROR)
+
+    return args
+
+
+# --------------------------------------------------
+def main():
+    """Make a jazz noise here"""
+
+    args = get_args()
+    request = {'character': os.path.abspath(args.character),
+               'roll_for': args.roll_for,
+               'roll_type': args.roll_type,
+               'adv': args.advantage,
+               'disadv': args.disadvantage,
+               'seed': args.seed}
+
+    try:
+        response = request_roll(request, args.socket, port=args.port)
+    except OSError as err:
+        sys.exit(f"Can't reach the roll server: {err}")
+
+    if 'error' in response:
+        sys.exit(response['error'])
+
+    mod = response['mod']
+    print_header(response['roll_for'], response['roll_type'],
+                 args.advantage, args.disadvantage, ABBREVS)
+    calc_total(response['rolls'], "+" if mod >= 0 else "", mod)
+
+
+# --------------------------------------------------
+def request_roll(request, socket_path=DEFAULT_SOCKET, host='127.0.0.1',
+                 port=None):
+    """ Send one request to the server and return its decoded response """
+    if port is not None:
+        sock = socket.create_connection((host, port))
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(socket_path)
+
+    with sock, sock.makefile('rwb') as stream:
+        stream.write(json.dumps(request).encode() + b'\n')
+        stream.flush()
+        return json.loads(stream.readline())
+
+
+# --------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Roll server. Keeps characters loaded and answers roll requests
+         sent as one JSON object per line over a Unix socket or TCP.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+import profiling
+from character import Character
+from errors import SheetError
+from rng import BACKENDS, make_rng
+from roster import Roster, build
+from rules import HOMEBREW_ERROR
+from watch import SheetWatcher
+from rolls import ABBREVS, ROLL_TYPES, std_abbrev
+
+DEFAULT_SOCKET = '/tmp/rolld.sock'
+
+
+# --------------------------------------------------
+def get_args():
+    """Get command-line arguments"""
+
+    parser = argparse.ArgumentParser(
+        description='Serve rolls to rollc.py and other clients',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('-u',
+                        '--socket',
+                        metavar='PATH',
+                        help='Unix socket to listen on',
+                        default=DEFAULT_SOCKET)
+
+    parser.add_argument('-p',
+                        '--port',
+                        metavar='int',
+                        help='Listen on this localhost TCP port instead',
+                        type=int)
+
+    parser.add_argument('--host',
+                        metavar='str',
+                        help='Address to bind when using --port',
+                        default='127.0.0.1')
+
+    parser.add_argument('-r',
+                        '--roster',
+                        metavar='FILE',
+                        help='Roster (see roster.py) to look characters up '
+                        'in by name before trying them as files')
+
+    parser.add_argument('--rng',
+                        metavar='NAME',
+                        help='Generator for requests without a seed: mt, '
+                        'pcg64 or system (seeded requests always use mt)',
+                        choices=BACKENDS,
+                        default='mt')
+
+    parser.add_argument('-d',
+                        '--sheets',
+                        metavar='DIR',
+                        help='Only read sheets inside this directory, '
+                        'taking sheet paths relative to it (default: any '
+                        'file the server can read)')
+
+    parser.add_argument('--reload',
+                        metavar='SECONDS',
+                        help='Check loaded sheets for edits this often '
+                        '(default: never)',
+                        type=float)
+
+    parser.add_argument('--profile',
+                        help='Time each stage of every roll; clients can '
+                        'fetch the timings with {"profile": true}',
+                        action='store_true')
+
+    args = parser.parse_args()
+    if HOMEBREW_ERROR:
+        parser.error(HOMEBREW_ERROR)
+
+    return args
+
+
+# --------------------------------------------------
+def main():
+    """Make a jazz noise here"""
+
+    args = get_args()
+    profiling.enable(args.profile)
+    try:
+        roster = Roster(args.roster) if args.roster else None
+        rng = make_rng(None, args.rng) if args.rng != 'mt' else None
+    except (OSError, ValueError) as err:
+        sys.exit(str(err))
+    try:
+        asyncio.run(serve(args.socket, args.host, args.port, roster,
+                          args.reload, rng, args.sheets))
+    except KeyboardInterrupt:
+        pass
+
+
+# --------------------------------------------------
+async def serve(socket_path, host='127.0.0.1', port=None, roster=None,
+                reload=None, rng=None, sheet_dir=None):
+    """
+    Listen for clients until cancelled.
+    roster: optional Roster to look characters up in by name
+    reload: seconds between checks of the loaded sheets for edits
+    rng: generator for requests without a seed (default: the global one)
+    sheet_dir: directory sheets must be in (default: any file the server
+        can read, so only let trusted clients connect)
+    """
+    characters = {}
+    if reload:
+        watcher = asyncio.create_task(watch_sheets(characters, reload))
+
+    async def on_client(reader, writer):
+        await handle_client(reader, writer, characters, roster, rng,
+                            sheet_dir)
+
+    if port is not None:
+        server = await asyncio.start_server(on_client, host, port)
+    else:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = await asyncio.start_unix_server(on_client, socket_path)
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if reload:
+            watcher.cancel()
+
+
+# --------------------------------------------------
+async def watch_sheets(characters, interval):
+    """
+    Poll the sheet files in characters every interval seconds, swapping in
+    edited characters. Polling runs in a worker thread so thousands of
+    stat calls don't hold up requests.
+    """
+    watcher = SheetWatcher(characters)
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        await loop.run_in_executor(None, watcher.poll)
+
+
+# --------------------------------------------------
+async def handle_client(reader, writer, characters, roster=None, rng=None,
+                        sheet_dir=None):
+    """ Answer each request line from one client with a response line """
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                response = handle_request(json.loads(line), characters,
+                                          rng, roster, sheet_dir)
+            except ValueError as err:
+                response = {'error': f'Bad request: {err}'}
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+# --------------------------------------------------
+def handle_request(request, characters, rng=None, roster=None,
+                   sheet_dir=None):
+    """
+    Make one roll.
+    request: {"character": FILE, "roll_for": STR, "roll_type": STR,
+              "adv": bool, "disadv": bool, "seed": int or str}
+        (adv, disadv and seed are optional)
+    characters: {FILE: Character} of characters loaded so far
+    rng: generator for requests without a seed (default: the global one).
+        Seeded requests always get a generator of their own.
+    roster: optional Roster. A "character" found in it by name is taken
+        from there instead of being loaded as a file.
+    sheet_dir: optional directory. Sheet files are then taken relative to
+        it, and files outside it are refused. Without it any file the
+        process can read may be named.
+    Returns {"roll_for", "roll_type", "rolls", "mod", "total"} or
+    {"error": message}. Any "id" in the request is copied to the response.
+    The request {"profile": true} instead returns {"profile": timings}.
+    """
+    if isinstance(request, dict) and request.get('profile'):
+        response = {'profile': profiling.snapshot()}
+    else:
+        response = make_roll(request, characters, rng, roster, sheet_dir)
+    if isinstance(request, dict) and 'id' in request:
+        response['id'] = request['id']
+    return response
+
+
+# --------------------------------------------------
+def make_roll(request, characters, default_rng=None, roster=None,
+              sheet_dir=None):
+    """ Roll for handle_request() """
+    try:
+        file_name = request['character']
+        roll_for = std_abbrev(request['roll_for'], ABBREVS)
+        roll_type = ROLL_TYPES[request['roll_type']]
+    except (KeyError, TypeError) as err:
+        return {'error': f'Bad request: missing or invalid {err}'}
+    if not isinstance(file_name, str):
+        return {'error': 'Bad request: "character" must be a string'}
+    seed = request.get('seed')
+    if seed is not None and (isinstance(seed, bool)
+                             or not isinstance(seed, (int, str))):
+        return {'error': 'Bad request: "seed" must be an integer, a string '
+                         'or null'}
+
+    for flag in ['adv', 'disadv']:
+        if not isinstance(request.get(flag), (bool, type(None))):
+            return {'error': f'Bad request: "{flag}" must be true, false '
+                             'or null'}
+    adv = bool(request.get('adv'))
+    disadv = bool(request.get('disadv'))
+    if adv and disadv:
+        return {'error': 'Cannot roll with advantage and disadvantage.'}
+
+    path = file_name
+    if sheet_dir is not None and (roster is None or file_name not in roster):
+        path = sheet_path(file_name, sheet_dir)
+        if path is None:
+            return {'error': f"'{file_name}' is not in the sheet directory."}
+
+    character = characters.get(path)
+    if character is None:
+        try:
+            if roster is not None and file_name in roster:
+                character = roster[file_name]
+            else:
+                character = Character.load(path)
+        except OSError as err:
+            return {'error': f"Can't open '{file_name}': {err.strerror}"}
+        except SheetError as err:
+            return {'error': str(err)}
+        characters[path] = character
+
+    rng = make_rng(seed) if seed is not None else default_rng
+    try:
+        rolls, mod = character.roll(roll_for, roll_type, adv, disadv,
+                                    rng=rng)
+    except ValueError as err:
+        return {'error': str(err)}
+
+    return {'roll_for': roll_for, 'roll_type': roll_type, 'rolls': rolls,
+            'mod': mod, 'total': rolls[0] + mod}
+
+
+# --------------------------------------------------
+def sheet_path(file_name, sheet_dir):
+    """
+    file_name taken relative to sheet_dir, with links followed, or None if
+    that leads outside sheet_dir
+    """
+    root = os.path.realpath(sheet_dir)
+    path = os.path.realpath(os.path.join(root, file_name))
+    return path if os.path.commonpath([root, path]) == root else None
+
+
+# --------------------------------------------------
+def test_sheet_path(tmp_path):
+    """ test sheet_path() keeps sheets inside the directory """
+    root = os.path.realpath(tmp_path)
+    assert sheet_path('rogue.txt', tmp_path) == \
+        os.path.join(root, 'rogue.txt')
+    assert sheet_path('party/../rogue.txt', tmp_path) == \
+        os.path.join(root, 'rogue.txt')
+    for outside in ['../rogue.txt', '/etc/shadow', '..']:
+        assert sheet_path(outside, tmp_path) is None, outside
+
+    os.symlink('/etc', tmp_path / 'link')
+    assert sheet_path('link/shadow', tmp_path) is None
+
+
+# --------------------------------------------------
+def test_handle_request():
+    """ test handle_request() """
+    characters = {}
+    request = {'character': 'inputs/rogue.txt', 'roll_for': 'stealth',
+               'roll_type': 'skill', 'disadv': True, 'seed': 3}
+
+    assert handle_request(request, characters) == \
+        {'roll_for': 'ste', 'roll_type': 'check', 'rolls': [8, 8, 19],
+         'mod': 15, 'total': 23}
+    assert list(characters) == ['inputs/rogue.txt']
+
+    assert handle_request({'character': 'inputs/bad.txt', 'roll_for': 'str',
+                           'roll_type': 'c'}, characters) == \
+        {'error': 'Non-integer value found in inputs/bad.txt.'}
+    assert handle_request({'character': 'rogue', 'roll_for': 'str',
+                           'roll_type': 'c'}, characters)['error'] == \
+        "Can't open 'rogue': No such file or directory"
+    assert 'error' in handle_request({'roll_for': 'str'}, characters)
+    assert handle_request({'id': 7}, characters)['id'] == 7
+    for bad in [{'character': ['inputs/rogue.txt']}, {'seed': [1, 2]},
+                {'seed': {'a': 1}}, {'seed': 1.5}, {'seed': True},
+                {'adv': 'no'}, {'disadv': 1}, {'adv': [True]}]:
+        reply = handle_request(dict(request, **bad), characters)
+        assert reply['error'].startswith('Bad request: "'), bad
+    assert handle_request(dict(request, seed='three'),
+                          characters)['mod'] == 15
+
+    profiling.enable()
+    try:
+        handle_request(request, characters)
+        timings = handle_request({'profile': True}, characters)['profile']
+        assert timings['roll_dice']['calls'] >= 1
+    finally:
+        profiling.enable(False)
+        profiling.reset()
+    assert 'error' in handle_request({'character': 'inputs/rogue.txt',
+                                      'roll_for': 'history',
+                                      'roll_type': 'c'}, characters)
+
+
+# --------------------------------------------------
+def test_handle_request_sheet_dir(tmp_path):
+    """ test sheets outside the sheet directory are refused """
+    with open('inputs/rogue.txt', 'rt') as fh:
+        (tmp_path / 'rogue.txt').write_text(fh.read())
+    characters = {}
+    request = {'character': 'rogue.txt', 'roll_for': 'ste', 'roll_type': 'c',
+               'seed': 3}
+    assert handle_request(request, characters,
+                          sheet_dir=str(tmp_path))['total'] == 23
+    for outside in [os.path.abspath('inputs/rogue.txt'), '../rogue.txt']:
+        assert handle_request(dict(request, character=outside), characters,
+                              sheet_dir=str(tmp_path)) == \
+            {'error': f"'{outside}' is not in the sheet directory."}
+
+
+# --------------------------------------------------
+def test_handle_request_short_sheet(tmp_path):
+    """ test a sheet missing a line gives an error reply, not a crash """
+    short = tmp_path / 'short.txt'
+    short.write_text('')
+    characters = {}
+    request = {'character': str(short), 'roll_for': 'str', 'roll_type': 'c'}
+    assert handle_request(request, characters) == \
+        {'error': f'No proficiency bonus line in {short}.'}
+    assert not characters
+
+
+# --------------------------------------------------
+def test_handle_request_roster(tmp_path):
+    """ test characters are found by name in a roster """
+    path = str(tmp_path / 'party.roster')
+    build(path, ['inputs/rogue.txt'])
+    characters = {}
+    with Roster(path) as roster:
+        request = {'character': 'rogue', 'roll_for': 'ste',
+                   'roll_type': 'c', 'seed': 3}
+        assert handle_request(request, characters, roster=roster) == \
+            {'roll_for': 'ste', 'roll_type': 'check', 'rolls': [8],
+             'mod': 15, 'total': 23}
+        assert characters['rogue'].name == 'rogue'
+        assert handle_request({'character': 'inputs/cleric.txt',
+                               'roll_for': 'str', 'roll_type': 's',
+                               'seed': 3}, characters,
+                              roster=roster)['total'] == 9
+
+
+# --------------------------------------------------
+def test_serve(tmp_path):
+    """ test a round trip over a Unix socket """
+    socket_path = str(tmp_path / 'rolld.sock')
+
+    async def round_trip():
+        server = asyncio.create_task(serve(socket_path))
+        while not os.path.exists(socket_path):
+            await asyncio.sleep(0.01)
+        request = {'character': 'inputs/cleric.txt', 'roll_for': 'str',
+                   'roll_type': 'save', 'seed': 3}
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        writer.write(json.dumps(request).encode() + b'\n')
+        response = json.loads(await reader.readline())
+        writer.close()
+        server.cancel()
+        return response
+
+    assert asyncio.run(round_trip())['total'] == 9
+
+
+# --------------------------------------------------
+def test_serve_reload(tmp_path):
+    """ test the server picks up an edited sheet """
+    socket_path = str(tmp_path / 'rolld.sock')
+    sheet_file = tmp_path / 'rogue.txt'
+    with open('inputs/rogue.txt', 'rt') as fh:
+        text = fh.read()
+    sheet_file.write_text(text)
+    request = json.dumps({'character': str(sheet_file), 'roll_for': 'ste',
+                          'roll_type': 'c'}).encode() + b'\n'
+
+    async def ask(reader, writer):
+        writer.write(request)
+        return json.loads(await reader.readline())['mod']
+
+    async def edit_between_rolls():
+        server = asyncio.create_task(serve(socket_path, reload=0.01))
+        while not os.path.exists(socket_path):
+            await asyncio.sleep(0.01)
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        before = await ask(reader, writer)
+        sheet_file.write_text(text.replace('5\n', '6\n', 1))
+        os.utime(sheet_file, ns=(10 ** 9, 10 ** 9))
+        await asyncio.sleep(0.2)
+        after = await ask(reader, writer)
+        writer.close()
+        server.cancel()
+        return before, after
+
+    assert asyncio.run(edit_between_rolls()) == (15, 17)
+
+
+# --------------------------------------------------
+if __name__ == '__main__':
+    main()
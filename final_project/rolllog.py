@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Append-only binary log of rolls, and a query command that
+         summarizes it by character and roll without parsing any text.
+"""
+
+import argparse
+import fcntl
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from collections import defaultdict
+from typing import NamedTuple
+
+from batch import np
+from cache import MOD_KEYS
+from errors import RollError
+from rolls import ABBREVS, describe_roll
+from rules import HOMEBREW_ERROR, RULES
+
+MAGIC = b'ROLLLOG2'
+
+# time (us since the epoch), character id, roll key (index into MOD_KEYS),
+# advantage flag (0 none, 1 advantage, 2 disadvantage), kept die, first
+# die, second die (0 if only one), modifier, total
+RECORD = struct.Struct('<qIBBBBBbh')
+
+# magic and rules signature (the skill list roll keys index), padded to
+# one record
+HEADER = struct.pack('<8sI', MAGIC, RULES.signature).ljust(RECORD.size,
+                                                           b'\0')
+FLAGS = {(False, False): 0, (True, False): 1, (False, True): 2}
+KEY_INDEX = {key: i for i, key in enumerate(MOD_KEYS)}
+
+if np is not None:
+    DTYPE = np.dtype([('time', '<i8'), ('char', '<u4'), ('key', 'u1'),
+                      ('flag', 'u1'), ('kept', 'u1'), ('roll1', 'u1'),
+                      ('roll2', 'u1'), ('mod', 'i1'), ('total', '<i2')])
+
+
+class Stats(NamedTuple):
+    """ Summary of the rolls for one character and roll """
+    count: int
+    mean_total: float
+    mean_die: float
+    nat20: float
+    nat1: float
+
+
+class RollLog:
+    """
+    Appends rolls to a log file. Character names are stored once each,
+    in a FILE.names file alongside, and records refer to them by id. Ids
+    are given out from that table, so no two names share one.
+    Raises ValueError for an existing file that isn't a roll log for the
+    current rules.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.ids = None  # name: character id
+        try:
+            with open(path, 'rb') as fh:
+                check_header(path, fh.read(len(HEADER)))
+        except FileNotFoundError:
+            pass
+
+    def append(self, name, roll_type, roll_for, rolls, mod, adv=False,
+               disadv=False, when=None):
+        """ Log one roll. rolls is the list roll_dice returned """
+        if self.ids is None:
+            self.ids = {n: i for i, n in read_names(self.path).items()}
+        char_id = self.ids.get(name)
+        if char_id is None:
+            char_id = self.add_name(name)
+
+        roll1, roll2 = (rolls[1], rolls[2]) if len(rolls) == 3 \
+            else (rolls[0], 0)
+        when = time.time_ns() // 1000 if when is None else when
+        record = RECORD.pack(when, char_id, KEY_INDEX[(roll_type, roll_for)],
+                             FLAGS[(bool(adv), bool(disadv))], rolls[0],
+                             roll1, roll2, mod, rolls[0] + mod)
+
+        # one write of one record, so concurrent appenders don't interleave
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size == 0:
+                record = HEADER + record
+            os.write(fd, record)
+        finally:
+            os.close(fd)
+
+    def add_name(self, name):
+        """
+        The id for name, adding it to the names file if it isn't there.
+        The file is locked while it is re-read and added to, so other
+        processes appending to the same log can't hand out the same id.
+        """
+        with open(self.path + '.names', 'a+t') as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            fh.seek(0)
+            names = parse_names(fh)
+            self.ids = {n: i for i, n in names.items()}
+            if name not in self.ids:
+                # the name's crc32, or the next id after it that is free
+                char_id = character_id(name)
+                while char_id in names:
+                    char_id = (char_id + 1) & 0xFFFFFFFF
+                fh.write(f'{char_id}\t{name}\n')
+                self.ids[name] = char_id
+        return self.ids[name]
+
+
+# --------------------------------------------------
+def check_header(path, data):
+    """
+    Raise ValueError unless data, the start of the file at path, is the
+    header of a roll log written for the current rules. An empty file
+    passes.
+    """
+    if not data:
+        return
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f'{path} is not a roll log.')
+    if data[:len(HEADER)] != HEADER:
+        raise ValueError(f'{path} was written for a different list of '
+                         'skills.')
+
+
+# --------------------------------------------------
+def character_id(name):
+    """
+    The 32-bit id a name is given if no other name in the log has it.
+    Binary output (output.py), which has no names file, always uses it.
+    """
+    return zlib.crc32(name.encode())
+
+
+# --------------------------------------------------
+def read_names(path):
+    """ {character id: name} for a log """
+    if not os.path.exists(path + '.names'):
+        return {}
+    with open(path + '.names', 'rt') as fh:
+        return parse_names(fh)
+
+
+# --------------------------------------------------
+def parse_names(fh):
+    """ {character id: name} from the lines of a names file """
+    names = {}
+    for line in fh:
+        char_id, name = line.rstrip('\n').split('\t', 1)
+        names[int(char_id)] = name
+    return names
+
+
+# --------------------------------------------------
+def summarize(path, character=None, roll_for=None):
+    """
+    {(name, roll_type, roll_for): Stats} for every roll in the log,
+    optionally only for one character name and/or ability or skill.
+    """
+    names = read_names(path)
+    with open(path, 'rb') as fh:
+        if os.fstat(fh.fileno()).st_size <= len(HEADER):
+            return {}
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            check_header(path, data[:len(HEADER)])
+            usable = (len(data) - len(HEADER)) // RECORD.size * RECORD.size
+            if np is not None:
+                sums = _sums_numpy(data, usable)
+            else:
+                sums = _sums_python(data, usable)
+
+    stats = {}
+    for (char_id, key), (count, total, die, nat20, nat1) in sums.items():
+        name = names.get(char_id, f'#{char_id}')
+        roll_type, roll = MOD_KEYS[key]
+        if character not in (None, name) or roll_for not in (None, roll):
+            continue
+        stats[(name, roll_type, roll)] = Stats(count, total / count,
+                                               die / count, nat20 / count,
+                                               nat1 / count)
+    return stats
+
+
+# --------------------------------------------------
+def _sums_python(data, usable):
+    """ {(char id, key): [count, total, die, nat 20s, nat 1s]} """
+    sums = defaultdict(lambda: [0, 0, 0, 0, 0])
+    view = memoryview(data)[len(HEADER):len(HEADER) + usable]
+    for _, char_id, key, _, kept, _, _, _, total in RECORD.iter_unpack(view):
+        row = sums[(char_id, key)]
+        row[0] += 1
+        row[1] += total
+        row[2] += kept
+        row[3] += kept == 20
+        row[4] += kept == 1
+    view.release()
+    return sums
+
+
+# --------------------------------------------------
+def _sums_numpy(data, usable):
+    """ _sums_python() with NumPy, grouping by (char id, key) """
+    recs = np.frombuffer(data, dtype=DTYPE, count=usable // RECORD.size,
+                         offset=len(HEADER))
+    group = recs['char'].astype(np.uint64) << 8 | recs['key']
+    keys, inverse = np.unique(group, return_inverse=True)
+    columns = [np.bincount(inverse),
+               np.bincount(inverse, recs['total']),
+               np.bincount(inverse, recs['kept']),
+               np.bincount(inverse, recs['kept'] == 20),
+               np.bincount(inverse, recs['kept'] == 1)]
+    return {(int(k >> 8), int(k & 255)): [int(c[i]) for c in columns]
+            for i, k in enumerate(keys)}
+
+
+# --------------------------------------------------
+def test_roll_log(tmp_path):
+    """ test appending to and summarizing a log """
+    path = str(tmp_path / 'rolls.log')
+    log = RollLog(path)
+    log.append('rogue', 'check', 'ste', [17, 17, 4], 15, adv=True)
+    log.append('rogue', 'check', 'ste', [20, 3, 20], 15, adv=True)
+    log.append('rogue', 'save', 'dex', [1], 10)
+    RollLog(path).append('cleric', 'save', 'wis', [12], 9)
+
+    assert os.path.getsize(path) == len(HEADER) + 4 * RECORD.size
+    assert read_names(path) == {character_id('rogue'): 'rogue',
+                                character_id('cleric'): 'cleric'}
+
+    # plumless and buckeroo have the same crc32
+    assert character_id('plumless') == character_id('buckeroo')
+    log.append('plumless', 'save', 'str', [4], 1)
+    RollLog(path).append('buckeroo', 'save', 'str', [6], 2)
+    log.append('buckeroo', 'save', 'str', [8], 2)
+    assert read_names(path)[character_id('plumless') + 1] == 'buckeroo'
+    assert summarize(path, 'plumless')[('plumless', 'save', 'str')].count == 1
+    assert summarize(path, 'buckeroo')[('buckeroo', 'save', 'str')].count == 2
+
+    stats = summarize(path)
+    assert stats[('rogue', 'check', 'ste')] == Stats(2, 33.5, 18.5, 0.5, 0.0)
+    assert stats[('rogue', 'save', 'dex')] == Stats(1, 11.0, 1.0, 0.0, 1.0)
+    assert list(summarize(path, character='cleric')) == \
+        [('cleric', 'save', 'wis')]
+    assert list(summarize(path, roll_for='dex')) == \
+        [('rogue', 'save', 'dex')]
+
+    with open(path, 'r+b') as fh:
+        fh.seek(len(MAGIC))
+        fh.write(struct.pack('<I', RULES.signature ^ 1))
+    for action in [summarize, RollLog]:
+        try:
+            action(path)
+            assert False
+        except ValueError as err:
+            assert str(err) == f'{path} was written for a different list ' \
+                'of skills.'
+
+
+# --------------------------------------------------
+def get_args():
+    """Get command-line arguments"""
+
+    parser = argparse.ArgumentParser(
+        description='Summarize a roll log',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('log',
+                        help='Roll log written with --log',
+                        metavar='FILE')
+
+    parser.add_argument('-c',
+                        '--character',
+                        metavar='NAME',
+                        help='Only this character')
+
+    parser.add_argument('-r',
+                        '--roll-for',
+                        metavar='STR',
+                        help='Only this ability or skill (any name, '
+                        'abbreviation or unique start of one)')
+
+    args = parser.parse_args()
+    if HOMEBREW_ERROR:
+        parser.error(HOMEBREW_ERROR)
+    if args.roll_for is not None:
+        try:
+            args.roll_for = RULES.resolve(args.roll_for)
+        except RollError as err:
+            parser.error(str(err))
+
+    return args
+
+
+# --------------------------------------------------
+def main():
+    """Make a jazz noise here"""
+
+    args = get_args()
+    try:
+        stats = summarize(args.log, args.character, args.roll_for)
+    except (OSError, ValueError) as err:
+        sys.exit(str(err))
+    if not stats:
+        sys.exit('No matching rolls.')
+
+    width = max([len('Character')] + [len(name) for name, _, _ in stats])
+    print(f'\n{"Character":<{width}}  {"Roll":<22} {"Count":>7}  '
+          f'{"Avg total":>9}  {"Avg die":>7}  {"Nat 20":>6}  {"Nat 1":>6}')
+    for (name, roll_type, roll), res in sorted(stats.items()):
+        roll = describe_roll(roll, roll_type, False, False, ABBREVS)
+        roll = roll.split(' ', 1)[1]
+        print(f'{name:<{width}}  {roll:<22} {res.count:>7}  '
+              f'{res.mean_total:>9.2f}  {res.mean_die:>7.2f}  '
+              f'{res.nat20:>6.1%}  {res.nat1:>6.1%}')
+    print()
+
+
+# --------------------------------------------------
+if __name__ == '__main__':
+    main()
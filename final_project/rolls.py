@@ -9,6 +9,30 @@ Purpose: Roll saving throws, ability checks, and skill checks
 import argparse
 import random
 import sys
+from time import perf_counter_ns
+
+import profiling
+from backends import BACKENDS
+from errors import RollError, SheetError
+from odds import prob_at_least, total_pmf
+from rules import HOMEBREW_ERROR, RULES
+
+# canonical abbreviations, in the order used by precomputed tables
+ABILITIES = RULES.abilities
+SKILLS = RULES.skills
+
+# every accepted name of an ability or skill: its abbreviation
+ABBREVS = RULES.aliases
+
+# abbreviation: name to show, e.g. 'anh': 'Animal handling'
+DISPLAY_NAMES = RULES.names
+
+# the lines of a character file, in order
+SHEET_LINES = ('proficiency bonus', 'ability scores',
+               'saving throw proficiencies', 'skill proficiencies')
+
+# accepted roll types: 'save' or 'check'
+ROLL_TYPES = RULES.roll_types
 
 
 # --------------------------------------------------
@@ -19,35 +43,23 @@ def get_args():
         description='Get arguments',
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
 
-    skills_and_abilities = ['str', 'strength', 'dex', 'dexterity', 'con',
-                            'constitution', 'int', 'intelligence', 'wis',
-                            'wisdom', 'cha', 'charisma', "acrobatics", "acr",
-                            "animal handling", "anh", "arcana", "arc",
-                            "athletics", "ath", "deception", "dec", "insight",
-                            "ins", "intimidation", "intim", "investigation",
-                            "inv", "medicine", "med", "nature", "nat",
-                            "perception", "perc", "performance", "perf",
-                            "persuasion", "pers", "religion", "rel",
-                            "sleight of hand", "soh", "stealth",
-                            "ste", "survival", "sur", 'surv']
-
-    roll_types = ['save', 's', 'saving throw', 'ability',
-                  'a', 'skill', 'check', 'c']
-
     parser.add_argument('character',
                         help='.txt with character info and stats',
                         metavar='FILE',
+                        nargs='?',
                         type=argparse.FileType('rt'))
 
     parser.add_argument('roll_for',
                         metavar='STR',
-                        help='What skill or ability to roll for',
-                        choices=skills_and_abilities)
+                        nargs='?',
+                        help='What skill or ability to roll for (any '
+                        'unambiguous start of its name will do)')
 
     parser.add_argument('roll_type',
                         metavar='STR',
+                        nargs='?',
                         help='The type of roll to make (ability or save)',
-                        choices=roll_types)
+                        choices=list(ROLL_TYPES))
 
     dis_adv = parser.add_mutually_exclusive_group()
     dis_adv.add_argument('-a',
@@ -66,60 +78,253 @@ def get_args():
                         help='Optional seed value for testing',
                         type=int)
 
-    return parser.parse_args()
+    parser.add_argument('--rng',
+                        metavar='NAME',
+                        help='Random number generator: mt (Mersenne '
+                        'Twister), pcg64 (needs NumPy) or system (secure, '
+                        'cannot be seeded)',
+                        choices=BACKENDS,
+                        default='mt')
+
+    parser.add_argument('-o',
+                        '--odds',
+                        help='Show the chance of each total instead of '
+                        'rolling',
+                        action='store_true')
+
+    parser.add_argument('--dc',
+                        metavar='int',
+                        help='Show the chance of meeting this DC '
+                        'instead of rolling',
+                        type=int)
+
+    parser.add_argument('-f',
+                        '--format',
+                        help='Output format for the roll: prose, json, '
+                        'csv, tsv or binary (a roll log record)',
+                        metavar='FMT',
+                        choices=['prose', 'json', 'csv', 'tsv', 'binary'],
+                        default='prose')
+
+    parser.add_argument('-l',
+                        '--log',
+                        metavar='FILE',
+                        help='Also record the roll in this roll log')
+
+    parser.add_argument('-p',
+                        '--profile',
+                        help='Print how long each stage took to stderr',
+                        action='store_true')
+
+    parser.add_argument('--stream',
+                        metavar='FILE',
+                        help='Instead of one roll, roll each JSON request '
+                        'in FILE (- for stdin) and write one result per '
+                        'line, as stream.py does',
+                        type=argparse.FileType('rt'))
+
+    args = parser.parse_args()
+    if HOMEBREW_ERROR:
+        parser.error(HOMEBREW_ERROR)
+    if args.stream:
+        if args.character or args.advantage or args.disadvantage or \
+                args.odds or args.dc is not None or args.rng != 'mt':
+            parser.error('--stream takes the character, roll and '
+                         '-a/-d from each request, and cannot be used '
+                         'with --odds, --dc or --rng')
+        if args.format == 'prose':
+            args.format = 'json'
+        return args
+    if args.roll_type is None:
+        parser.error('the following arguments are required: FILE, STR, STR')
+    try:
+        args.roll_for = RULES.resolve(args.roll_for)
+    except RollError as err:
+        parser.error(f'argument STR: {err}')
+    if args.format != 'prose' and (args.odds or args.dc is not None):
+        parser.error('--format only applies to rolls, not --odds or --dc')
+    if args.rng == 'system' and args.seed is not None:
+        parser.error('--seed cannot be used with --rng system')
+
+    return args
 
 
 # --------------------------------------------------
 def main():
     """Make a jazz noise here"""
 
+    start = perf_counter_ns()
     args = get_args()
+    if args.profile:
+        profiling.enable()
+        profiling.record('get_args', perf_counter_ns() - start)
+    if args.stream:
+        from stream import run_stream  # pylint: disable=C0415
+        try:
+            run_stream(args.stream, sys.stdout, args.format, args.seed,
+                       args.log)
+        except (OSError, ValueError) as err:
+            sys.exit(str(err))
+        if args.profile:
+            print(profiling.report(), file=sys.stderr)
+        return
+
     roll_for = args.roll_for
     roll_type = args.roll_type
     adv = args.advantage
     disadv = args.disadvantage
     file_name = args.character.name
 
-    abbrevs = {'strength': 'str', 'dexterity': 'dex', 'constitution': 'con',
-               'intelligence': 'int', 'wisdom': 'wis', 'charisma': 'cha',
-               "acrobatics": "acr", "animal handling": "anh", "arcana": "arc",
-               "athletics": "ath", "deception": "dec", "insight": "ins",
-               "intimidation": "intim", "investigation": "inv", "medicine":
-               "med", "nature": "nat", "perception": "perc", "performance":
-               "perf", "persuasion": "pers", "religion": "rel",
-               "sleight of hand": "soh", "stealth": "ste", "survival": "sur"}
-
-    # read args.character
-    for i, line in enumerate(args.character):
-        if i == 0:
-            try:
-                prof_bonus = int(line.strip())
-            except:  # pylint: disable=W0702
-                sys.exit(f'Non-integer value found in {file_name}.')
-        elif i == 1:
-            scores = read_dict(line, file_name)
-        elif i == 2:
-            save_profs = read_dict(line, file_name)
-        elif i == 3:
-            skill_profs = read_dict(line, file_name)
-
-    # determine if the roll is an ability check or saving throw,
-    # then use the appropriate dictionary of proficiencies
-    if roll_type in ['save', 's', 'saving throw']:
-        roll_type = 'save'
-        relevant_profs = save_profs
-    elif roll_type in ['ability', 'a', 'skill', 'check', 'c']:
-        roll_type = 'check'
-        relevant_profs = skill_profs
+    abbrevs = ABBREVS
+
+    # read args.character, using the compiled cache when it is fresh.
+    # Every modifier is precomputed, so the roll itself is one lookup.
+    from character import Character  # pylint: disable=C0415
+    args.character.close()
+    with profiling.stage('load'):
+        try:
+            character = Character.load(file_name)
+        except SheetError as err:
+            sys.exit(str(err))
 
     # calculate roll and print results to stdout
-    roll_for = std_abbrev(roll_for, abbrevs)
-    ability = determine_ability(roll_for)
-    prof = calc_prof(roll_for, relevant_profs, prof_bonus)
-    pos_neg, mod = calc_mod(scores, ability, prof)
-    rolls = roll_dice(adv, disadv, args.seed)
-    print_header(roll_for, roll_type, adv, disadv, abbrevs)
-    calc_total(rolls, pos_neg, mod)
+    with profiling.stage('resolve'):
+        roll_type = ROLL_TYPES[roll_type]
+        roll_for = std_abbrev(roll_for, abbrevs)
+        mod = character.modifier(roll_for, roll_type)
+        pos_neg = "+" if mod >= 0 else ""
+    if args.odds or args.dc is not None:
+        with profiling.stage('output'):
+            print_odds(roll_for, roll_type, adv, disadv, abbrevs, mod,
+                       args.dc)
+    else:
+        with profiling.stage('roll_dice'):
+            if args.rng == 'mt':
+                rolls = roll_dice(adv, disadv, args.seed)
+            else:
+                from rng import make_rng  # pylint: disable=C0415
+                try:
+                    rng = make_rng(args.seed, args.rng)
+                except ValueError as err:
+                    sys.exit(str(err))
+                rolls = roll_dice(adv, disadv, None, rng)
+        with profiling.stage('output'):
+            if args.format == 'prose':
+                print_header(roll_for, roll_type, adv, disadv, abbrevs)
+                calc_total(rolls, pos_neg, mod)
+            else:
+                from output import RollWriter  # pylint: disable=C0415
+                with RollWriter(sys.stdout, args.format) as writer:
+                    writer.write({'roll_for': roll_for,
+                                  'roll_type': roll_type, 'rolls': rolls,
+                                  'mod': mod, 'total': rolls[0] + mod},
+                                 character.name, adv, disadv)
+        if args.log:
+            from rolllog import RollLog  # pylint: disable=C0415
+            with profiling.stage('log'):
+                try:
+                    RollLog(args.log).append(character.name, roll_type,
+                                             roll_for, rolls, mod, adv,
+                                             disadv)
+                except (OSError, ValueError) as err:
+                    sys.exit(str(err))
+
+    if args.profile:
+        print(profiling.report(), file=sys.stderr)
+
+
+# --------------------------------------------------
+def read_character(fh, file_name):
+    """
+    Read the four lines of a character .txt file.
+    Returns prof_bonus, scores, save_profs, skill_profs.
+    Raises SheetError for values that aren't whole numbers, a missing
+    line, or a missing ability score.
+    """
+    lines = [line for _, line in zip(SHEET_LINES, fh)]
+    if len(lines) < len(SHEET_LINES):
+        raise SheetError(f'No {SHEET_LINES[len(lines)]} line in '
+                         f'{file_name}.')
+
+    try:
+        prof_bonus = int(lines[0].strip())
+    except ValueError:
+        raise SheetError(f'Non-integer value found in {file_name}.') \
+            from None
+    scores, save_profs, skill_profs = \
+        [read_dict(line, file_name) for line in lines[1:]]
+
+    for ability in ABILITIES:
+        if ability not in scores:
+            raise SheetError(f'No {ability} score in {file_name}.')
+
+    return prof_bonus, scores, save_profs, skill_profs
+
+
+# --------------------------------------------------
+def test_read_character():
+    """ test read_character() """
+    with open('inputs/cleric.txt', 'rt') as fh:
+        prof_bonus, scores, save_profs, skill_profs = \
+            read_character(fh, fh.name)
+
+    assert prof_bonus == 4
+    assert scores['wis'] == 20
+    assert save_profs == {'wis': 1, 'cha': 1}
+    assert skill_profs['med'] == 1
+
+    sheet = ['4\n', 'str:13, dex:14, con:19, int:8, wis:20, cha:10\n',
+             'wis:1, cha:1\n', 'med:1\n']
+    for lines, message in [
+            ([], 'No proficiency bonus line in x.txt.'),
+            (sheet[:1], 'No ability scores line in x.txt.'),
+            (sheet[:3], 'No skill proficiencies line in x.txt.'),
+            (sheet[:1] + ['str:13, con:19, int:8, wis:20, cha:10\n']
+             + sheet[2:], 'No dex score in x.txt.')]:
+        try:
+            read_character(iter(lines), 'x.txt')
+            assert False, lines
+        except SheetError as err:
+            assert str(err) == message
+
+
+# --------------------------------------------------
+def calc_all_mods(prof_bonus, scores, save_profs, skill_profs):
+    """
+    Calculate the final modifier for every save, ability check and skill
+    check at once. Returns {(roll_type, roll_for): mod}, where roll_type is
+    'save' or 'check'. Skills get a 'save' entry too, since the command
+    line accepts e.g. 'ste save' (a plain save of the skill's ability).
+    Rolls using an ability missing from scores are left out.
+    """
+    mods = {}
+    for roll_type, profs in [('save', save_profs), ('check', skill_profs)]:
+        for roll_for in ABILITIES + SKILLS:
+            ability = determine_ability(roll_for)
+            if ability not in scores:
+                continue
+            prof = calc_prof(roll_for, profs, prof_bonus)
+            mods[(roll_type, roll_for)] = calc_mod(scores, ability, prof)[1]
+    return mods
+
+
+# --------------------------------------------------
+def test_calc_all_mods():
+    """ test calc_all_mods() """
+    scores = {'str': 9, 'dex': 20, 'con': 14, 'int': 10, 'wis': 8, 'cha': 16}
+    mods = calc_all_mods(5, scores, {'dex': 1}, {'ste': 2, 'perc': 1})
+
+    assert len(mods) == 2 * (len(ABILITIES) + len(SKILLS))
+    assert mods[('save', 'dex')] == 10
+    assert mods[('save', 'str')] == 0
+    assert mods[('check', 'ste')] == 15
+    assert mods[('check', 'perc')] == 4
+    assert mods[('check', 'cha')] == 3
+
+    del scores['dex']
+    mods = calc_all_mods(5, scores, {'dex': 1}, {'ste': 2, 'perc': 1})
+    assert ('check', 'ste') not in mods and ('save', 'dex') not in mods
+    assert mods[('check', 'perc')] == 4
 
 
 # --------------------------------------------------
@@ -138,8 +343,9 @@ def read_dict(line, file_name):
         pair = i.split(":")
         try:
             pair[1] = int(pair[1])
-        except:  # pylint: disable=W0702
-            sys.exit(f'Non-integer value found in {file_name}.')
+        except (ValueError, IndexError):
+            raise SheetError(f'Non-integer value found in {file_name}.') \
+                from None
         dictionary[pair[0]] = pair[1]
     return dictionary
 
@@ -149,6 +355,12 @@ def test_read_dict():
     """ test read_dict() """
     assert read_dict("int:8, wis:20, cha:10", 'file.py') \
         == {"int": 8, "wis": 20, "cha": 10}
+    for bad in ['int:8, wis:twenty', 'int']:
+        try:
+            read_dict(bad, 'file.py')
+            assert False, bad
+        except SheetError as err:
+            assert str(err) == 'Non-integer value found in file.py.'
 
 
 # --------------------------------------------------
@@ -156,8 +368,12 @@ def std_abbrev(roll_for, abbrevs):
     """
     Standardize ability and skill notation to typical 5e abbreviations.
     roll_for: ability/skill being rolled for
-    abbrevs: dict of {full names: abbreviated names}
+    abbrevs: dict of {full names: abbreviated names}. With ABBREVS, unique
+        prefixes of names are accepted too (see rules.Rules.key).
+    Returns roll_for unchanged if it isn't recognized.
     """
+    if abbrevs is ABBREVS:
+        return RULES.key(roll_for, roll_for)
 
     if abbrevs.get(roll_for):
         return abbrevs[roll_for]
@@ -179,20 +395,15 @@ def test_std_abbrev():
     assert std_abbrev("intimidation", ab) == 'intim'
     assert std_abbrev("pers", ab) == "pers"
 
+    assert std_abbrev("stea", ABBREVS) == "ste"
+    assert std_abbrev("surv", ABBREVS) == "sur"
+    assert std_abbrev("per", ABBREVS) == "per"
+
 
 # --------------------------------------------------
-def determine_ability(roll_for):  # pylint: disable=R1710
+def determine_ability(roll_for):
     """ determine which ability is being used for the roll """
-    ability_tbl = {'str': ['str', 'ath'],
-                   'dex': ['dex', 'acr', 'soh', 'ste'],
-                   'con': ['con'],
-                   'int': ['int', 'arc', 'inv', 'nat', 'rel'],
-                   'wis': ['wis', 'anh', 'ins', 'med', 'perc', 'sur'],
-                   'cha': ['cha', 'dec', 'intim', 'perf', 'pers']}
-
-    for k, _ in ability_tbl.items():
-        if roll_for in ability_tbl[k]:  # pylint: disable=R1733
-            return ability_tbl[k][0]  # pylint: disable=R1733
+    return RULES.ability.get(roll_for)
 
 
 # --------------------------------------------------
@@ -202,6 +413,7 @@ def test_determine_ability():
     assert determine_ability('dec') == 'cha'
     assert determine_ability('dex') == 'dex'
     assert determine_ability('sur') == 'wis'
+    assert determine_ability('history') is None
 
 
 # --------------------------------------------------
@@ -284,35 +496,58 @@ def test_calc_mod():
 
 
 # --------------------------------------------------
-def roll_dice(adv, disadv, seed):
+def roll_dice(adv, disadv, seed, rng=None):
     """
     Roll the dice. If advantage or disadvantage flags are used,
     roll the d20 twice and take the higher/lower number.
+    rng: generator to roll with (see rng.py). Defaults to the global one.
+    seed: if given (0 included), reseed the generator first.
     """
-    if seed:
-        random.seed(seed)
+    if rng is None:
+        rng = random
+    if seed is not None:
+        rng.seed(seed)
 
     if adv or disadv:
-        roll1 = random.randint(1, 20)
-        roll2 = random.randint(1, 20)
+        roll1 = rng.randint(1, 20)
+        roll2 = rng.randint(1, 20)
         if adv:
             roll = max(roll1, roll2)
         else:
             roll = min(roll1, roll2)
         return [roll, roll1, roll2]
 
-    roll = random.randint(1, 20)
+    roll = rng.randint(1, 20)
     return [roll]
 
 
+# --------------------------------------------------
+def test_roll_dice():
+    """ test roll_dice() """
+    assert roll_dice(False, False, 3) == [8]
+    assert roll_dice(False, True, 3) == [8, 8, 19]
+    assert roll_dice(False, False, 0) == roll_dice(False, False, 0)
+    assert roll_dice(True, False, None, random.Random(3)) == [19, 8, 19]
+
+
 # --------------------------------------------------
 def print_header(roll_for, roll_type, adv, disadv, abbrevs):
     """
     Tell user what they made a roll for and whether it was with
     advantage or disadvantage.
     """
-    roll_for = ([k for k, v in abbrevs.items()
-                 if v == roll_for][0]).capitalize()
+    roll = describe_roll(roll_for, roll_type, adv, disadv, abbrevs)
+    print(f'\nYou made {roll}.')
+
+
+# --------------------------------------------------
+def describe_roll(roll_for, roll_type, adv, disadv, abbrevs):
+    """ Describe a roll in words, e.g. 'an Insight check with advantage' """
+    if abbrevs is ABBREVS:
+        roll_for = DISPLAY_NAMES[roll_for]
+    else:
+        roll_for = ([k for k, v in abbrevs.items()
+                     if v == roll_for][0]).capitalize()
 
     if roll_for[0] in ['A', 'E', 'I', 'O', 'U']:
         article = "an"
@@ -326,20 +561,75 @@ def print_header(roll_for, roll_type, adv, disadv, abbrevs):
     else:
         dis_adv = ""
 
-    print(f'\nYou made {article} {roll_for} {roll_type}{dis_adv}.')
+    return f'{article} {roll_for} {roll_type}{dis_adv}'
+
+
+# --------------------------------------------------
+def test_describe_roll():
+    """ test describe_roll() """
+    ab = {'wisdom': 'wis', 'insight': 'ins'}
+
+    assert describe_roll('wis', 'save', False, False, ab) == 'a Wisdom save'
+    assert describe_roll('ins', 'check', True, False, ab) \
+        == 'an Insight check with advantage'
 
 
 # --------------------------------------------------
 def calc_total(rolls, pos_neg, mod):
     """ calculate the final total and print formatted results """
+    print(total_text(rolls, pos_neg, mod))
+
+
+# --------------------------------------------------
+def total_text(rolls, pos_neg, mod):
+    """ The text calc_total prints """
     if len(rolls) == 3:
-        print(f'\nYour total is {rolls[0] + mod}.')
-        print(f'You rolled a {rolls[1]} and a {rolls[2]} on the d20 \
-with a {pos_neg}{mod} modifier.\n')
-    elif len(rolls) == 1:
-        print(f'\nYour total is {rolls[0] + mod}.')
-        print(f'You rolled a {rolls[0]} on the d20 with a \
-{pos_neg}{mod} modifier.\n')
+        return f'\nYour total is {rolls[0] + mod}.\n' \
+            f'You rolled a {rolls[1]} and a {rolls[2]} on the d20 \
+with a {pos_neg}{mod} modifier.\n'
+    return f'\nYour total is {rolls[0] + mod}.\n' \
+        f'You rolled a {rolls[0]} on the d20 with a \
+{pos_neg}{mod} modifier.\n'
+
+
+# --------------------------------------------------
+def test_total_text():
+    """ test total_text() """
+    assert total_text([8], '+', 1) == '\nYour total is 9.\n' \
+        'You rolled a 8 on the d20 with a +1 modifier.\n'
+    assert total_text([8, 8, 19], '', -1) == '\nYour total is 7.\n' \
+        'You rolled a 8 and a 19 on the d20 with a -1 modifier.\n'
+
+
+# --------------------------------------------------
+def print_odds(roll_for, roll_type, adv, disadv, abbrevs, mod, dc):
+    """
+    Print the exact chance of each total, or only the chance of meeting
+    dc when one is given.
+    """
+    pmf = total_pmf(mod, adv, disadv)
+    pos_neg = "+" if mod >= 0 else ""
+    roll = describe_roll(roll_for, roll_type, adv, disadv, abbrevs)
+    print(f'\nOdds for {roll}.')
+
+    if dc is not None:
+        chance = float(prob_at_least(pmf, dc))
+        print(f'\nYour chance of a total of {dc} or more is {chance:.2%}.')
+        print(f'You would roll the d20 with a {pos_neg}{mod} modifier.\n')
+        return
+
+    print_odds_table(pmf)
+    print(f'\nYou would roll the d20 with a {pos_neg}{mod} modifier.\n')
+
+
+# --------------------------------------------------
+def print_odds_table(pmf):
+    """ Print each total with its chance and the chance of at least it """
+    at_least = 1
+    print('\nTotal  Chance  At least')
+    for total in sorted(pmf):
+        print(f'{total:5}  {float(pmf[total]):6.2%}  {float(at_least):8.2%}')
+        at_least -= pmf[total]
 
 
 # --------------------------------------------------
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Many characters in one file. Each character is a fixed-size
+         record of scores, proficiencies and precomputed modifiers, found
+         by name through a hash index, so opening a roster is one mmap and
+         a lookup reads a handful of bytes.
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+from cache import SHEET_FORMAT, pack_sheet, parse_sheet, unpack_sheet
+from character import Character
+from party import find_sheets
+from rules import HOMEBREW_ERROR, RULES
+
+MAGIC = b'ROSTER02'
+
+# magic, rules signature (the skill list the records are laid out for),
+# number of characters, number of index slots, offset of the names
+HEADER = struct.Struct('<8sIIII')
+
+# index slot: record number + 1, or 0 for an empty slot
+SLOT = struct.Struct('<I')
+
+# offset and length of the name, then the sheet (see cache.pack_sheet)
+RECORD = struct.Struct('<IH' + SHEET_FORMAT)
+
+
+class Roster:
+    """
+    A roster file opened for lookups by character name, e.g.
+    Roster('npcs.roster')['goblin'] -> Character.
+    The file is mapped, not read, so only the pages touched are loaded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as fh:
+            self.data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, signature, self.count, self.slots, self.names_at = \
+                HEADER.unpack_from(self.data)
+        except struct.error:
+            magic = None
+        if magic != MAGIC:
+            self.data.close()
+            raise ValueError(f'{path} is not a roster.')
+        if signature != RULES.signature:
+            self.data.close()
+            raise ValueError(f'{path} was built for a different list of '
+                             'skills. Build it again.')
+        self.records_at = HEADER.size + self.slots * SLOT.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """ Unmap the file """
+        self.data.close()
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, name):
+        return self._find(name) is not None
+
+    def __getitem__(self, name):
+        fields = self._find(name)
+        if fields is None:
+            raise KeyError(name)
+        return Character(name, unpack_sheet(fields[2:]))
+
+    def get(self, name, default=None):
+        """ The Character called name, or default """
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def names(self):
+        """ Every name, in the order the characters were added """
+        return [self._name(self._record(i)) for i in range(self.count)]
+
+    def _record(self, num):
+        """ Fields of record num """
+        return RECORD.unpack_from(self.data,
+                                  self.records_at + num * RECORD.size)
+
+    def _name(self, fields):
+        """ The name a record points to """
+        start = self.names_at + fields[0]
+        return self.data[start:start + fields[1]].decode()
+
+    def _find(self, name):
+        """ Fields of the record for name, or None. Linear probing """
+        if not isinstance(name, str) or not self.slots:
+            return None
+        key = name.encode()
+        mask = self.slots - 1
+        slot = zlib.crc32(key) & mask
+        while True:
+            entry = SLOT.unpack_from(self.data,
+                                     HEADER.size + slot * SLOT.size)[0]
+            if not entry:
+                return None
+            fields = self._record(entry - 1)
+            start = self.names_at + fields[0]
+            if self.data[start:start + fields[1]] == key:
+                return fields
+            slot = (slot + 1) & mask
+
+
+# --------------------------------------------------
+def write_roster(path, sheets):
+    """
+    Write a roster from (name, Sheet) pairs. Raises ValueError for
+    duplicate names and sheets that don't fit the fixed layout.
+    """
+    records, names, seen = [], [], set()
+    names_size = 0
+    for name, sheet in sheets:
+        if name in seen:
+            raise ValueError(f'Duplicate character name "{name}".')
+        seen.add(name)
+        key = name.encode()
+        try:
+            records.append(RECORD.pack(names_size, len(key),
+                                       *pack_sheet(sheet)))
+        except (ValueError, struct.error) as err:
+            raise ValueError(f'Cannot add "{name}": {err}') from None
+        names.append(key)
+        names_size += len(key)
+
+    # at most half full, so probes stay short
+    slots = 1
+    while slots < 2 * len(records):
+        slots *= 2
+    index = [0] * slots
+    for num, key in enumerate(names):
+        slot = zlib.crc32(key) & (slots - 1)
+        while index[slot]:
+            slot = (slot + 1) & (slots - 1)
+        index[slot] = num + 1
+
+    names_at = HEADER.size + slots * SLOT.size + len(records) * RECORD.size
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as fh:
+        fh.write(HEADER.pack(MAGIC, RULES.signature, len(records), slots,
+                             names_at))
+        fh.write(struct.pack(f'<{slots}I', *index))
+        fh.write(b''.join(records))
+        fh.write(b''.join(names))
+    os.replace(tmp, path)
+    return len(records)
+
+
+# --------------------------------------------------
+def import_sheets(files, errors):
+    """
+    Parse character .txt files for write_roster(), yielding (name, Sheet)
+    pairs named after the file like Character.load(). Files that can't be
+    imported are skipped and added to errors as (file name, message).
+    """
+    for file_name in files:
+        name = os.path.splitext(os.path.basename(file_name))[0]
+        try:
+            sheet = parse_sheet(file_name)
+            pack_sheet(sheet)
+        except OSError as err:
+            errors.append((file_name, err.strerror))
+            continue
+        except ValueError as err:
+            errors.append((file_name, str(err)))
+            continue
+        yield name, sheet
+
+
+# --------------------------------------------------
+def build(path, files):
+    """
+    Import files into a roster at path.
+    Returns (characters written, [(file name, message)] for skipped files).
+    """
+    errors = []
+    count = write_roster(path, import_sheets(files, errors))
+    return count, errors
+
+
+# --------------------------------------------------
+def test_roster(tmp_path):
+    """ test building a roster and looking characters up in it """
+    path = str(tmp_path / 'party.roster')
+    count, errors = build(path, find_sheets(['inputs']))
+
+    assert count == 2
+    assert errors == [('inputs/bad.txt',
+                       'Non-integer value found in inputs/bad.txt.')]
+    short = tmp_path / 'short.txt'
+    short.write_text('4\nstr:13, dex:14, con:19, int:8, wis:20, cha:10\n')
+    assert build(str(tmp_path / 'short.roster'), [str(short)]) == \
+        (0, [(str(short), f'No saving throw proficiencies line in {short}.')])
+
+    with Roster(path) as roster:
+        assert len(roster) == 2
+        assert roster.names() == ['cleric', 'rogue']
+        assert 'rogue' in roster and 'wizard' not in roster
+        assert roster.get('wizard') is None
+
+        rogue = roster['rogue']
+        loaded = Character.load('inputs/rogue.txt')
+        assert rogue.name == 'rogue'
+        assert rogue.mods == loaded.mods
+        assert rogue.skill_profs == loaded.skill_profs
+        assert rogue.roll('ste', 'check', seed=3) == ([8], 15)
+
+
+# --------------------------------------------------
+def test_roster_many(tmp_path):
+    """ test every name is found in a larger roster """
+    sheet = parse_sheet('inputs/cleric.txt')
+    path = str(tmp_path / 'many.roster')
+    names = [f'npc {i}' for i in range(500)]
+    write_roster(path, ((name, sheet) for name in names))
+
+    with Roster(path) as roster:
+        assert all(name in roster for name in names)
+        assert 'npc 500' not in roster
+        assert roster['npc 123'].modifier('wis', 'save') == 9
+
+    try:
+        write_roster(path, [('a', sheet), ('a', sheet)])
+        assert False
+    except ValueError as err:
+        assert str(err) == 'Duplicate character name "a".'
+
+    with open(path, 'r+b') as fh:
+        fh.seek(8)
+        fh.write(struct.pack('<I', RULES.signature ^ 1))
+    try:
+        Roster(path)
+        assert False
+    except ValueError as err:
+        assert str(err).endswith('was built for a different list of '
+                                 'skills. Build it again.')
+
+
+# --------------------------------------------------
+def get_args():
+    """Get command-line arguments"""
+
+    parser = argparse.ArgumentParser(
+        description='Build or list a roster of characters',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('roster',
+                        help='Roster file',
+                        metavar='FILE')
+
+    parser.add_argument('-i',
+                        '--import',
+                        dest='sheets',
+                        help='Character sheets (files, directories or '
+                        'globs) to build the roster from',
+                        metavar='SHEET',
+                        nargs='+')
+
+    args = parser.parse_args()
+    if HOMEBREW_ERROR:
+        parser.error(HOMEBREW_ERROR)
+
+    return args
+
+
+# --------------------------------------------------
+def main():
+    """Make a jazz noise here"""
+
+    args = get_args()
+    if args.sheets:
+        files = find_sheets(args.sheets)
+        if not files:
+            sys.exit('No character sheets found.')
+        try:
+            count, errors = build(args.roster, files)
+        except (OSError, ValueError) as err:
+            sys.exit(str(err))
+        for file_name, message in errors:
+            print(f'Skipped {file_name}: {message}', file=sys.stderr)
+        print(f'Wrote {count} characters to {args.roster}.')
+        return
+
+    try:
+        with Roster(args.roster) as roster:
+            names = roster.names()
+    except (OSError, ValueError) as err:
+        sys.exit(str(err))
+    print('\n'.join(names))
+
+
+# --------------------------------------------------
+if __name__ == '__main__':
+    main()
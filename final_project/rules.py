@@ -0,0 +1,283 @@
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: The abilities, skills and roll types rolls are made for, in one
+         read-only registry built at import. Every name, abbreviation and
+         unique prefix a roll can be asked for is looked up in a dict.
+         Homebrew skills are added from a data file (see HOMEBREW).
+"""
+
+import os
+import zlib
+from types import MappingProxyType
+from typing import NamedTuple
+
+from errors import RollError
+
+# key: ability, full name[, other names]. A line whose key is its own
+# ability is an ability; the rest are skills. This order is the order of
+# ABILITIES, SKILLS and every precomputed table.
+BUILTIN = """
+str: str, strength
+dex: dex, dexterity
+con: con, constitution
+int: int, intelligence
+wis: wis, wisdom
+cha: cha, charisma
+acr: dex, acrobatics
+anh: wis, animal handling
+arc: int, arcana
+ath: str, athletics
+dec: cha, deception
+ins: wis, insight
+intim: cha, intimidation
+inv: int, investigation
+med: wis, medicine
+nat: int, nature
+perc: wis, perception
+perf: cha, performance
+pers: cha, persuasion
+rel: int, religion
+soh: dex, sleight of hand
+ste: dex, stealth
+sur: wis, survival, surv
+"""
+
+# accepted roll types: 'save' or 'check'
+ROLL_TYPES = {'save': 'save', 's': 'save', 'saving throw': 'save',
+              'ability': 'check', 'a': 'check', 'skill': 'check',
+              'check': 'check', 'c': 'check'}
+
+# homebrew skills, in the BUILTIN format, are read from the file named by
+# this environment variable, or from homebrew.txt next to this module
+HOMEBREW_ENV = 'ROLLS_HOMEBREW'
+HOMEBREW = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'homebrew.txt')
+
+
+class Rules(NamedTuple):
+    """
+    The registry. abilities and skills are the canonical keys in order;
+    aliases maps every accepted name (keys included) to its key, ability
+    each key to the ability it uses, names each key to the name to show,
+    and prefixes every unambiguous prefix of a name to its key.
+    signature identifies the skill list, for files laid out by it.
+    """
+    abilities: tuple
+    skills: tuple
+    aliases: MappingProxyType
+    ability: MappingProxyType
+    names: MappingProxyType
+    prefixes: MappingProxyType
+    roll_types: MappingProxyType
+    signature: int
+
+    def key(self, text, default=None):
+        """ The key text names, exactly or by a unique prefix, or default """
+        key = self.aliases.get(text) or self.prefixes.get(text)
+        if key is None and isinstance(text, str):
+            text = text.strip().lower()
+            key = self.aliases.get(text) or self.prefixes.get(text)
+        return default if key is None else key
+
+    def resolve(self, text):
+        """ The key text names. Raises RollError if none or several do """
+        key = self.key(text)
+        if key is not None:
+            return key
+        text = str(text).strip().lower()
+        matches = sorted({self.names[key] for alias, key in
+                          self.aliases.items() if alias.startswith(text)})
+        if text and matches:
+            raise RollError(f'"{text}" could be {", ".join(matches)}.')
+        raise RollError(f'Unknown ability or skill "{text}".')
+
+
+# --------------------------------------------------
+def parse_rules(text, source):
+    """
+    [(key, ability, [names])] from lines in the BUILTIN format. Blank lines
+    and lines starting with # are skipped. Raises RollError naming
+    source and the line for a line that can't be read.
+    """
+    entries = []
+    for num, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        key, colon, rest = line.partition(':')
+        fields = [f.strip().lower() for f in rest.split(',')]
+        key = key.strip().lower()
+        if not colon or len(fields) < 2 or not all(fields) or not key \
+                or ' ' in key or ',' in key:
+            raise RollError(f'{source}:{num}: expected "key: ability, '
+                            f'name[, other names]", found "{line}"')
+        entries.append((key, fields[0], fields[1:]))
+    return entries
+
+
+# --------------------------------------------------
+def build_rules(entries):
+    """
+    A frozen Rules from (key, ability, [names]) entries. Raises RollError
+    for a skill using an unknown ability or a name used twice.
+    """
+    abilities, skills = [], []
+    aliases, ability, names = {}, {}, {}
+    for key, uses, full_names in entries:
+        if key == uses:
+            abilities.append(key)
+        elif uses in abilities:
+            skills.append(key)
+        else:
+            raise RollError(f'Skill "{key}" uses unknown ability "{uses}".')
+        for alias in [key] + full_names:
+            if aliases.get(alias, key) != key:
+                raise RollError(f'"{alias}" already means '
+                                f'"{aliases[alias]}".')
+            aliases[alias] = key
+        ability[key] = uses
+        names[key] = full_names[0].capitalize()
+
+    # every prefix of every name, kept only where it names one key
+    candidates = {}
+    for alias, key in aliases.items():
+        for end in range(1, len(alias)):
+            candidates.setdefault(alias[:end], set()).add(key)
+    prefixes = {prefix: keys.pop() for prefix, keys in candidates.items()
+                if len(keys) == 1 and prefix not in aliases}
+
+    layout = ','.join(f'{key}:{ability[key]}' for key in abilities + skills)
+    return Rules(tuple(abilities), tuple(skills), MappingProxyType(aliases),
+                 MappingProxyType(ability), MappingProxyType(names),
+                 MappingProxyType(prefixes), MappingProxyType(ROLL_TYPES),
+                 zlib.crc32(layout.encode()))
+
+
+# --------------------------------------------------
+def load_rules(homebrew=None):
+    """
+    The built-in rules plus any skills in the homebrew file. Raises
+    RollError for a bad homebrew file and OSError for one that can't be
+    read.
+    """
+    entries = parse_rules(BUILTIN, 'rules.py')
+    if homebrew:
+        with open(homebrew, 'rt') as fh:
+            extra = parse_rules(fh.read(), homebrew)
+        for key, uses, _ in extra:
+            if key == uses:
+                raise RollError(f'{homebrew}: homebrew can only add skills, '
+                                f'not the ability "{key}".')
+        entries += extra
+    return build_rules(entries)
+
+
+# --------------------------------------------------
+def homebrew_file():
+    """ The homebrew file to use, or None """
+    path = os.environ.get(HOMEBREW_ENV)
+    if path:
+        return path
+    return HOMEBREW if os.path.isfile(HOMEBREW) else None
+
+
+# --------------------------------------------------
+def load_homebrew():
+    """
+    (rules, error): the rules with the homebrew file's skills, or, when
+    that file can't be read or used, the built-in rules and a message
+    saying why. Scripts report the message (see HOMEBREW_ERROR) instead of
+    failing on import.
+    """
+    path = homebrew_file()
+    try:
+        return load_rules(path), None
+    except OSError as err:
+        return load_rules(), f'Cannot read homebrew file "{path}": ' \
+            f'{err.strerror}'
+    except RollError as err:
+        return load_rules(), f'Bad homebrew file: {err}'
+
+
+RULES, HOMEBREW_ERROR = load_homebrew()
+
+
+# --------------------------------------------------
+def test_builtin_rules():
+    """ test the built-in registry """
+    rules = load_rules()
+    assert rules.abilities == ('str', 'dex', 'con', 'int', 'wis', 'cha')
+    assert len(rules.skills) == 17 and rules.skills[-1] == 'sur'
+    assert rules.aliases['sleight of hand'] == 'soh'
+    assert rules.aliases['surv'] == rules.aliases['sur'] == 'sur'
+    assert rules.ability['ste'] == 'dex' and rules.ability['wis'] == 'wis'
+    assert rules.names['anh'] == 'Animal handling'
+    assert rules.roll_types['saving throw'] == 'save'
+    try:
+        rules.aliases['x'] = 'str'
+        assert False
+    except TypeError:
+        pass
+
+
+# --------------------------------------------------
+def test_key_and_resolve():
+    """ test exact, prefix and case-insensitive lookups """
+    rules = load_rules()
+    for text, key in [('int', 'int'), ('intim', 'intim'), ('stea', 'ste'),
+                      ('Stealth', 'ste'), ('const', 'con'), ('sle', 'soh'),
+                      ('animal', 'anh'), ('inve', 'inv'), ('perc', 'perc')]:
+        assert rules.key(text) == key, text
+        assert rules.resolve(text) == key, text
+    assert rules.key('per') is None
+    assert rules.key('history', 'history') == 'history'
+
+    for text, message in [('per', '"per" could be Perception, Performance, '
+                                  'Persuasion.'),
+                          ('history', 'Unknown ability or skill "history".'),
+                          ('', 'Unknown ability or skill "".')]:
+        try:
+            rules.resolve(text)
+            assert False, text
+        except RollError as err:
+            assert str(err) == message
+
+
+# --------------------------------------------------
+def test_homebrew(tmp_path, monkeypatch):
+    """ test homebrew skills are added after the built-in ones """
+    path = tmp_path / 'homebrew.txt'
+    path.write_text('# kitchen skills\n\ncook: wis, cooking, cuisine\n'
+                    'hist: int, history\n')
+    rules = load_rules(str(path))
+    assert rules.skills[-3:] == ('sur', 'cook', 'hist')
+    assert rules.resolve('cuisine') == 'cook'
+    assert rules.resolve('hist') == 'hist'
+    assert rules.key('co') is None
+    assert rules.ability['hist'] == 'int'
+    assert rules.signature != load_rules().signature
+
+    monkeypatch.setenv(HOMEBREW_ENV, str(path))
+    assert load_homebrew() == (rules, None)
+    path.write_text('luck\n')
+    assert load_homebrew()[1] == f'Bad homebrew file: {path}:1: expected ' \
+        '"key: ability, name[, other names]", found "luck"'
+    missing = tmp_path / 'missing.txt'
+    monkeypatch.setenv(HOMEBREW_ENV, str(missing))
+    assert load_homebrew() == (load_rules(), 'Cannot read homebrew file '
+                               f'"{missing}": No such file or directory')
+
+    for text, message in [
+            ('luck: lck, luck\n', 'Skill "luck" uses unknown ability "lck".'),
+            ('sneak: dex, stealth\n', '"stealth" already means "ste".'),
+            ('luck\n', f'{path}:1: expected "key: ability, name[, other '
+                       'names]", found "luck"'),
+            ('wis: wis, wits\n', f'{path}: homebrew can only add skills, '
+                                 'not the ability "wis".')]:
+        path.write_text(text)
+        try:
+            load_rules(str(path))
+            assert False, text
+        except RollError as err:
+            assert str(err) == message
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Simulate many trials of a check, or a chain of checks, for one
+         character. Trials run in shards across processes and only running
+         statistics are kept, so memory use doesn't grow with the trials.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from batch import np, roll_batch
+from character import Character
+from errors import SheetError
+from odds import prob_at_least, total_pmf
+from rng import spawn
+from rolls import ABBREVS, ROLL_TYPES, describe_roll, std_abbrev
+from rules import HOMEBREW_ERROR
+
+
+class Accumulator:
+    """
+    Running statistics for one check: count, mean, M2 (sum of squared
+    differences from the mean), a histogram of totals and the number of
+    totals that met the DC. Two accumulators can be merged.
+    """
+    __slots__ = ('count', 'mean', 'm2', 'hist', 'successes')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.hist = Counter()
+        self.successes = 0
+
+    def add_hist(self, hist, dc=None):
+        """ Add a batch of totals given as a histogram {total: count} """
+        batch = Accumulator()
+        batch.hist = Counter(hist)
+        batch.count = sum(hist.values())
+        if batch.count:
+            batch.mean = sum(t * n for t, n in hist.items()) / batch.count
+            batch.m2 = sum(n * (t - batch.mean) ** 2 for t, n in hist.items())
+        if dc is not None:
+            batch.successes = sum(n for t, n in hist.items() if t >= dc)
+        self.merge(batch)
+
+    def merge(self, other):
+        """ Fold other into this accumulator (Chan et al.'s update) """
+        count = self.count + other.count
+        if not count:
+            return
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.hist.update(other.hist)
+        self.successes += other.successes
+
+    def variance(self):
+        """ Sample variance of the totals so far """
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def to_dict(self):
+        """ Plain-data form, for checkpoints """
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2,
+                'hist': {str(t): n for t, n in sorted(self.hist.items())},
+                'successes': self.successes}
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Inverse of to_dict() """
+        acc = cls()
+        acc.count = data['count']
+        acc.mean = data['mean']
+        acc.m2 = data['m2']
+        acc.hist = Counter({int(t): n for t, n in data['hist'].items()})
+        acc.successes = data['successes']
+        return acc
+
+
+# --------------------------------------------------
+def test_accumulator():
+    """ test Accumulator matches statistics over all the values at once """
+    values = [random.Random(2).randint(-5, 30) for _ in range(1000)]
+    whole = Accumulator()
+    whole.add_hist(Counter(values), dc=10)
+
+    parts = Accumulator()
+    for i in range(0, 1000, 300):
+        part = Accumulator()
+        part.add_hist(Counter(values[i:i + 300]), dc=10)
+        parts.merge(Accumulator.from_dict(part.to_dict()))
+
+    mean = sum(values) / len(values)
+    var = sum((v - mean) ** 2 for v in values) / (len(values) - 1)
+    for acc in [whole, parts]:
+        assert acc.count == 1000
+        assert abs(acc.mean - mean) < 1e-9
+        assert abs(acc.variance() - var) < 1e-9
+        assert acc.successes == sum(v >= 10 for v in values)
+        assert acc.hist == Counter(values)
+
+
+# --------------------------------------------------
+def get_args():
+    """Get command-line arguments"""
+
+    parser = argparse.ArgumentParser(
+        description='Simulate many trials of a check or chain of checks',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('character',
+                        help='.txt with character info and stats',
+                        metavar='FILE')
+
+    parser.add_argument('-r',
+                        '--roll',
+                        metavar='STR',
+                        help='A check to make, e.g. "ath check". Repeat '
+                        'for a chain of checks that must all succeed',
+                        nargs=2,
+                        action='append',
+                        required=True)
+
+    parser.add_argument('--dc',
+                        metavar='int',
+                        help='DC for each check, or one DC for all of them',
+                        type=int,
+                        nargs='+')
+
+    dis_adv = parser.add_mutually_exclusive_group()
+    dis_adv.add_argument('-a',
+                         '--advantage',
+                         help='Roll twice and take the higher number',
+                         action='store_true')
+
+    dis_adv.add_argument('-d',
+                         '--disadvantage',
+                         help='Roll twice and take the lower number',
+                         action='store_true')
+
+    parser.add_argument('-n',
+                        '--trials',
+                        metavar='int',
+                        help='Number of trials',
+                        type=int,
+                        default=100000)
+
+    parser.add_argument('-s',
+                        '--seed',
+                        metavar='seed',
+                        help='Optional seed value for testing',
+                        type=int)
+
+    parser.add_argument('-w',
+                        '--workers',
+                        metavar='int',
+                        help='Number of processes (default: one per CPU)',
+                        type=int)
+
+    parser.add_argument('--shard',
+                        metavar='int',
+                        help='Trials per shard',
+                        type=int,
+                        default=100000)
+
+    parser.add_argument('-c',
+                        '--checkpoint',
+                        metavar='FILE',
+                        help='Save progress here, and resume from it if it '
+                        'exists')
+
+    parser.add_argument('--histogram',
+                        help='Print the histogram of totals',
+                        action='store_true')
+
+    args = parser.parse_args()
+    if HOMEBREW_ERROR:
+        parser.error(HOMEBREW_ERROR)
+
+    args.steps = []
+    for roll_for, roll_type in args.roll:
+        if roll_type not in ROLL_TYPES:
+            parser.error(f'Unknown roll type "{roll_type}"')
+        roll_for = std_abbrev(roll_for, ABBREVS)
+        if roll_for not in ABBREVS.values():
+            parser.error(f'Unknown ability or skill "{roll_for}"')
+        args.steps.append((roll_for, ROLL_TYPES[roll_type]))
+
+    if args.dc and len(args.dc) == 1:
+        args.dc = args.dc * len(args.steps)
+    if args.dc and len(args.dc) != len(args.steps):
+        parser.error(f'Expected 1 or {len(args.steps)} DCs.')
+    if args.trials < 1 or args.shard < 1:
+        parser.error('--trials and --shard must be positive.')
+
+    return args
+
+
+# --------------------------------------------------
+def main():
+    """Make a jazz noise here"""
+
+    args = get_args()
+    try:
+        character = Character.load(args.character)
+    except (OSError, SheetError) as err:
+        sys.exit(str(err))
+    mods = [character.modifier(*step) for step in args.steps]
+    dcs = args.dc or [None] * len(mods)
+    config = {'character': os.path.abspath(args.character), 'mods': mods,
+              'dcs': dcs, 'adv': args.advantage,
+              'disadv': args.disadvantage, 'trials': args.trials,
+              'shard': args.shard, 'seed': args.seed}
+
+    state = load_checkpoint(args.checkpoint, config)
+    if state is None:
+        if config['seed'] is None:
+            config['seed'] = random.SystemRandom().getrandbits(64)
+        state = new_state(config)
+
+    try:
+        simulate(state, args.workers, args.checkpoint)
+    except KeyboardInterrupt:
+        if args.checkpoint:
+            sys.exit(f'Interrupted; progress saved to {args.checkpoint}.')
+        sys.exit('Interrupted.')
+
+    report(state, args.steps, args.histogram)
+
+
+# --------------------------------------------------
+def new_state(config):
+    """ A fresh simulation: nothing done yet """
+    return {'config': config, 'next_shard': 0, 'chain_successes': 0,
+            'steps': [Accumulator() for _ in config['mods']]}
+
+
+# --------------------------------------------------
+def simulate(state, workers=None, checkpoint=None):
+    """
+    Run the remaining shards of state, a round of one shard per worker at
+    a time, merging each round's statistics into state and saving a
+    checkpoint after every round. Shard i always rolls with the stream
+    spawn(seed, i), so the result doesn't depend on workers or restarts.
+    """
+    config = state['config']
+    num_shards = -(-config['trials'] // config['shard'])
+    workers = workers or os.cpu_count()
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+
+    try:
+        while state['next_shard'] < num_shards:
+            first = state['next_shard']
+            shards = range(first, min(first + workers, num_shards))
+            jobs = [(i, shard_size(config, i), config) for i in shards]
+            if pool:
+                outputs = pool.map(run_shard, *zip(*jobs))
+            else:
+                outputs = [run_shard(*job) for job in jobs]
+
+            for hists, chain_successes in outputs:
+                for acc, hist, dc in zip(state['steps'], hists,
+                                         config['dcs']):
+                    acc.add_hist(hist, dc)
+                state['chain_successes'] += chain_successes
+            state['next_shard'] = shards[-1] + 1
+            if checkpoint:
+                save_checkpoint(checkpoint, state)
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+
+# --------------------------------------------------
+def shard_size(config, index):
+    """ Trials in shard index (the last shard may be short) """
+    return min(config['shard'], config['trials'] - index * config['shard'])
+
+
+# --------------------------------------------------
+def run_shard(index, size, config):
+    """
+    Roll size trials of the chain. Returns a histogram of totals for each
+    step and the number of trials where every step met its DC.
+    """
+    rng = spawn(config['seed'], index)
+    hists = []
+    passed = None
+    for mod, dc in zip(config['mods'], config['dcs']):
+        kept = roll_batch(size, config['adv'], config['disadv'],
+                          rng=rng).kept
+        if np is not None:
+            counts = np.bincount(kept, minlength=21)
+            hists.append({face + mod: int(n) for face, n in enumerate(counts)
+                          if n})
+            if dc is not None:
+                met = kept + mod >= dc
+                passed = met if passed is None else passed & met
+        else:
+            hists.append({face + mod: n for face, n in Counter(kept).items()})
+            if dc is not None:
+                met = [face + mod >= dc for face in kept]
+                passed = met if passed is None else \
+                    [a and b for a, b in zip(passed, met)]
+
+    return hists, int(sum(passed)) if passed is not None else 0
+
+
+# --------------------------------------------------
+def test_simulate():
+    """ test simulate() is the same in one process, in two, and resumed """
+    config = {'character': 'x', 'mods': [15, 2], 'dcs': [20, 12],
+              'adv': False, 'disadv': True, 'trials': 25000, 'shard': 4000,
+              'seed': 11}
+
+    alone = new_state(config)
+    simulate(alone, workers=1)
+    pooled = new_state(config)
+    simulate(pooled, workers=2)
+
+    assert alone['steps'][0].count == 25000
+    assert [a.to_dict() for a in alone['steps']] == \
+        [a.to_dict() for a in pooled['steps']]
+    assert alone['chain_successes'] == pooled['chain_successes']
+
+    # close to the exact answers
+    exact = float(prob_at_least(total_pmf(15, False, True), 20))
+    assert abs(alone['steps'][0].successes / 25000 - exact) < 0.02
+    assert 0 < alone['chain_successes'] < alone['steps'][1].successes
+
+
+# --------------------------------------------------
+def save_checkpoint(path, state):
+    """ Atomically write state to path as JSON """
+    data = {'config': state['config'], 'next_shard': state['next_shard'],
+            'chain_successes': state['chain_successes'],
+            'steps': [acc.to_dict() for acc in state['steps']]}
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wt') as fh:
+        json.dump(data, fh)
+    os.replace(tmp, path)
+
+
+# --------------------------------------------------
+def load_checkpoint(path, config):
+    """
+    The state saved at path, if there is one for the same simulation.
+    A checkpoint for a different simulation is an error, to avoid mixing
+    results.
+    """
+    if not path or not os.path.exists(path):
+        return None
+
+    with open(path, 'rt') as fh:
+        data = json.load(fh)
+    saved = data['config']
+    if any(saved[k] != v for k, v in config.items()
+           if k != 'seed' or v is not None):
+        sys.exit(f'{path} is a checkpoint for a different simulation.')
+
+    data['steps'] = [Accumulator.from_dict(d) for d in data['steps']]
+    return data
+
+
+# --------------------------------------------------
+def test_checkpoint(tmp_path):
+    """ test a run stopped part way and resumed matches a full run """
+    path = str(tmp_path / 'sim.json')
+    config = {'character': 'x', 'mods': [3], 'dcs': [15], 'adv': True,
+              'disadv': False, 'trials': 10000, 'shard': 1000, 'seed': 5}
+
+    full = new_state(config)
+    simulate(full, workers=1)
+
+    partial = new_state(config)
+    partial['config'] = dict(config, trials=4000)
+    simulate(partial, workers=1)
+    partial['config'] = config
+    save_checkpoint(path, partial)
+
+    resumed = load_checkpoint(path, config)
+    assert resumed['next_shard'] == 4
+    simulate(resumed, workers=1, checkpoint=path)
+    assert resumed['steps'][0].to_dict() == full['steps'][0].to_dict()
+    assert load_checkpoint(path, config)['next_shard'] == 10
+
+
+# --------------------------------------------------
+def report(state, steps, histogram):
+    """ Print the results of a simulation """
+    config = state['config']
+    print(f'\nSimulated {config["trials"]:,} trials.')
+
+    for (roll_for, roll_type), acc, mod, dc in zip(
+            steps, state['steps'], config['mods'], config['dcs']):
+        roll = describe_roll(roll_for, roll_type, config['adv'],
+                             config['disadv'], ABBREVS)
+        print(f'\n{roll[0].upper()}{roll[1:]} ({mod:+d}): '
+              f'mean {acc.mean:.2f}, standard deviation '
+              f'{acc.variance() ** 0.5:.2f}.')
+        if dc is not None:
+            exact = prob_at_least(total_pmf(mod, config['adv'],
+                                            config['disadv']), dc)
+            print(f'Met DC {dc} {acc.successes / acc.count:.2%} of the '
+                  f'time (exactly {float(exact):.2%}).')
+        if histogram:
+            for total in sorted(acc.hist):
+                print(f'{total:5}  {acc.hist[total] / acc.count:6.2%}')
+
+    if len(steps) > 1 and any(dc is not None for dc in config['dcs']):
+        rate = state['chain_successes'] / config['trials']
+        print(f'\nEvery check succeeded in {rate:.2%} of trials.')
+    print()
+
+
+# --------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Make a stream of rolls in one process. Reads one JSON roll
+         request per line and writes one result per line (JSON by
+         default, or any format output.py knows). rolls.py --stream
+         runs the same code.
+"""
+
+import argparse
+import io
+import json
+import sys
+
+import profiling
+from output import FORMATS, RollWriter
+from rng import spawn
+from rolld import handle_request
+from rolllog import RollLog, summarize
+from rules import HOMEBREW_ERROR
+
+
+# --------------------------------------------------
+def get_args():
+    """Get command-line arguments"""
+
+    parser = argparse.ArgumentParser(
+        description='Roll a stream of JSON requests',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('requests',
+                        help='File with one JSON request per line '
+                        '(default: stdin)',
+                        metavar='FILE',
+                        nargs='?',
+                        type=argparse.FileType('rt'),
+                        default=sys.stdin)
+
+    parser.add_argument('-o',
+                        '--outfile',
+                        help='Where to write results (default: stdout)',
+                        metavar='FILE',
+                        type=argparse.FileType('wt'),
+                        default=sys.stdout)
+
+    parser.add_argument('-s',
+                        '--seed',
+                        metavar='seed',
+                        help='Root seed for requests that have no seed '
+                        'of their own',
+                        type=int)
+
+    parser.add_argument('-f',
+                        '--format',
+                        help='Output format (binary writes roll log records)',
+                        metavar='FMT',
+                        choices=FORMATS,
+                        default='json')
+
+    parser.add_argument('-l',
+                        '--log',
+                        metavar='FILE',
+                        help='Also record every roll in this roll log')
+
+    parser.add_argument('-p',
+                        '--profile',
+                        help='Print how long each stage took to stderr',
+                        action='store_true')
+
+    args = parser.parse_args()
+    if HOMEBREW_ERROR:
+        parser.error(HOMEBREW_ERROR)
+
+    return args
+
+
+# --------------------------------------------------
+def main():
+    """Make a jazz noise here"""
+
+    args = get_args()
+    profiling.enable(args.profile)
+    try:
+        run_stream(args.requests, args.outfile, args.format, args.seed,
+                   args.log)
+    except (OSError, ValueError) as err:
+        sys.exit(str(err))
+    if args.profile:
+        print(profiling.report(), file=sys.stderr)
+
+
+# --------------------------------------------------
+def run_stream(lines, outfile, fmt='json', seed=None, log_path=None):
+    """
+    Roll each JSON request in lines and write the results to outfile in
+    fmt. This is the whole of stream.py and of rolls.py --stream.
+    log_path: optional roll log to record successful rolls in. Raises
+        OSError or ValueError if it can't be opened.
+    """
+    log = RollLog(log_path) if log_path else None
+    with RollWriter(outfile, fmt) as writer:
+        for result in stream_results(lines, seed, log):
+            writer.write(*result)
+
+
+# --------------------------------------------------
+def roll_stream(lines, seed=None, log=None):
+    """
+    Roll each JSON request in lines, yielding one JSON result per request.
+    Only the characters seen so far are kept in memory, so arbitrarily
+    long streams can be replayed. Blank lines are skipped.
+    seed: root seed. Requests without a seed of their own roll with a
+        stream derived from it and their line number.
+    log: optional RollLog to record successful rolls in.
+    """
+    for result, _, _, _ in stream_results(lines, seed, log):
+        yield json.dumps(result)
+
+
+# --------------------------------------------------
+def stream_results(lines, seed=None, log=None):
+    """
+    roll_stream() yielding (result, character name, adv, disadv) tuples,
+    ready for RollWriter.write(), instead of JSON. A request that can't
+    be rolled gets an error result; the lines after it are still rolled.
+    """
+    characters = {}
+    for num, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        name, adv, disadv = '', False, False
+        try:
+            request = json.loads(line)
+        except ValueError:
+            result = {'error': f'Line {num} is not valid JSON.'}
+        else:
+            rng = spawn(seed, num) if seed is not None else None
+            try:
+                result = handle_request(request, characters, rng)
+            except (TypeError, ValueError) as err:
+                result = {'error': f'Line {num}: bad request: {err}'}
+            if 'rolls' in result:
+                name = characters[request['character']].name
+                adv = bool(request.get('adv'))
+                disadv = bool(request.get('disadv'))
+                if log:
+                    log.append(name, result['roll_type'], result['roll_for'],
+                               result['rolls'], result['mod'], adv, disadv)
+        yield result, name, adv, disadv
+
+
+# --------------------------------------------------
+def test_roll_stream():
+    """ test roll_stream() """
+    lines = ['{"character": "inputs/cleric.txt", "roll_for": "str", '
+             '"roll_type": "save", "seed": 3, "id": "a"}\n',
+             '\n',
+             'not json\n',
+             '{"character": "inputs/rogue.txt", "roll_for": "ste", '
+             '"roll_type": "skill", "disadv": true, "seed": 3}\n']
+    results = [json.loads(r) for r in roll_stream(lines)]
+
+    assert results[0] == {'roll_for': 'str', 'roll_type': 'save',
+                          'rolls': [8], 'mod': 1, 'total': 9, 'id': 'a'}
+    assert results[1] == {'error': 'Line 3 is not valid JSON.'}
+    assert results[2]['total'] == 23
+
+    bad_seed = lines[3].replace('"seed": 3', '"seed": [3]')
+    results = [json.loads(r) for r in roll_stream([lines[0], bad_seed,
+                                                   lines[3]])]
+    assert [r.get('total') for r in results] == [9, None, 23]
+    assert results[1]['error'].startswith('Bad request: "seed"')
+
+    unseeded = ['{"character": "inputs/rogue.txt", "roll_for": "ste", '
+                '"roll_type": "c"}\n'] * 20
+    assert list(roll_stream(unseeded, 9)) == list(roll_stream(unseeded, 9))
+    assert list(roll_stream(unseeded[:5], 9)) == \
+        list(roll_stream(unseeded, 9))[:5]
+
+
+# --------------------------------------------------
+def test_roll_stream_log(tmp_path):
+    """ test roll_stream() records rolls in a log """
+    path = str(tmp_path / 'rolls.log')
+    lines = ['{"character": "inputs/rogue.txt", "roll_for": "stealth", '
+             '"roll_type": "c", "adv": true}\n'] * 10
+    lines.append('{"character": "inputs/bad.txt", "roll_for": "str", '
+                 '"roll_type": "c"}\n')
+    results = [json.loads(r) for r in roll_stream(lines, 1, RollLog(path))]
+
+    stats = summarize(path)
+    assert list(stats) == [('rogue', 'check', 'ste')]
+    assert stats[('rogue', 'check', 'ste')].count == 10
+    assert stats[('rogue', 'check', 'ste')].mean_total == \
+        sum(r['total'] for r in results[:10]) / 10
+
+
+# --------------------------------------------------
+def test_run_stream(tmp_path):
+    """ test run_stream() """
+    out = io.StringIO()
+    lines = ['{"character": "inputs/cleric.txt", "roll_for": "str", '
+             '"roll_type": "save", "seed": 3}\n'] * 2
+    run_stream(lines, out, 'csv', log_path=str(tmp_path / 'rolls.log'))
+
+    assert out.getvalue().splitlines()[1:] == \
+        [',cleric,str,save,0,0,8,8,,1,9,'] * 2
+    assert summarize(str(tmp_path / 'rolls.log'))[
+        ('cleric', 'save', 'str')].count == 2
+
+
+# --------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -135,4 +135,289 @@ def test_6():
                 "You rolled a 8 and a 19 on the d20 with a +15 modifier."]
     rv, output = getstatusoutput(f'{PRG} {CHAR2} ste skill -d -s 3')
     assert rv == 0
-    assert output.strip().splitlines() == expected
\ No newline at end of file
+    assert output.strip().splitlines() == expected
+
+
+# --------------------------------------------------
+def test_dc_odds():
+    """ test chance of meeting a DC with disadvantage """
+    expected = ["Odds for a Stealth check with disadvantage.",
+                "",
+                "Your chance of a total of 20 or more is 64.00%.",
+                "You would roll the d20 with a +15 modifier."]
+    rv, output = getstatusoutput(f'{PRG} {CHAR2} ste skill -d --dc 20')
+    assert rv == 0
+    assert output.strip().splitlines() == expected
+
+
+# --------------------------------------------------
+def test_odds_table():
+    """ test full table of totals """
+    rv, output = getstatusoutput(f'{PRG} {CHAR1} str save --odds')
+    lines = output.strip().splitlines()
+    assert rv == 0
+    assert lines[0] == "Odds for a Strength save."
+    assert lines[2] == "Total  Chance  At least"
+    assert lines[3] == "    2   5.00%   100.00%"
+    assert lines[22] == "   21   5.00%     5.00%"
+    assert lines[-1] == "You would roll the d20 with a +1 modifier."
+
+
+# --------------------------------------------------
+def test_party():
+    """ test a seeded group check for a directory of characters """
+    expected = ["The party made a Perception check.",
+                "",
+                "bad     Non-integer value found in inputs/bad.txt.",
+                "cleric   28  (rolled 19, +9)",
+                "rogue     0  (rolled 1, -1)",
+                "",
+                "Average total 14.0, highest 28, lowest 0.",
+                "1 of 2 met DC 12, so the group check succeeds.",
+                "The chance of at least half succeeding was 94.00%."]
+    rv, output = getstatusoutput('./party.py inputs -r perc check -s 4 '
+                                 '--dc 12')
+    assert rv == 0
+    assert output.strip().splitlines() == expected
+
+
+# --------------------------------------------------
+def test_seed_zero():
+    """ test a seed of 0 is used rather than ignored """
+    expected = ["You made a Strength check.",
+                "",
+                "Your total is 14.",
+                "You rolled a 13 on the d20 with a +1 modifier."]
+    for _ in range(2):
+        rv, output = getstatusoutput(f'{PRG} {CHAR1} str check -s 0')
+        assert rv == 0
+        assert output.strip().splitlines() == expected
+
+
+# --------------------------------------------------
+def test_dice_expr():
+    """ test rolling a dice expression, and a bad one """
+    rv, output = getstatusoutput('./dice.py "4d6 kh3" -n 3 -s 1')
+    lines = output.strip().splitlines()
+    assert rv == 0
+    assert lines[0] == "You rolled 4d6kh3."
+    assert re.match(r'Your totals are \d+, \d+, \d+\.$', lines[2])
+
+    rv, output = getstatusoutput('./dice.py 4x6')
+    assert rv != 0
+    assert output == 'Bad dice expression "4x6".'
+
+
+# --------------------------------------------------
+def test_dice_odds():
+    """ test exact odds for a large dice pool """
+    expected = ["Odds for 40d6.",
+                "",
+                "The chance of a total of 150 or more is 19.02%.",
+                "The average is 140.00."]
+    rv, output = getstatusoutput('./dice.py 40d6 --dc 150')
+    assert rv == 0
+    assert output.strip().splitlines() == expected
+
+
+# --------------------------------------------------
+def test_profile():
+    """ test --profile adds a timing table without changing the roll """
+    rv, output = getstatusoutput(f'{PRG} {CHAR1} str save -s 3 -p')
+    lines = output.strip().splitlines()
+    assert rv == 0
+    assert lines[2] == "Your total is 9."
+    assert lines[5].split() == ['Stage', 'Calls', 'Total', 'ms', 'Mean',
+                                'us', 'p50', 'us', 'p99', 'us', 'Max', 'us']
+    assert [line.split()[0] for line in lines[6:]][-2:] == ['roll_dice',
+                                                            'output']
+
+
+# --------------------------------------------------
+def test_format():
+    """ test --format writes the same roll in each format """
+    rv, output = getstatusoutput(f'{PRG} {CHAR2} ste c -a -s 3 -f csv')
+    assert rv == 0
+    assert output.splitlines() == [
+        'id,character,roll_for,roll_type,adv,disadv,kept,roll1,roll2,mod,'
+        'total,error', ',rogue,ste,check,1,0,19,8,19,15,34,']
+
+    rv, output = getstatusoutput(f'{PRG} {CHAR1} str save -s 3 -f json')
+    assert rv == 0
+    assert output == '{"roll_for": "str", "roll_type": "save", ' \
+        '"rolls": [8], "mod": 1, "total": 9}'
+
+    rv, output = getstatusoutput(f'{PRG} {CHAR1} str save -o -f json')
+    assert rv != 0
+    assert re.search('--format only applies to rolls', output)
+
+
+# --------------------------------------------------
+def test_initiative():
+    """ test initiative.py orders everyone by their roll """
+    rv, output = getstatusoutput(f'./initiative.py {CHAR1} {CHAR2} -s 1')
+    assert rv == 0
+    assert output.strip().splitlines()[2:] == [' 1.  24  rogue (+5)',
+                                               ' 2.   7  cleric (+2)']
+
+
+# --------------------------------------------------
+def test_validate():
+    """ test validate.py reports problems with file, line and column """
+    rv, output = getstatusoutput('./validate.py inputs')
+    assert rv == 1
+    assert output.splitlines() == [
+        f'{BAD_CHAR}:2:12: "twenty" is not a whole number',
+        'Checked 3 sheets: 1 problem in 1 file.']
+
+    rv, output = getstatusoutput(f'./validate.py {CHAR1} {CHAR2}')
+    assert rv == 0
+    assert output == 'Checked 2 sheets: 0 problems in 0 files.'
+
+
+# --------------------------------------------------
+def test_contest():
+    """ test contest.py settles contests and gives the exact odds """
+    rv, output = getstatusoutput(f'./contest.py --attackers {CHAR2} {CHAR1} '
+                                 f'--defenders {CHAR1} {CHAR2} '
+                                 '-r ste check --against perc check -s 1')
+    assert rv == 0
+    assert output.strip().splitlines() == [
+        'Attackers made a Stealth check, defenders a Perception check.',
+        '',
+        'rogue   20  vs  cleric  12  rogue   (win 73.75%)',
+        'cleric  21  vs  rogue    8  cleric  (win 61.75%)',
+        '',
+        'Attackers won 2 of 2 contests, defenders 0, with 0 ties.',
+        'Expected attacker wins 1.35, ties 0.08.']
+
+    rv, output = getstatusoutput(f'./contest.py --attackers {CHAR1} '
+                                 f'--defenders {CHAR1} {CHAR2} -r ath c')
+    assert rv != 0
+    assert output == 'Cannot pair 1 attackers with 2 defenders one to one.'
+
+
+# --------------------------------------------------
+def test_chances(tmp_path):
+    """ test chances.py ranks a roster by chance of success """
+    path = tmp_path / 'party.roster'
+    rv, _ = getstatusoutput(f'./roster.py {path} -i {CHAR1} {CHAR2}')
+    assert rv == 0
+    rv, output = getstatusoutput(f'./chances.py {path} ins check --dc 15 -a')
+    assert rv == 0
+    assert output.strip().splitlines() == [
+        'Best chances of making an Insight check with advantage at DC 15:',
+        '',
+        ' 1. cleric   93.75%',
+        ' 2. rogue    43.75%']
+
+    rv, output = getstatusoutput(f'./chances.py {path} ins check --dc 31')
+    assert rv != 0
+    assert re.search('--dc "31" must be from 1 to 30', output)
+
+
+# --------------------------------------------------
+def test_audit():
+    """ test audit.py reports each statistic with a p-value """
+    rv, output = getstatusoutput('./audit.py -n 1e5 -s 1 -a -w 1')
+    lines = output.strip().splitlines()
+    assert rv == 0
+    assert lines[0].startswith('Audited 100,000 rolls with advantage '
+                               '(200,000 dice) from the mt generator in')
+    assert lines[2:] == [
+        'Test                                 Statistic         p',
+        'Faces (chi-square, 19 df)              24.5432    0.1761',
+        'Kept die, adv (chi-square, 19 df)      11.5854    0.9026',
+        'Pairs of dice (chi-square, 399 df)    412.1440    0.3143',
+        'Serial correlation (lag 1)              0.0016    0.4859',
+        'Runs above/below 10.5 (z)              -1.1158    0.2645',
+        'Longest run of high or low dice             19',
+        '',
+        'Nothing unusual at p < 0.001.']
+
+
+# --------------------------------------------------
+def test_rolllog(tmp_path):
+    """ test rolllog.py accepts the same roll names as rolls.py """
+    log = tmp_path / 'rolls.log'
+    for args in ['ste check', 'wis save']:
+        rv, _ = getstatusoutput(f'{PRG} {CHAR2} {args} -s 3 -l {log}')
+        assert rv == 0
+
+    rv, output = getstatusoutput(f'./rolllog.py {log} -r stea')
+    assert rv == 0
+    assert re.search(r'rogue\s+Stealth check\s+1\s+23\.00', output)
+    assert 'Wisdom' not in output
+
+    rv, output = getstatusoutput(f'./rolllog.py {log} -r per')
+    assert rv != 0
+    assert re.search('"per" could be Perception, Performance, Persuasion',
+                     output)
+
+
+# --------------------------------------------------
+def test_homebrew(tmp_path):
+    """ test homebrew skills and unique prefixes """
+    homebrew = tmp_path / 'homebrew.txt'
+    homebrew.write_text('cook: wis, cooking, cuisine\n')
+    sheet = tmp_path / 'chef.txt'
+    sheet.write_text('2\nstr:9, dex:20, con:14, int:10, wis:14, cha:16\n'
+                     'dex:1, int:1\ncook:2, ste:1')
+
+    rv, output = getstatusoutput(f'ROLLS_HOMEBREW={homebrew} '
+                                 f'{PRG} {sheet} cuis check -s 3')
+    assert rv == 0
+    assert output.strip().splitlines()[0] == 'You made a Cooking check.'
+    assert output.strip().splitlines()[2] == 'Your total is 14.'
+
+    rv, output = getstatusoutput(f'{PRG} {CHAR2} stea check -s 3')
+    assert rv == 0
+    assert output.strip().splitlines()[2] == 'Your total is 23.'
+
+    rv, output = getstatusoutput(f'{PRG} {CHAR2} per check')
+    assert rv != 0
+    assert re.search('"per" could be Perception, Performance, Persuasion',
+                     output)
+
+    for path, message in [
+            (tmp_path / 'missing.txt', f'Cannot read homebrew file '
+             f'"{tmp_path / "missing.txt"}": No such file or directory'),
+            (sheet, f'Bad homebrew file: {sheet}:1: expected "key: ability, '
+             'name[, other names]", found "2"')]:
+        for prg in [f'{PRG} {CHAR2} ste c', f'./party.py -r ste c {CHAR2}',
+                    './stream.py < /dev/null']:
+            rv, output = getstatusoutput(f'ROLLS_HOMEBREW={path} {prg}')
+            assert rv != 0, prg
+            assert output.endswith(message), prg
+            assert 'Traceback' not in output
+
+
+# --------------------------------------------------
+def test_stream(tmp_path):
+    """ --stream rolls JSON requests like stream.py """
+    requests = tmp_path / 'requests.jsonl'
+    requests.write_text(
+        f'{{"character": "{CHAR1}", "roll_for": "str", '
+        '"roll_type": "save", "seed": 3, "id": "a"}\n'
+        'not json\n'
+        f'{{"character": "{CHAR2}", "roll_for": "ste", '
+        '"roll_type": "check", "disadv": true, "seed": 3}\n')
+
+    rv, output = getstatusoutput(f'{PRG} --stream {requests}')
+    assert rv == 0
+    _, stream_output = getstatusoutput(f'./stream.py {requests}')
+    assert output == stream_output
+    assert output.splitlines() == [
+        '{"roll_for": "str", "roll_type": "save", "rolls": [8], "mod": 1, '
+        '"total": 9, "id": "a"}',
+        '{"error": "Line 2 is not valid JSON."}',
+        '{"roll_for": "ste", "roll_type": "check", "rolls": [8, 8, 19], '
+        '"mod": 15, "total": 23}']
+
+    rv, output = getstatusoutput(f'{PRG} --stream - -f csv < {requests}')
+    assert rv == 0
+    assert output.splitlines()[1] == 'a,cleric,str,save,0,0,8,8,,1,9,'
+
+    rv, output = getstatusoutput(f'{PRG} --stream {requests} {CHAR1}')
+    assert rv != 0
+    assert re.search('--stream takes the character', output)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Check character sheets and report every problem at once, with
+         file, line and column, instead of stopping at the first one.
+         Directories are checked across a process pool.
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from party import find_sheets
+from rolls import ABBREVS, ABILITIES, SKILLS
+from rules import HOMEBREW_ERROR
+
+LINES = ['proficiency bonus', 'ability scores', 'saving throw proficiencies',
+         'skill proficiencies']
+MULTIPLIERS = (0, 1, 2)
+MIN_SCORE = 1
+MAX_SCORE = 30
+
+
+class Problem(NamedTuple):
+    """ Something wrong with a sheet. line and column count from 1 """
+    file: str
+    line: int
+    column: int
+    message: str
+
+    def __str__(self):
+        return f'{self.file}:{self.line}:{self.column}: {self.message}'
+
+
+# --------------------------------------------------
+def validate_sheet(file_name):
+    """ Every Problem with one sheet, in the order they appear """
+    try:
+        with open(file_name, 'rt') as fh:
+            lines = fh.read().splitlines()
+    except (OSError, UnicodeDecodeError) as err:
+        return [Problem(file_name, 1, 1, f"Can't read the file: {err}")]
+
+    problems = []
+
+    def report(line, column, message):
+        problems.append(Problem(file_name, line, column, message))
+
+    while lines and not lines[-1].strip():
+        lines.pop()
+    for num in range(len(lines) + 1, len(LINES) + 1):
+        report(num, 1, f'Missing the {LINES[num - 1]} line')
+    for num in range(len(LINES) + 1, len(lines) + 1):
+        report(num, 1, 'Unexpected extra line')
+
+    if lines:
+        text = lines[0].strip()
+        column = len(lines[0]) - len(lines[0].lstrip()) + 1
+        if not _is_int(text):
+            report(1, column, f'Proficiency bonus "{text}" is not a whole '
+                   'number')
+        elif int(text) < 0:
+            report(1, column, f'Proficiency bonus {text} is negative')
+
+    if len(lines) > 1:
+        scores = check_pairs(lines[1], ABILITIES, 'ability', report, 2)
+        for key, (value, column) in scores.items():
+            if value is not None and not MIN_SCORE <= value <= MAX_SCORE:
+                report(2, column, f'Score {value} for "{key}" is outside '
+                       f'{MIN_SCORE}-{MAX_SCORE}')
+        missing = [a for a in ABILITIES if a not in scores]
+        if missing:
+            report(2, 1, f'Missing ability scores: {", ".join(missing)}')
+
+    for num, allowed, kind in [(3, ABILITIES, 'ability'),
+                               (4, SKILLS, 'skill')]:
+        if len(lines) >= num:
+            profs = check_pairs(lines[num - 1], allowed, kind, report, num)
+            for key, (value, column) in profs.items():
+                if value is not None and value not in MULTIPLIERS:
+                    report(num, column, f'Proficiency multiplier {value} '
+                           f'for "{key}" must be 0, 1 or 2')
+
+    return sorted(problems, key=lambda p: (p.line, p.column))
+
+
+# --------------------------------------------------
+def check_pairs(line, allowed, kind, report, num):
+    """
+    Check a line of key:value pairs the way rolls.read_dict reads it.
+    Reports problems through report(line, column, message) and returns
+    {key: (value, column of value)} for the known keys. value is None
+    when it isn't a whole number.
+    """
+    pairs = {}
+    column = len(line) - len(line.lstrip()) + 1
+    for item in line.strip().split(', '):
+        key, colon, value = item.partition(':')
+        value_column = column + len(key) + 1
+        if not colon:
+            report(num, column, f'Expected "key:value", found "{item}"')
+        elif key not in allowed:
+            hint = f' (use "{ABBREVS[key]}")' if ABBREVS.get(key) in allowed \
+                else ''
+            report(num, column, f'Unknown {kind} "{key}"{hint}')
+        elif key in pairs:
+            report(num, column, f'"{key}" is given more than once')
+        elif not _is_int(value):
+            report(num, value_column, f'"{value}" is not a whole number')
+            pairs[key] = (None, value_column)
+        else:
+            pairs[key] = (int(value), value_column)
+        column += len(item) + 2
+    return pairs
+
+
+# --------------------------------------------------
+def _is_int(text):
+    """ Whether int() accepts text """
+    try:
+        int(text)
+    except ValueError:
+        return False
+    return True
+
+
+# --------------------------------------------------
+def test_validate_sheet():
+    """ test validate_sheet() on the sample sheets """
+    assert validate_sheet('inputs/cleric.txt') == []
+    assert validate_sheet('inputs/rogue.txt') == []
+    assert [str(p) for p in validate_sheet('inputs/bad.txt')] == \
+        ['inputs/bad.txt:2:12: "twenty" is not a whole number']
+
+
+# --------------------------------------------------
+def test_validate_sheet_everything(tmp_path):
+    """ test every kind of problem is found in one pass """
+    sheet = tmp_path / 'npc.txt'
+    sheet.write_text('five\n'
+                     'str:9, dex:40, con:14, int:10, int:12, luck:3\n'
+                     'dex:1,int:1\n'
+                     'stealth:1, ins:3, perc\n'
+                     '\n'
+                     'extra\n')
+    assert [p[1:] for p in validate_sheet(str(sheet))] == [
+        (1, 1, 'Proficiency bonus "five" is not a whole number'),
+        (2, 1, 'Missing ability scores: wis, cha'),
+        (2, 12, 'Score 40 for "dex" is outside 1-30'),
+        (2, 32, '"int" is given more than once'),
+        (2, 40, 'Unknown ability "luck"'),
+        (3, 5, '"1,int:1" is not a whole number'),
+        (4, 1, 'Unknown skill "stealth" (use "ste")'),
+        (4, 16, 'Proficiency multiplier 3 for "ins" must be 0, 1 or 2'),
+        (4, 19, 'Expected "key:value", found "perc"'),
+        (5, 1, 'Unexpected extra line'),
+        (6, 1, 'Unexpected extra line')]
+
+    sheet.write_text('3\n')
+    assert [p[1:] for p in validate_sheet(str(sheet))] == [
+        (2, 1, 'Missing the ability scores line'),
+        (3, 1, 'Missing the saving throw proficiencies line'),
+        (4, 1, 'Missing the skill proficiencies line')]
+    assert validate_sheet(str(tmp_path / 'none.txt'))[0][1:3] == (1, 1)
+
+
+# --------------------------------------------------
+def validate_files(files):
+    """ Problems with a list of sheets, file by file """
+    problems = []
+    for file_name in files:
+        problems.extend(validate_sheet(file_name))
+    return problems
+
+
+# --------------------------------------------------
+def validate_all(files, workers=None):
+    """
+    Problems with every file, in file order. With workers=1 everything
+    happens in this process; otherwise files are split into chunks for a
+    process pool.
+    """
+    if workers == 1 or len(files) < 2:
+        return validate_files(files)
+
+    workers = workers or os.cpu_count()
+    size = max(1, min(1000, len(files) // (workers * 4)))
+    chunks = [files[i:i + size] for i in range(0, len(files), size)]
+    problems = []
+    with ProcessPoolExecutor(workers) as pool:
+        for chunk in pool.map(validate_files, chunks):
+            problems.extend(chunk)
+    return problems
+
+
+# --------------------------------------------------
+def test_validate_all():
+    """ test validate_all() gives the same report in and out of a pool """
+    files = find_sheets(['inputs']) * 5
+    alone = validate_all(files, workers=1)
+    assert len(alone) == 5
+    assert validate_all(files, workers=2) == alone
+
+
+# --------------------------------------------------
+def get_args():
+    """Get command-line arguments"""
+
+    parser = argparse.ArgumentParser(
+        description='Check character sheets for problems',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('sheets',
+                        help='Character files, directories or globs',
+                        metavar='FILE',
+                        nargs='+')
+
+    parser.add_argument('-w',
+                        '--workers',
+                        metavar='int',
+                        help='Processes to use (default: one per CPU)',
+                        type=int)
+
+    parser.add_argument('-q',
+                        '--quiet',
+                        help='Only print the summary',
+                        action='store_true')
+
+    args = parser.parse_args()
+    if HOMEBREW_ERROR:
+        parser.error(HOMEBREW_ERROR)
+    if args.workers is not None and args.workers < 1:
+        parser.error(f'--workers "{args.workers}" must be greater than 0')
+
+    return args
+
+
+# --------------------------------------------------
+def main():
+    """Make a jazz noise here"""
+
+    args = get_args()
+    files = find_sheets(args.sheets)
+    if not files:
+        sys.exit('No character sheets found.')
+
+    problems = validate_all(files, args.workers)
+    if not args.quiet and problems:
+        sys.stdout.write('\n'.join(map(str, problems)) + '\n')
+    bad_files = len({p.file for p in problems})
+    print(f'Checked {len(files)} sheet{"s" if len(files) != 1 else ""}: '
+          f'{len(problems)} problem{"s" if len(problems) != 1 else ""} '
+          f'in {bad_files} file{"s" if bad_files != 1 else ""}.')
+    if problems:
+        sys.exit(1)
+
+
+# --------------------------------------------------
+if __name__ == '__main__':
+    main()
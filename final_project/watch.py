@@ -0,0 +1,190 @@
+"""
+Author : jcadogan <jcadogan@localhost>
+Date   : 2026-10-18
+Purpose: Pick up edits to character sheets in a long-running process.
+         Sheets are polled by mtime and size; a changed sheet is re-read
+         and only the modifiers its edit can affect are worked out again.
+"""
+
+import os
+
+from cache import MOD_KEYS, Sheet
+from character import Character
+from errors import SheetError
+from rolls import (ABILITIES, calc_mod, calc_prof, determine_ability,
+                   read_character)
+
+# ability: the MOD_KEYS that use its score
+ABILITY_KEYS = {ability: [key for key in MOD_KEYS
+                          if determine_ability(key[1]) == ability]
+                for ability in ABILITIES}
+
+
+# --------------------------------------------------
+def changed_keys(old, new):
+    """
+    The MOD_KEYS whose modifier may differ between two sheets (anything
+    with prof_bonus, scores, save_profs and skill_profs). A new
+    proficiency bonus only touches rows with a proficiency, a new score
+    only the rolls that use that ability.
+    """
+    keys = set()
+    for roll_type, old_profs, new_profs in [
+            ('save', old.save_profs, new.save_profs),
+            ('check', old.skill_profs, new.skill_profs)]:
+        for roll_for in set(old_profs) | set(new_profs):
+            if old_profs.get(roll_for) != new_profs.get(roll_for) \
+                    or old.prof_bonus != new.prof_bonus:
+                keys.add((roll_type, roll_for))
+    for ability in set(old.scores) | set(new.scores):
+        if old.scores.get(ability) != new.scores.get(ability):
+            keys.update(ABILITY_KEYS.get(ability, []))
+    return keys & set(MOD_KEYS)
+
+
+# --------------------------------------------------
+def test_changed_keys():
+    """ test changed_keys() """
+    old = Character.load('inputs/rogue.txt')
+    scores = dict(old.scores, wis=12)
+    new = Sheet(old.prof_bonus, scores, old.save_profs, old.skill_profs, {})
+    assert changed_keys(old, old) == set()
+    assert changed_keys(old, new) == set(ABILITY_KEYS['wis'])
+    assert ('check', 'perc') in changed_keys(old, new)
+
+    new = Sheet(6, old.scores, old.save_profs, old.skill_profs, {})
+    assert changed_keys(old, new) == \
+        {('save', 'dex'), ('save', 'int'), ('check', 'ste'),
+         ('check', 'soh'), ('check', 'dec'), ('check', 'acr'),
+         ('check', 'intim'), ('check', 'pers'), ('check', 'sur')}
+
+    new = Sheet(old.prof_bonus, old.scores, old.save_profs,
+                dict(old.skill_profs, ath=1), {})
+    assert changed_keys(old, new) == {('check', 'ath')}
+
+
+# --------------------------------------------------
+def refresh(character, file_name, stamp=None):
+    """
+    Re-read file_name, the sheet character was loaded from. Returns
+    (Character, changed keys): a new Character with only the changed
+    modifiers recalculated, or the same one if nothing changed. The old
+    Character is left as it was. stamp is the new Character's stamp.
+    Raises SheetError or OSError.
+    """
+    with open(file_name, 'rt') as fh:
+        prof_bonus, scores, save_profs, skill_profs = \
+            read_character(fh, file_name)
+    new = Sheet(prof_bonus, scores, save_profs, skill_profs, {})
+    keys = changed_keys(character, new)
+    if not keys and (prof_bonus, scores, save_profs, skill_profs) == \
+            (character.prof_bonus, character.scores, character.save_profs,
+             character.skill_profs):
+        return character, keys
+
+    mods = dict(zip(MOD_KEYS, character.mods))
+    try:
+        for roll_type, roll_for in keys:
+            profs = save_profs if roll_type == 'save' else skill_profs
+            mods[(roll_type, roll_for)] = calc_mod(
+                scores, determine_ability(roll_for),
+                calc_prof(roll_for, profs, prof_bonus))[1]
+    except KeyError as err:
+        raise SheetError(f'No {err.args[0]} score in {file_name}.') from None
+    return Character(character.name, new._replace(mods=mods), stamp), keys
+
+
+class SheetWatcher:
+    """
+    Keeps a {file name: Character} dict up to date with the files on disk.
+    Each poll() stats the files and refreshes the ones whose mtime or size
+    changed. Changed characters are replaced whole, never edited, so a
+    reader sees either the old Character or the new one.
+    Keys that aren't files (e.g. roster names) are left alone.
+    """
+
+    def __init__(self, characters):
+        self.characters = characters
+        self.stamps = {}
+        self.errors = {}
+
+    def poll(self):
+        """ Refresh changed sheets. Returns the file names reloaded """
+        reloaded = []
+        for file_name in list(self.characters):
+            if self.stamps.get(file_name, ()) is None:
+                continue
+            try:
+                stat = os.stat(file_name)
+            except OSError:
+                # never a file (e.g. a roster name); a file that has gone
+                # keeps its last good character
+                if file_name not in self.stamps:
+                    self.stamps[file_name] = None
+                continue
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            character = self.characters[file_name]
+            # a sheet not polled before is compared with its stamp at load
+            if self.stamps.get(file_name, character.stamp) == stamp:
+                continue
+
+            try:
+                new, _ = refresh(character, file_name, stamp)
+            except (OSError, SheetError) as err:
+                # keep rolling with the last good sheet
+                self.errors[file_name] = str(err)
+                self.stamps[file_name] = stamp
+                continue
+            self.errors.pop(file_name, None)
+            self.stamps[file_name] = stamp
+            if new is not character:
+                self.characters[file_name] = new
+                reloaded.append(file_name)
+        return reloaded
+
+
+# --------------------------------------------------
+def test_sheet_watcher(tmp_path):
+    """ test edited sheets are picked up and match a fresh load """
+    sheet_file = str(tmp_path / 'rogue.txt')
+    with open('inputs/rogue.txt', 'rt') as fh:
+        text = fh.read()
+    with open(sheet_file, 'wt') as fh:
+        fh.write(text)
+
+    characters = {sheet_file: Character.load(sheet_file), 'rogue': None}
+    watcher = SheetWatcher(characters)
+    before = characters[sheet_file]
+
+    # the first poll trusts the stamp taken at load instead of re-reading:
+    # an edit that keeps the mtime and size goes unseen
+    stat = os.stat(sheet_file)
+    with open(sheet_file, 'wt') as fh:
+        fh.write(text.replace('wis:8', 'wis:x'))
+    os.utime(sheet_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert watcher.poll() == []
+    assert characters[sheet_file] is before and not watcher.errors
+    with open(sheet_file, 'wt') as fh:
+        fh.write(text)
+
+    edits = [text.replace('5\n', '6\n', 1),
+             text.replace('wis:8', 'wis:14'),
+             text.replace('sur:1', 'sur:1, ath:1')]
+    for num, edit in enumerate(edits, start=1):
+        with open(sheet_file, 'wt') as fh:
+            fh.write(edit)
+        os.utime(sheet_file, ns=(num * 10 ** 9, num * 10 ** 9))
+        assert watcher.poll() == [sheet_file]
+        assert characters[sheet_file].mods == Character.load(sheet_file).mods
+
+    assert before.mods == Character.load('inputs/rogue.txt').mods
+    assert characters[sheet_file].modifier('ath', 'check') == 4
+
+    with open(sheet_file, 'wt') as fh:
+        fh.write(text.replace('wis:8', 'wis:eight'))
+    os.utime(sheet_file, ns=(9 * 10 ** 9, 9 * 10 ** 9))
+    good = characters[sheet_file]
+    assert watcher.poll() == []
+    assert characters[sheet_file] is good
+    assert watcher.errors == {sheet_file: 'Non-integer value found in '
+                                          f'{sheet_file}.'}